@@ -0,0 +1,49 @@
+"""
+ManageEngine Patch Manager Plus reporting and compliance sync
+
+The library API is imported lazily, so `import patchmgr` stays cheap and a
+scheduler or notebook can run several operations on shared connections:
+
+    import patchmgr
+
+    pmp = patchmgr.connect_pmp()
+    priv = patchmgr.connect_private()
+    systems = patchmgr.extract_systems(pmp)
+    patchmgr.create_tables(priv)
+    patchmgr.load_systems(priv, systems)
+    patchmgr.record_history(priv)
+    patchmgr.build_star_schema(priv)
+    print(patchmgr.summary_stats(priv))
+
+Report and exploration functions live in patchmgr.report and patchmgr.explore.
+"""
+
+import importlib
+
+__version__ = '1.1.0'
+
+# public name -> module that defines it
+_API = {
+    'connect_pmp': 'patchmgr.db',
+    'connect_private': 'patchmgr.db',
+    'extract_systems': 'patchmgr.sync',
+    'create_tables': 'patchmgr.sync',
+    'load_systems': 'patchmgr.sync',
+    'record_history': 'patchmgr.sync',
+    'build_star_schema': 'patchmgr.star',
+    'summary_stats': 'patchmgr.sync',
+    'top_systems': 'patchmgr.sync',
+    'run_query': 'patchmgr.query',
+}
+
+__all__ = ['__version__'] + sorted(_API)
+
+
+def __getattr__(name):
+    if name in _API:
+        return getattr(importlib.import_module(_API[name]), name)
+    raise AttributeError(f"module 'patchmgr' has no attribute '{name}'")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_API))
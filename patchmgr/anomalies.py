@@ -0,0 +1,237 @@
+"""
+Streaming anomaly detection over successive patch_compliance snapshots
+
+Each sync folds the new snapshot into running statistics kept in
+anomaly_state, one row per (scope, key, metric):
+
+- system: missing_critical of each resource_id
+- domain: average patch_compliance_pct of each domain
+
+A row holds only the sample count and an exponentially weighted mean and
+variance (EWMA). Updates use weight max(ALPHA, 1/n), which is exactly
+Welford's running mean and variance for the first 1/ALPHA snapshots and an
+EWMA afterwards, so the baseline follows slow drift. Before the update, a
+value is flagged into anomaly_events when the series has MIN_SAMPLES samples
+and the value is at least Z_THRESHOLD standard deviations and the metric's
+minimum change away from the mean (a broken agent, a bad deployment).
+
+Scoring, flagging and the update are one statement over the current table
+joined to the state; the history is never re-read. A snapshot is folded in
+once: running it again for the same snapshot_date changes nothing.
+"""
+
+from . import db, registry
+
+ALPHA = 0.1
+Z_THRESHOLD = 3.0
+MIN_SAMPLES = 5
+# Series not updated for this long (systems gone from PMP) are dropped
+STATE_RETENTION_DAYS = 90
+
+# (scope, metric) -> smallest change worth flagging, whatever the variance
+METRICS = {
+    ('system', 'missing_critical'): 3,
+    ('domain', 'avg_compliance'): 2.0,
+}
+
+CREATE_ANOMALY_SQL = """
+CREATE TABLE IF NOT EXISTS anomaly_state (
+    scope VARCHAR(10) NOT NULL,
+    key VARCHAR(255) NOT NULL,
+    metric VARCHAR(50) NOT NULL,
+    samples INTEGER NOT NULL,
+    mean DOUBLE PRECISION NOT NULL,
+    variance DOUBLE PRECISION NOT NULL,
+    last_value DOUBLE PRECISION NOT NULL,
+    updated_for TIMESTAMP NOT NULL,
+    PRIMARY KEY (scope, key, metric)
+);
+
+CREATE TABLE IF NOT EXISTS anomaly_events (
+    id BIGSERIAL PRIMARY KEY,
+    snapshot_date TIMESTAMP NOT NULL,
+    scope VARCHAR(10) NOT NULL,
+    key VARCHAR(255) NOT NULL,
+    label VARCHAR(255),
+    metric VARCHAR(50) NOT NULL,
+    value DOUBLE PRECISION NOT NULL,
+    expected DOUBLE PRECISION NOT NULL,
+    stddev DOUBLE PRECISION NOT NULL,
+    z_score DOUBLE PRECISION,
+    samples INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_anomaly_events_snapshot ON anomaly_events(snapshot_date DESC);
+
+COMMENT ON TABLE anomaly_state IS 'Running EWMA mean/variance per system and domain metric (patchmgr anomalies)';
+COMMENT ON TABLE anomaly_events IS 'Snapshot values far outside their running mean';
+"""
+
+MIN_DELTAS = ",\n        ".join(f"('{scope}', '{metric}', {delta})" for (scope, metric), delta in METRICS.items())
+
+UPDATE_STATE_SQL = f"""
+WITH snapshot AS (
+    SELECT max(snapshot_date) AS taken FROM patch_compliance
+),
+current_values AS (
+    SELECT 'system' AS scope, resource_id::text AS key, system_name AS label,
+           'missing_critical' AS metric, missing_critical::float8 AS value
+    FROM patch_compliance
+    UNION ALL
+    SELECT 'domain', coalesce(system_domain, 'N/A'), coalesce(system_domain, 'N/A'),
+           'avg_compliance', avg(patch_compliance_pct)::float8
+    FROM patch_compliance
+    GROUP BY coalesce(system_domain, 'N/A')
+),
+min_deltas (scope, metric, min_delta) AS (
+    VALUES
+        {MIN_DELTAS}
+),
+flagged AS (
+    INSERT INTO anomaly_events (snapshot_date, scope, key, label, metric, value, expected, stddev, z_score, samples)
+    SELECT sn.taken, c.scope, c.key, c.label, c.metric, c.value, s.mean, sqrt(s.variance),
+           (c.value - s.mean) / nullif(sqrt(s.variance), 0), s.samples
+    FROM current_values c
+    CROSS JOIN snapshot sn
+    JOIN anomaly_state s ON s.scope = c.scope AND s.key = c.key AND s.metric = c.metric
+    JOIN min_deltas d ON d.scope = c.scope AND d.metric = c.metric
+    WHERE s.updated_for < sn.taken
+    AND s.samples >= %(min_samples)s
+    AND abs(c.value - s.mean) >= greatest(%(z_threshold)s * sqrt(s.variance), d.min_delta)
+)
+INSERT INTO anomaly_state (scope, key, metric, samples, mean, variance, last_value, updated_for)
+SELECT c.scope, c.key, c.metric, 1, c.value, 0, c.value, sn.taken
+FROM current_values c
+CROSS JOIN snapshot sn
+WHERE sn.taken IS NOT NULL
+AND c.value IS NOT NULL
+ON CONFLICT (scope, key, metric) DO UPDATE SET
+    samples = anomaly_state.samples + 1,
+    mean = anomaly_state.mean
+        + greatest(%(alpha)s, 1.0 / (anomaly_state.samples + 1)) * (EXCLUDED.mean - anomaly_state.mean),
+    variance = (1 - greatest(%(alpha)s, 1.0 / (anomaly_state.samples + 1)))
+        * (anomaly_state.variance
+           + greatest(%(alpha)s, 1.0 / (anomaly_state.samples + 1)) * (EXCLUDED.mean - anomaly_state.mean) ^ 2),
+    last_value = EXCLUDED.last_value,
+    updated_for = EXCLUDED.updated_for
+WHERE anomaly_state.updated_for < EXCLUDED.updated_for;
+"""
+
+PRUNE_STATE_SQL = """
+DELETE FROM anomaly_state
+WHERE updated_for < (SELECT max(snapshot_date) FROM patch_compliance) - %(days)s * INTERVAL '1 day';
+"""
+
+SNAPSHOT_EVENTS_SQL = """
+    SELECT scope, label, metric, value, expected, stddev, z_score
+    FROM anomaly_events
+    WHERE snapshot_date = (SELECT max(snapshot_date) FROM patch_compliance)
+    ORDER BY abs(value - expected) / greatest(stddev, 1e-9) DESC;
+"""
+
+RECENT_EVENTS_SQL = """
+    SELECT snapshot_date, scope, label, metric, value, expected, stddev, z_score, samples
+    FROM anomaly_events
+    WHERE snapshot_date > NOW() - %(days)s * INTERVAL '1 day'
+    AND (%(scope)s::text IS NULL OR scope = %(scope)s)
+    ORDER BY snapshot_date DESC, abs(value - expected) DESC
+    LIMIT %(limit)s;
+"""
+
+STATE_COUNTS_SQL = """
+    SELECT scope, metric, count(*), count(*) FILTER (WHERE samples >= %(min_samples)s), max(updated_for)
+    FROM anomaly_state
+    GROUP BY scope, metric
+    ORDER BY scope, metric;
+"""
+
+registry.register_all('anomalies', {
+    'update_state': UPDATE_STATE_SQL,
+    'prune_state': PRUNE_STATE_SQL,
+    'snapshot_events': SNAPSHOT_EVENTS_SQL,
+    'recent_events': RECENT_EVENTS_SQL,
+    'state_counts': STATE_COUNTS_SQL,
+})
+
+
+def create_tables(priv_conn):
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute(CREATE_ANOMALY_SQL)
+        priv_conn.commit()
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def update(priv_conn):
+    """
+    Fold the current patch_compliance snapshot into anomaly_state
+
+    Returns (series updated, [(scope, label, metric, value, expected, stddev, z_score)]
+    flagged for this snapshot).
+    """
+    create_tables(priv_conn)
+    cursor = priv_conn.cursor()
+    try:
+        updated = registry.execute(cursor, 'anomalies.update_state', {
+            'alpha': ALPHA, 'z_threshold': Z_THRESHOLD, 'min_samples': MIN_SAMPLES,
+        })
+        registry.execute(cursor, 'anomalies.prune_state', {'days': STATE_RETENTION_DAYS})
+        flagged = registry.fetchall(cursor, 'anomalies.snapshot_events')
+        priv_conn.commit()
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return updated, flagged
+
+
+def describe(scope, label, metric, value, expected, stddev, z_score):
+    """One line for a flagged value"""
+    z = f"z={z_score:+.1f}" if z_score is not None else "first change"
+    return (f"{scope} {label or '?'}: {metric} {value:,.2f} vs expected {expected:,.2f} "
+            f"(stddev {stddev:,.2f}, {z})")
+
+
+def main(args):
+    """`patchmgr anomalies`: values flagged by recent syncs"""
+    conn = db.connect_private()
+    try:
+        create_tables(conn)
+        cursor = conn.cursor()
+        try:
+            counts = registry.fetchall(cursor, 'anomalies.state_counts', {'min_samples': MIN_SAMPLES})
+            rows = registry.fetchall(cursor, 'anomalies.recent_events', {
+                'days': args.days, 'scope': args.scope, 'limit': args.limit,
+            })
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+    print("TRACKED SERIES")
+    print("=" * 80)
+    print(f"{'Scope':8s} | {'Metric':20s} | {'Series':>8s} | {'Scored':>8s} | Last snapshot")
+    print("-" * 80)
+    for scope, metric, series, scored, last in counts:
+        print(f"{scope:8s} | {metric:20s} | {series:8,d} | {scored:8,d} | {last:%Y-%m-%d %H:%M}")
+    if not counts:
+        print("(none yet - every patchmgr sync adds a sample)")
+    print(f"\nSeries are scored once they have {MIN_SAMPLES} samples.")
+
+    print(f"\nANOMALIES IN THE LAST {args.days} DAYS")
+    print("=" * 120)
+    print(f"{'Snapshot':16s} | {'Scope':6s} | {'System / domain':30s} | {'Metric':16s} | {'Value':>9s} | "
+          f"{'Expected':>9s} | {'Stddev':>8s} | {'z':>6s}")
+    print("-" * 120)
+    for taken, scope, label, metric, value, expected, stddev, z_score, _ in rows:
+        z = f"{z_score:+6.1f}" if z_score is not None else f"{'-':>6s}"
+        print(f"{taken:%Y-%m-%d %H:%M} | {scope:6s} | {(label or '?')[:30]:30s} | {metric:16s} | {value:9,.2f} | "
+              f"{expected:9,.2f} | {stddev:8,.2f} | {z}")
+    if not rows:
+        print("(no anomalies)")
+    return 0
@@ -0,0 +1,437 @@
+"""
+Local read-only HTTP API over an in-memory snapshot of patch_compliance
+
+`patchmgr serve` loads patch_compliance into memory with one query and
+answers JSON requests from it, so dashboards and scripts share one reader
+of the private database instead of each opening a connection:
+
+    GET /api/health                 snapshot time and row count
+    GET /api/summary                fleet totals, risk and contact counts, per-domain figures
+    GET /api/top?n=10               systems most in need of patches (priority order)
+    GET /api/systems?domain=CORP&risk=critical&contact=stale&min_compliance=50
+                    &max_compliance=90&name_prefix=web&sort=priority|name|compliance
+                    &limit=50&offset=0
+    GET /api/systems/<resource_id>  every column of one system
+
+The server LISTENs on the patchmgr_sync channel, which the sync NOTIFYs
+after loading, and reloads the snapshot on the same connection. Responses
+are built once per snapshot and URL and kept with their gzip encoding and
+an ETag (a hash of the body), so a repeated request writes cached bytes and
+an If-None-Match for unchanged data gets 304 Not Modified, also across
+reloads that didn't change anything. Contact status and risk level are as of
+the snapshot load.
+
+Binds to 127.0.0.1 by default; there is no authentication.
+"""
+
+import gzip
+import hashlib
+import json
+import select
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from . import db, registry
+from .sync import SYNC_CHANNEL as CHANNEL
+
+# The totals are NULL for systems PMP has no patch count row for; they count
+# as 0 here so summaries and reports can add them up
+SNAPSHOT_SQL = """
+    SELECT
+        resource_id,
+        system_name,
+        system_domain,
+        fqdn_name,
+        friendly_name,
+        resource_type,
+        agent_version,
+        last_contact,
+        last_patch_date,
+        system_added_date,
+        snapshot_date,
+        patch_compliance_pct,
+        coalesce(missing_patches_total, 0) AS missing_patches_total,
+        coalesce(installed_patches_total, 0) AS installed_patches_total,
+        coalesce(missing_ms_patches, 0) AS missing_ms_patches,
+        coalesce(missing_tp_patches, 0) AS missing_tp_patches,
+        coalesce(missing_driver_patches, 0) AS missing_driver_patches,
+        coalesce(missing_bios_patches, 0) AS missing_bios_patches,
+        missing_critical,
+        missing_important,
+        missing_moderate,
+        missing_low,
+        missing_unrated,
+        CASE
+            WHEN last_contact > NOW() - INTERVAL '7 days' THEN 'Active'
+            WHEN last_contact > NOW() - INTERVAL '30 days' THEN 'Stale'
+            ELSE 'Inactive'
+        END as contact_status,
+        CASE
+            WHEN missing_critical > 0 THEN 'Critical'
+            WHEN missing_important > 0 THEN 'Important'
+            WHEN missing_moderate > 0 THEN 'Moderate'
+            WHEN coalesce(missing_patches_total, 0) > 0 THEN 'Low'
+            ELSE 'Compliant'
+        END as risk_level
+    FROM patch_compliance
+    ORDER BY missing_critical DESC, missing_important DESC, coalesce(missing_patches_total, 0) DESC, resource_id DESC;
+"""
+
+registry.register_all('api', {'snapshot': SNAPSHOT_SQL})
+
+# Columns in /api/systems and /api/top entries; /api/systems/<id> has them all
+LIST_COLUMNS = ['resource_id', 'system_name', 'system_domain', 'last_contact', 'patch_compliance_pct',
+                'missing_patches_total', 'missing_critical', 'missing_important', 'contact_status', 'risk_level']
+
+RISK_LEVELS = ['Critical', 'Important', 'Moderate', 'Low', 'Compliant']
+CONTACT_STATUSES = ['Active', 'Stale', 'Inactive']
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+# Distinct URLs cached per snapshot before the cache starts over
+MAX_CACHED = 1024
+# Responses smaller than this are sent uncompressed
+GZIP_MIN_BYTES = 1024
+
+SORTS = {
+    'priority': None,  # snapshot order
+    'name': lambda row: ((row['system_name'] or '').lower(), row['resource_id']),
+    'compliance': lambda row: (row['patch_compliance_pct'], row['resource_id']),
+}
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class Snapshot:
+    """patch_compliance rows in priority order, with the responses built from them"""
+
+    def __init__(self, columns, rows):
+        self.rows = [{column: _json_value(value) for column, value in zip(columns, row)} for row in rows]
+        self.by_id = {row['resource_id']: row for row in self.rows}
+        self.loaded_at = datetime.now().isoformat(timespec='seconds')
+        self.synced_at = max((row['snapshot_date'] for row in self.rows if row['snapshot_date']), default=None)
+        self._sorted = {}
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def health(self):
+        return {'systems': len(self.rows), 'synced_at': self.synced_at, 'loaded_at': self.loaded_at}
+
+    def summary(self):
+        rows = self.rows
+        domains = {}
+        for row in rows:
+            domain = domains.setdefault(row['system_domain'] or 'N/A', [0, 0, 0, 0.0])
+            domain[0] += 1
+            domain[1] += row['missing_critical'] > 0
+            domain[2] += row['missing_patches_total']
+            domain[3] += row['patch_compliance_pct'] or 0
+        return {
+            'synced_at': self.synced_at,
+            'total_systems': len(rows),
+            'systems_with_missing': sum(row['missing_patches_total'] > 0 for row in rows),
+            'systems_critical': sum(row['missing_critical'] > 0 for row in rows),
+            'total_missing': sum(row['missing_patches_total'] for row in rows),
+            'avg_compliance': round(sum(row['patch_compliance_pct'] or 0 for row in rows) / len(rows), 2)
+            if rows else None,
+            'risk_levels': {level: sum(row['risk_level'] == level for row in rows) for level in RISK_LEVELS},
+            'contact_status': {status: sum(row['contact_status'] == status for row in rows)
+                               for status in CONTACT_STATUSES},
+            'domains': [
+                {'domain': name, 'systems': count, 'systems_critical': critical, 'missing': missing,
+                 'avg_compliance': round(compliance / count, 2)}
+                for name, (count, critical, missing, compliance) in sorted(domains.items())
+            ],
+        }
+
+    def ordered(self, sort):
+        """Rows in a SORTS order, sorted once per snapshot"""
+        if SORTS[sort] is None:
+            return self.rows
+        rows = self._sorted.get(sort)
+        if rows is None:
+            rows = self._sorted[sort] = sorted(self.rows, key=SORTS[sort])
+        return rows
+
+    def systems(self, params):
+        """Filtered, sorted page of systems; raises ValueError for a bad parameter"""
+        sort = params.get('sort', 'priority')
+        if sort not in SORTS:
+            raise ValueError(f"sort must be one of {', '.join(SORTS)}")
+        limit = _int_param(params, 'limit', DEFAULT_LIMIT, 1, MAX_LIMIT)
+        offset = _int_param(params, 'offset', 0, 0, None)
+
+        tests = []
+        if 'domain' in params:
+            tests.append(lambda row, value=params['domain']: row['system_domain'] == value)
+        if 'risk' in params:
+            tests.append(lambda row, value=_choice(params, 'risk', RISK_LEVELS): row['risk_level'] == value)
+        if 'contact' in params:
+            tests.append(lambda row, value=_choice(params, 'contact', CONTACT_STATUSES):
+                         row['contact_status'] == value)
+        if 'min_compliance' in params:
+            tests.append(lambda row, value=_float_param(params, 'min_compliance'):
+                         (row['patch_compliance_pct'] or 0) >= value)
+        if 'max_compliance' in params:
+            tests.append(lambda row, value=_float_param(params, 'max_compliance'):
+                         (row['patch_compliance_pct'] or 0) <= value)
+        if 'name_prefix' in params:
+            tests.append(lambda row, value=params['name_prefix'].lower():
+                         (row['system_name'] or '').lower().startswith(value))
+
+        matches = [row for row in self.ordered(sort) if all(test(row) for test in tests)]
+        return {
+            'total': len(matches),
+            'offset': offset,
+            'limit': limit,
+            'systems': [_list_entry(row) for row in matches[offset:offset + limit]],
+        }
+
+    def top(self, params):
+        n = _int_param(params, 'n', 10, 1, MAX_LIMIT)
+        return {'systems': [_list_entry(row) for row in self.rows[:n]]}
+
+    def response(self, key, build):
+        """(etag, body, gzipped body or None) for a URL, built on first request"""
+        cached = self._responses.get(key)
+        if cached is None:
+            body = json.dumps(build(), separators=(',', ':')).encode('utf-8')
+            etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+            compressed = gzip.compress(body, 6) if len(body) >= GZIP_MIN_BYTES else None
+            cached = (etag, body, compressed)
+            with self._lock:
+                if len(self._responses) >= MAX_CACHED:
+                    self._responses.clear()
+                self._responses[key] = cached
+        return cached
+
+
+def _list_entry(row):
+    return {column: row[column] for column in LIST_COLUMNS}
+
+
+def _int_param(params, name, default, low, high):
+    if name not in params:
+        return default
+    try:
+        value = int(params[name])
+    except ValueError:
+        raise ValueError(f"{name} must be a whole number") from None
+    if value < low or (high is not None and value > high):
+        raise ValueError(f"{name} must be between {low} and {high}" if high is not None
+                         else f"{name} must be at least {low}")
+    return value
+
+
+def _float_param(params, name):
+    try:
+        return float(params[name])
+    except ValueError:
+        raise ValueError(f"{name} must be a number") from None
+
+
+def _choice(params, name, choices):
+    value = params[name].capitalize()
+    if value not in choices:
+        raise ValueError(f"{name} must be one of {', '.join(choice.lower() for choice in choices)}")
+    return value
+
+
+def load_snapshot(priv_conn):
+    """A Snapshot of patch_compliance, read in one query"""
+    cursor = priv_conn.cursor()
+    try:
+        rows = registry.fetchall(cursor, 'api.snapshot')
+        columns = [column[0] for column in cursor.description]
+    finally:
+        cursor.close()
+    return Snapshot(columns, rows)
+
+
+class NotFound(Exception):
+    pass
+
+
+def route(snapshot, path, params):
+    """(cache key, builder) for a request path; raises NotFound"""
+    path = path.rstrip('/')
+    key = path + '?' + '&'.join(f'{name}={value}' for name, value in sorted(params.items()))
+    if path == '/api/health':
+        return key, snapshot.health
+    if path == '/api/summary':
+        return key, snapshot.summary
+    if path == '/api/top':
+        return key, lambda: snapshot.top(params)
+    if path == '/api/systems':
+        return key, lambda: snapshot.systems(params)
+    if path.startswith('/api/systems/'):
+        try:
+            row = snapshot.by_id.get(int(path[len('/api/systems/'):]))
+        except ValueError:
+            row = None
+        if row is None:
+            raise NotFound(f"no system {path[len('/api/systems/'):]}")
+        return key, lambda: row
+    raise NotFound(f"no endpoint {path}")
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+
+class Handler(BaseHTTPRequestHandler):
+    """GET requests against server.snapshot"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'patchmgr'
+    # Headers and body are separate writes; without TCP_NODELAY each keep-alive
+    # response would wait out the client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        snapshot = self.server.snapshot
+        try:
+            key, build = route(snapshot, url.path, params)
+            etag, body, compressed = snapshot.response(key, build)
+        except NotFound as e:
+            return self._error(404, str(e))
+        except ValueError as e:
+            return self._error(400, str(e))
+
+        use_gzip = compressed is not None and 'gzip' in self.headers.get('Accept-Encoding', '')
+        if use_gzip:
+            etag = etag[:-1] + '-gzip"'
+        if _etag_matches(self.headers.get('If-None-Match'), etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+            body = compressed
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        body = json.dumps({'error': message}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.log_requests:
+            super().log_message(format, *args)
+
+
+def connect_listener():
+    """A private database connection LISTENing for sync notifications"""
+    conn = db.connect_private(profiled=False)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"LISTEN {CHANNEL};")
+    finally:
+        cursor.close()
+    return conn
+
+
+def listen(server, conn, retry=30):
+    """
+    Keep server.snapshot current: reload on each sync notification
+
+    Runs until interrupted. A lost connection is reopened after retry
+    seconds, and the snapshot reloaded in case a sync finished meanwhile.
+    """
+    while True:
+        try:
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    conn.notifies.clear()
+                    _reload(server, conn)
+        except Exception as e:
+            print(f"ERROR: Lost the private database connection: {e} (reconnecting in {retry}s)")
+        conn.close()
+        while True:
+            time.sleep(retry)
+            try:
+                conn = connect_listener()
+                _reload(server, conn)
+                break
+            except Exception as e:
+                print(f"ERROR: Failed to reconnect to private database: {e} (retrying in {retry}s)")
+
+
+def _reload(server, conn):
+    start = time.perf_counter()
+    snapshot = load_snapshot(conn)
+    server.snapshot = snapshot
+    print(f"{datetime.now():%Y-%m-%d %H:%M:%S} Loaded {len(snapshot.rows):,} systems "
+          f"(synced {snapshot.synced_at or 'never'}) in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+def main(args):
+    """`patchmgr serve`: run the local JSON API until interrupted"""
+    try:
+        conn = connect_listener()
+    except Exception as e:
+        print(f"ERROR: Failed to connect to private database: {e}")
+        return 1
+    try:
+        snapshot = load_snapshot(conn)
+    except Exception as e:
+        conn.close()
+        print(f"ERROR: Failed to load patch_compliance: {e}")
+        print("Run patchmgr sync first to create patch_compliance.")
+        return 1
+
+    try:
+        server = ThreadingHTTPServer((args.host, args.port), Handler)
+    except OSError as e:
+        conn.close()
+        print(f"ERROR: Cannot listen on {args.host}:{args.port}: {e}")
+        return 1
+    server.daemon_threads = True
+    server.snapshot = snapshot
+    server.log_requests = args.log
+
+    print("=" * 80)
+    print(f"PATCH COMPLIANCE API on http://{args.host}:{args.port}/api/summary")
+    print("=" * 80)
+    print(f"Serving {len(snapshot.rows):,} systems; reloading on NOTIFY {CHANNEL} (sent by patchmgr sync)")
+    print("Press Ctrl+C to stop\n")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        listen(server, conn)
+    except KeyboardInterrupt:
+        print("\nStopping")
+    finally:
+        server.shutdown()
+        server.server_close()
+    return 0
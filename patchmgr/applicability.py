@@ -0,0 +1,318 @@
+"""
+Collection and deployment planning from a precomputed applicability table
+
+`patchmgr extract` mirrors PMP's collections (collection, collectiontopatch,
+collntoresources) and deployment policies into pmp_* tables. From those,
+collection_applicability holds one row per (collection, system, patch) where
+the collection targets the system, includes the patch, and the patch is
+missing on that system (its affectedpatchstatus row is in one of
+compliance_sql.MISSING_STATUSES; ignored and installed patches are left out).
+collection_impact holds the per-collection totals.
+
+Both are refreshed incrementally. Only mappings that appeared, changed or went
+away are written, and only the collections they belong to are re-totalled. Planning
+questions then come down to index lookups:
+
+- which systems will collection X touch?   collection_applicability (collection_id, ...)
+- how many missing criticals does it close? collection_impact (collection_id)
+- which collections touch system Y?        collection_applicability (resource_id)
+"""
+
+import re
+
+from . import db, registry
+from .compliance_sql import missing_status
+
+# Mirrors the applicability is built from
+SOURCE_TABLES = ['collection', 'collectiontopatch', 'collntoresources', 'deploymentpolicy',
+                 'collectiontodeploymentpolicy', 'affectedpatchstatus']
+
+CREATE_APPLICABILITY_SQL = """
+CREATE TABLE IF NOT EXISTS collection_applicability (
+    collection_id BIGINT NOT NULL,
+    resource_id BIGINT NOT NULL,
+    patch_id BIGINT NOT NULL,
+    severity_id INTEGER,
+    status_id INTEGER,
+    refreshed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (collection_id, resource_id, patch_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_collection_applicability_severity
+    ON collection_applicability(collection_id, severity_id) INCLUDE (resource_id);
+CREATE INDEX IF NOT EXISTS idx_collection_applicability_system
+    ON collection_applicability(resource_id) INCLUDE (collection_id);
+
+CREATE TABLE IF NOT EXISTS collection_impact (
+    collection_id BIGINT PRIMARY KEY,
+    collection_name VARCHAR(255),
+    deployment_policies TEXT,
+    systems INTEGER NOT NULL DEFAULT 0,
+    patches INTEGER NOT NULL DEFAULT 0,
+    missing INTEGER NOT NULL DEFAULT 0,
+    missing_critical INTEGER NOT NULL DEFAULT 0,
+    missing_important INTEGER NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_collection_impact_name ON collection_impact(lower(collection_name));
+CREATE INDEX IF NOT EXISTS idx_collection_impact_priority ON collection_impact(missing_critical DESC, missing DESC);
+
+COMMENT ON TABLE collection_applicability IS 'Missing patches each collection would deploy, per system; refreshed from the pmp_* mirrors';
+COMMENT ON TABLE collection_impact IS 'Per-collection totals of collection_applicability';
+"""
+
+# Upserts changed mappings, deletes vanished ones, and records the collections
+# either touched so only those are re-totalled. A mapping whose patch stops
+# being missing (installed, ignored) drops out of source and is deleted.
+REFRESH_APPLICABILITY_SQL = f"""
+CREATE TEMP TABLE changed_collections (collection_id BIGINT) ON COMMIT DROP;
+
+WITH source AS (
+    SELECT cp.collection_id, cr.resource_id, cp.patch_id, pd.severityid AS severity_id, a.status_id
+    FROM pmp_collectiontopatch cp
+    JOIN pmp_collntoresources cr ON cr.collection_id = cp.collection_id
+    JOIN pmp_affectedpatchstatus a ON a.resource_id = cr.resource_id AND a.patch_id = cp.patch_id
+    LEFT JOIN pmp_patchdetails pd ON pd.patchid = cp.patch_id
+    WHERE {missing_status('a.status')}
+),
+upserted AS (
+    INSERT INTO collection_applicability (collection_id, resource_id, patch_id, severity_id, status_id)
+    SELECT * FROM source
+    ON CONFLICT (collection_id, resource_id, patch_id) DO UPDATE SET
+        severity_id = EXCLUDED.severity_id,
+        status_id = EXCLUDED.status_id,
+        refreshed_at = CURRENT_TIMESTAMP
+    WHERE (collection_applicability.severity_id, collection_applicability.status_id)
+        IS DISTINCT FROM (EXCLUDED.severity_id, EXCLUDED.status_id)
+    RETURNING collection_id
+),
+deleted AS (
+    DELETE FROM collection_applicability ca
+    WHERE NOT EXISTS (
+        SELECT 1 FROM source s
+        WHERE s.collection_id = ca.collection_id
+        AND s.resource_id = ca.resource_id
+        AND s.patch_id = ca.patch_id
+    )
+    RETURNING collection_id
+)
+INSERT INTO changed_collections
+SELECT collection_id FROM upserted
+UNION ALL
+SELECT collection_id FROM deleted;
+"""
+
+# Names and policies can change without any mapping changing
+MARK_RENAMED_SQL = """
+INSERT INTO changed_collections
+SELECT c.collection_id
+FROM pmp_collection c
+LEFT JOIN collection_impact i ON i.collection_id = c.collection_id
+WHERE i.collection_id IS NULL
+   OR i.collection_name IS DISTINCT FROM c.collection_name
+   OR i.deployment_policies IS DISTINCT FROM (
+        SELECT string_agg(p.deployment_policy_name, ', ' ORDER BY p.deployment_policy_name)
+        FROM pmp_collectiontodeploymentpolicy cp
+        JOIN pmp_deploymentpolicy p ON p.deployment_policy_id = cp.deployment_policy_id
+        WHERE cp.collection_id = c.collection_id
+   )
+UNION ALL
+SELECT i.collection_id
+FROM collection_impact i
+WHERE NOT EXISTS (SELECT 1 FROM pmp_collection c WHERE c.collection_id = i.collection_id);
+"""
+
+REFRESH_IMPACT_SQL = """
+DELETE FROM collection_impact
+WHERE collection_id IN (SELECT collection_id FROM changed_collections);
+
+INSERT INTO collection_impact
+    (collection_id, collection_name, deployment_policies, systems, patches, missing, missing_critical, missing_important)
+SELECT
+    ids.collection_id,
+    c.collection_name,
+    (SELECT string_agg(p.deployment_policy_name, ', ' ORDER BY p.deployment_policy_name)
+     FROM pmp_collectiontodeploymentpolicy cp
+     JOIN pmp_deploymentpolicy p ON p.deployment_policy_id = cp.deployment_policy_id
+     WHERE cp.collection_id = ids.collection_id),
+    COUNT(DISTINCT ca.resource_id),
+    COUNT(DISTINCT ca.patch_id),
+    COUNT(ca.patch_id),
+    COUNT(ca.patch_id) FILTER (WHERE ca.severity_id = 4),
+    COUNT(ca.patch_id) FILTER (WHERE ca.severity_id = 3)
+FROM (SELECT DISTINCT collection_id FROM changed_collections) ids
+JOIN pmp_collection c ON c.collection_id = ids.collection_id
+LEFT JOIN collection_applicability ca ON ca.collection_id = ids.collection_id
+GROUP BY ids.collection_id, c.collection_name;
+"""
+
+CHANGE_COUNTS_SQL = "SELECT COUNT(DISTINCT collection_id) FROM changed_collections;"
+
+IMPACT_SQL = """
+    SELECT collection_id, collection_name, deployment_policies, systems, patches,
+           missing, missing_critical, missing_important
+    FROM collection_impact
+    WHERE collection_id = %(collection_id)s;
+"""
+
+IMPACT_BY_NAME_SQL = """
+    SELECT collection_id, collection_name, deployment_policies, systems, patches,
+           missing, missing_critical, missing_important
+    FROM collection_impact
+    WHERE lower(collection_name) LIKE %(pattern)s
+    ORDER BY missing_critical DESC, missing DESC
+    LIMIT %(limit)s;
+"""
+
+TOP_IMPACT_SQL = """
+    SELECT collection_id, collection_name, deployment_policies, systems, patches,
+           missing, missing_critical, missing_important
+    FROM collection_impact
+    ORDER BY missing_critical DESC, missing DESC
+    LIMIT %(limit)s;
+"""
+
+COLLECTION_SYSTEMS_SQL = """
+    SELECT ca.resource_id,
+           pc.system_name,
+           COUNT(*) AS missing,
+           COUNT(*) FILTER (WHERE ca.severity_id = 4) AS missing_critical
+    FROM collection_applicability ca
+    LEFT JOIN patch_compliance pc ON pc.resource_id = ca.resource_id
+    WHERE ca.collection_id = %(collection_id)s
+    GROUP BY ca.resource_id, pc.system_name
+    ORDER BY missing_critical DESC, missing DESC, pc.system_name;
+"""
+
+registry.register_all('collections', {
+    'impact': IMPACT_SQL,
+    'impact_by_name': IMPACT_BY_NAME_SQL,
+    'top_impact': TOP_IMPACT_SQL,
+    'systems': COLLECTION_SYSTEMS_SQL,
+}, prepare={'impact', 'systems'})
+
+
+def create_tables(priv_conn):
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute(CREATE_APPLICABILITY_SQL)
+        priv_conn.commit()
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def refresh(priv_conn):
+    """
+    Bring collection_applicability and collection_impact up to date with the mirrors
+
+    Returns (mappings written or removed, collections re-totalled).
+    """
+    create_tables(priv_conn)
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute(REFRESH_APPLICABILITY_SQL)
+        changed = cursor.rowcount
+        cursor.execute(MARK_RENAMED_SQL)
+        cursor.execute(REFRESH_IMPACT_SQL)
+        cursor.execute(CHANGE_COUNTS_SQL)
+        collections = cursor.fetchone()[0]
+        priv_conn.commit()
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    priv_conn.autocommit = True
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute("ANALYZE collection_applicability;")
+        cursor.execute("ANALYZE collection_impact;")
+    finally:
+        cursor.close()
+        priv_conn.autocommit = False
+    return changed, collections
+
+
+def impact(priv_conn, collection):
+    """collection_impact rows for a collection ID, or for names containing the text"""
+    cursor = priv_conn.cursor()
+    try:
+        if str(collection).isdigit():
+            rows = registry.fetchall(cursor, 'collections.impact', {'collection_id': int(collection)})
+            if rows:
+                return rows
+        pattern = '%' + re.sub(r'([%_\\])', r'\\\1', str(collection).lower()) + '%'
+        return registry.fetchall(cursor, 'collections.impact_by_name', {'pattern': pattern, 'limit': 20})
+    finally:
+        cursor.close()
+
+
+def systems(priv_conn, collection_id):
+    """[(resource_id, system_name, missing, missing_critical)] a collection would patch"""
+    cursor = priv_conn.cursor()
+    try:
+        return registry.fetchall(cursor, 'collections.systems', {'collection_id': collection_id})
+    finally:
+        cursor.close()
+
+
+def print_impact(rows):
+    print(f"{'ID':>8s} | {'Collection':35s} | {'Systems':>7s} | {'Patches':>7s} | {'Missing':>8s} | "
+          f"{'Critical':>8s} | {'Important':>9s} | Deployment policy")
+    print("-" * 120)
+    for collection_id, name, policies, system_count, patches, missing, critical, important in rows:
+        print(f"{collection_id:8d} | {(name or '')[:35]:35s} | {system_count:7,d} | {patches:7,d} | {missing:8,d} | "
+              f"{critical:8,d} | {important:9,d} | {policies or '-'}")
+
+
+def main(args):
+    """`patchmgr collections`: what a collection or deployment would touch"""
+    conn = db.connect_private()
+    try:
+        if args.refresh:
+            try:
+                changed, collections = refresh(conn)
+                print(f"Applicability refreshed: {changed:,} mappings added, changed or removed "
+                      f"in {collections:,} collections")
+            except Exception as e:
+                print(f"ERROR: Failed to refresh collection_applicability: {e}")
+                print("Run patchmgr extract first to mirror the collection tables.")
+                return 1
+
+        try:
+            if not args.collection:
+                cursor = conn.cursor()
+                try:
+                    rows = registry.fetchall(cursor, 'collections.top_impact', {'limit': args.limit})
+                finally:
+                    cursor.close()
+                print(f"Collections by missing critical patches closed (top {args.limit})")
+                print("=" * 120)
+                print_impact(rows)
+                return 0
+
+            rows = impact(conn, ' '.join(args.collection))
+        except Exception as e:
+            print(f"ERROR: Lookup failed: {e}")
+            print("Build the table with: patchmgr collections --refresh")
+            return 1
+        if not rows:
+            print(f"No collection matches '{' '.join(args.collection)}'")
+            return 1
+
+        print_impact(rows)
+        if len(rows) == 1 and args.systems:
+            print(f"\nSystems collection {rows[0][0]} would patch")
+            print("=" * 80)
+            print(f"{'Resource':>10s} | {'System':40s} | {'Missing':>8s} | {'Critical':>8s}")
+            print("-" * 80)
+            for resource_id, name, missing, critical in systems(conn, rows[0][0]):
+                print(f"{resource_id:10d} | {(name or f'(ID: {resource_id})')[:40]:40s} | {missing:8,d} | {critical:8,d}")
+    finally:
+        conn.close()
+    return 0
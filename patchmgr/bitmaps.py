@@ -0,0 +1,519 @@
+"""
+In-memory bitmap index of missing patches (`patchmgr missing`)
+
+Built from the pmp_affectedpatchstatus mirror and patch_compliance after a
+sync and extract, with the same missing rows as the simulator (status in
+compliance_sql.MISSING_STATUSES; ignored and installed patches are left
+out, see simulate.load_missing). Systems are numbered 0..n-1. The index holds:
+
+- per patch, a compressed bitmap of the systems missing it
+- per system, its sorted missing patches (CSR arrays)
+- every patch ID and KB in pmp_patchdetails, so a patch nobody is missing
+  matches no systems instead of being unknown
+
+The bitmaps are roaring-style. Each 65,536-system chunk is a sorted uint16
+array while it holds at most 4,096 systems, and a 1,024-word (8 KB) bitset
+once it is denser. AND, OR and ANDNOT work chunk by chunk, so "missing any
+of these KBs but none of those" is a handful of numpy operations instead of
+nested EXISTS queries over affectedpatchstatus.
+
+The index is saved as one .npz file (PATCHMGR_MISSING_INDEX, default
+missing-index.npz). Loading it makes views into the saved arrays, so queries
+need neither database. Needs numpy (pip install patchmgr[simulate]).
+"""
+
+import json
+import re
+import time
+from datetime import datetime
+
+from . import config, db, registry
+
+# Bump when the saved index changes meaning; older files are rebuilt
+# (2: only missing-status rows, 3: the patch catalog)
+FORMAT = 3
+
+ARRAY_MAX = 4096
+CHUNK_BITS = 16
+
+SEVERITIES = {'critical': 4, 'important': 3, 'moderate': 2, 'low': 1, 'unrated': 0}
+
+SYSTEMS_SQL = "SELECT resource_id, system_name FROM patch_compliance ORDER BY resource_id;"
+
+PATCHES_SQL = """
+    SELECT patchid, upper(substring(description FROM '(?i)KB[0-9]{6,8}'))
+    FROM pmp_patchdetails;
+"""
+
+registry.register_all('bitmaps', {
+    'systems': SYSTEMS_SQL,
+    'patches': PATCHES_SQL,
+})
+
+
+def _np():
+    import numpy
+
+    return numpy
+
+
+def _is_bitset(container):
+    return container.dtype.kind == 'u' and container.dtype.itemsize == 8
+
+
+def _bitset(values):
+    """1,024-word bitset of uint16 values"""
+    np = _np()
+    bits = np.zeros(1 << CHUNK_BITS, dtype=bool)
+    bits[values] = True
+    return np.packbits(bits, bitorder='little').view(np.uint64)
+
+
+def _values(words):
+    """Sorted uint16 values set in a bitset"""
+    np = _np()
+    return np.flatnonzero(np.unpackbits(words.view(np.uint8), bitorder='little')).astype(np.uint16)
+
+
+def _count(container):
+    np = _np()
+    if _is_bitset(container):
+        return int(np.unpackbits(container.view(np.uint8)).sum())
+    return len(container)
+
+
+def _contains(words, values):
+    """Mask of which uint16 values are set in a bitset"""
+    np = _np()
+    values = values.astype(np.uint32)
+    return ((words[values >> 6] >> (values & 63).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+
+def _normalize(words):
+    """Keep a bitset only while it is denser than ARRAY_MAX; None when empty"""
+    count = _count(words)
+    if count == 0:
+        return None
+    return words if count > ARRAY_MAX else _values(words)
+
+
+def _and(a, b):
+    np = _np()
+    if _is_bitset(a) and _is_bitset(b):
+        return _normalize(a & b)
+    if _is_bitset(a):
+        a, b = b, a
+    result = a[_contains(b, a)] if _is_bitset(b) else np.intersect1d(a, b, assume_unique=True)
+    return result if len(result) else None
+
+
+def _or(a, b):
+    np = _np()
+    if _is_bitset(a) and _is_bitset(b):
+        return a | b
+    if _is_bitset(a):
+        a, b = b, a
+    if _is_bitset(b):
+        return b | _bitset(a)
+    result = np.union1d(a, b).astype(np.uint16)
+    return _bitset(result) if len(result) > ARRAY_MAX else result
+
+
+def _andnot(a, b):
+    np = _np()
+    if _is_bitset(a):
+        return _normalize(a & ~(b if _is_bitset(b) else _bitset(b)))
+    result = a[~_contains(b, a)] if _is_bitset(b) else np.setdiff1d(a, b, assume_unique=True)
+    return result if len(result) else None
+
+
+class Bitmap:
+    """Roaring-style compressed set of non-negative integers below 2**32"""
+
+    __slots__ = ('containers',)
+
+    def __init__(self, containers=None):
+        # chunk (value >> 16) -> sorted uint16 array or uint64 bitset
+        self.containers = containers or {}
+
+    @classmethod
+    def from_sorted(cls, values):
+        """Bitmap of a sorted array of distinct values"""
+        np = _np()
+        values = np.asarray(values, dtype=np.uint32)
+        highs = values >> CHUNK_BITS
+        chunks, starts = np.unique(highs, return_index=True)
+        ends = list(starts[1:]) + [len(values)]
+        containers = {}
+        for chunk, start, end in zip(chunks.tolist(), starts.tolist(), ends):
+            low = (values[start:end] & 0xFFFF).astype(np.uint16)
+            containers[chunk] = _bitset(low) if len(low) > ARRAY_MAX else low
+        return cls(containers)
+
+    @classmethod
+    def full(cls, size):
+        """Bitmap of 0..size-1"""
+        return cls.from_sorted(_np().arange(size))
+
+    def _combine(self, other, op, keys):
+        containers = {}
+        for chunk in keys:
+            a, b = self.containers.get(chunk), other.containers.get(chunk)
+            result = op(a, b) if a is not None and b is not None else (a if a is not None else b)
+            if result is not None:
+                containers[chunk] = result
+        return Bitmap(containers)
+
+    def __and__(self, other):
+        return self._combine(other, _and, [c for c in self.containers if c in other.containers])
+
+    def __or__(self, other):
+        return self._combine(other, _or, sorted(set(self.containers) | set(other.containers)))
+
+    def __sub__(self, other):
+        # ANDNOT: chunks only in self are kept as they are
+        return self._combine(other, _andnot, list(self.containers))
+
+    def __len__(self):
+        return sum(_count(container) for container in self.containers.values())
+
+    def __contains__(self, value):
+        container = self.containers.get(value >> CHUNK_BITS)
+        if container is None:
+            return False
+        low = _np().array([value & 0xFFFF], dtype=_np().uint16)
+        if _is_bitset(container):
+            return bool(_contains(container, low)[0])
+        return bool(len(_np().intersect1d(container, low)))
+
+    def to_array(self):
+        """Sorted uint32 array of the members"""
+        np = _np()
+        parts = [
+            (_values(c) if _is_bitset(c) else c).astype(np.uint32) + np.uint32(chunk << CHUNK_BITS)
+            for chunk, c in sorted(self.containers.items())
+        ]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint32)
+
+    def size_bytes(self):
+        return sum(c.nbytes for c in self.containers.values())
+
+    @staticmethod
+    def union(bitmaps):
+        result = Bitmap()
+        for bitmap in bitmaps:
+            result = result | bitmap
+        return result
+
+    @staticmethod
+    def intersection(bitmaps):
+        bitmaps = list(bitmaps)
+        result = bitmaps[0] if bitmaps else Bitmap()
+        for bitmap in bitmaps[1:]:
+            result = result & bitmap
+        return result
+
+
+class MissingIndex:
+    """Per-patch bitmaps of systems and per-system missing patches"""
+
+    def __init__(self, resource_ids, names, patch_ids, severities, kbs, bitmaps, indptr, indices, built_at,
+                 catalog_ids, catalog_kbs):
+        self.resource_ids = resource_ids
+        self.names = names
+        self.patch_ids = patch_ids
+        self.severities = severities
+        self.kbs = kbs
+        self.bitmaps = bitmaps
+        self.indptr = indptr
+        self.indices = indices
+        self.built_at = built_at
+        # Every known patch ID (sorted) and its KB number (0 for none)
+        self.catalog_ids = catalog_ids
+        self.catalog_kbs = catalog_kbs
+        self._by_kb = None
+
+    @classmethod
+    def build(cls, systems, missing, kbs):
+        """
+        From [(resource_id, name)], (resource_id, patch_id, severity_id) rows and {patch_id: KB}
+
+        kbs holds every known patch (KB None when it has none). Systems missing
+        patches but not in patch_compliance are indexed without a name.
+        """
+        np = _np()
+        names = dict(systems)
+        resource_ids = np.union1d(np.array(list(names), dtype=np.int64), missing[:, 0])
+        rows = np.searchsorted(resource_ids, missing[:, 0])
+        patch_ids, cols = np.unique(missing[:, 1], return_inverse=True)
+        severities = np.full(len(patch_ids), -1, dtype=np.int8)
+        severities[cols] = missing[:, 2]
+
+        # Per patch: sorted systems, split at patch boundaries
+        order = np.lexsort((rows, cols))
+        by_patch_rows, by_patch_cols = rows[order], cols[order]
+        starts = np.searchsorted(by_patch_cols, np.arange(len(patch_ids) + 1))
+        bitmaps = [Bitmap.from_sorted(by_patch_rows[starts[i]:starts[i + 1]]) for i in range(len(patch_ids))]
+
+        # Per system: sorted patches (CSR)
+        order = np.lexsort((cols, rows))
+        indices = cols[order].astype(np.int32)
+        indptr = np.searchsorted(rows[order], np.arange(len(resource_ids) + 1)).astype(np.int64)
+
+        catalog_ids = np.union1d(np.array(list(kbs), dtype=np.int64), patch_ids)
+        catalog_kbs = np.array([int(kbs[p][2:]) if kbs.get(p) else 0 for p in catalog_ids.tolist()], dtype=np.int32)
+
+        return cls(
+            resource_ids,
+            np.array([names.get(int(r)) or '' for r in resource_ids]),
+            patch_ids,
+            severities,
+            np.array([kbs.get(int(p)) or '' for p in patch_ids]),
+            bitmaps, indptr, indices,
+            datetime.now().isoformat(timespec='seconds'),
+            catalog_ids, catalog_kbs,
+        )
+
+    @classmethod
+    def load_from_db(cls, priv_conn):
+        from .simulate import load_missing
+
+        cursor = priv_conn.cursor()
+        try:
+            systems = registry.fetchall(cursor, 'bitmaps.systems')
+            kbs = dict(registry.fetchall(cursor, 'bitmaps.patches'))
+        finally:
+            cursor.close()
+        return cls.build(systems, load_missing(priv_conn), kbs)
+
+    # Serialization: every container of every bitmap goes into one of two
+    # payload arrays, with (patch, chunk, kind, offset, length) rows to find them
+
+    def save(self, path):
+        np = _np()
+        meta, arrays, bitsets = [], [], []
+        offsets = [0, 0]
+        for col, bitmap in enumerate(self.bitmaps):
+            for chunk, container in sorted(bitmap.containers.items()):
+                kind = int(_is_bitset(container))
+                (bitsets if kind else arrays).append(container)
+                meta.append((col, chunk, kind, offsets[kind], len(container)))
+                offsets[kind] += len(container)
+        header = {'built_at': self.built_at, 'format': FORMAT}
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                header=np.array(json.dumps(header)),
+                resource_ids=self.resource_ids, names=self.names,
+                patch_ids=self.patch_ids, severities=self.severities, kbs=self.kbs,
+                indptr=self.indptr, indices=self.indices,
+                catalog_ids=self.catalog_ids, catalog_kbs=self.catalog_kbs,
+                meta=np.array(meta, dtype=np.int64).reshape(-1, 5),
+                arrays=np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.uint16),
+                bitsets=np.concatenate(bitsets) if bitsets else np.zeros(0, dtype=np.uint64),
+            )
+
+    @classmethod
+    def load(cls, path):
+        np = _np()
+        data = np.load(path)
+        header = json.loads(str(data['header']))
+        if header.get('format') != FORMAT:
+            raise ValueError(f"{path} is index format {header.get('format')}, this patchmgr uses {FORMAT}")
+        arrays, bitsets = data['arrays'], data['bitsets']
+        patch_ids = data['patch_ids']
+        bitmaps = [Bitmap() for _ in range(len(patch_ids))]
+        for col, chunk, kind, offset, length in data['meta'].tolist():
+            payload = bitsets if kind else arrays
+            bitmaps[col].containers[chunk] = payload[offset:offset + length]
+        return cls(data['resource_ids'], data['names'], patch_ids, data['severities'], data['kbs'],
+                   bitmaps, data['indptr'], data['indices'], header['built_at'],
+                   data['catalog_ids'], data['catalog_kbs'])
+
+    # Queries
+
+    def resolve(self, term):
+        """
+        Patch columns for a patch ID or KB number
+
+        [] for a known patch no system is missing, None for an unknown one.
+        """
+        np = _np()
+        term = str(term).strip().upper()
+        if term.isdigit():
+            col = int(np.searchsorted(self.patch_ids, int(term)))
+            if col < len(self.patch_ids) and self.patch_ids[col] == int(term):
+                return [col]
+            known = int(np.searchsorted(self.catalog_ids, int(term)))
+            return [] if known < len(self.catalog_ids) and self.catalog_ids[known] == int(term) else None
+        if not re.fullmatch(r'\d{6,8}', term.replace('KB', '')):
+            return None
+        term = 'KB' + term.replace('KB', '')
+        if self._by_kb is None:
+            self._by_kb = {}
+            for col, kb in enumerate(self.kbs.tolist()):
+                if kb:
+                    self._by_kb.setdefault(kb, []).append(col)
+        if term in self._by_kb:
+            return self._by_kb[term]
+        return [] if bool((self.catalog_kbs == int(term[2:])).any()) else None
+
+    def _patches(self, terms):
+        """A bitmap per patch of terms; an empty one for a patch no system is missing"""
+        bitmaps, unknown = [], []
+        for term in terms:
+            found = self.resolve(term)
+            if found is None:
+                unknown.append(term)
+            elif found:
+                bitmaps.extend(self.bitmaps[col] for col in found)
+            else:
+                bitmaps.append(Bitmap())
+        if unknown:
+            raise ValueError(f"unknown patch: {', '.join(map(str, unknown))}")
+        return bitmaps
+
+    def query(self, any_of=(), all_of=(), none_of=()):
+        """Systems missing any of any_of, all of all_of and none of none_of"""
+        if any_of:
+            result = Bitmap.union(self._patches(any_of))
+            if all_of:
+                result = result & Bitmap.intersection(self._patches(all_of))
+        elif all_of:
+            result = Bitmap.intersection(self._patches(all_of))
+        else:
+            result = Bitmap.full(len(self.resource_ids))
+        if none_of:
+            result = result - Bitmap.union(self._patches(none_of))
+        return result
+
+    def systems(self, bitmap, limit=None):
+        """[(resource_id, name, missing patches)] for the members of a bitmap"""
+        rows = bitmap.to_array()[:limit]
+        return [(int(self.resource_ids[r]), str(self.names[r]), int(self.indptr[r + 1] - self.indptr[r]))
+                for r in rows]
+
+    def missing_patches(self, resource_id):
+        """Patch IDs a system is missing"""
+        np = _np()
+        row = int(np.searchsorted(self.resource_ids, resource_id))
+        if row >= len(self.resource_ids) or self.resource_ids[row] != resource_id:
+            return []
+        return self.patch_ids[self.indices[self.indptr[row]:self.indptr[row + 1]]].tolist()
+
+    def shared_sets(self, severity=None):
+        """
+        [(systems, patch IDs)] for each distinct missing-patch set, most common first
+
+        Each system's set is summarized as the wrapping sum of a fixed random
+        64-bit value per patch, so grouping is one sort instead of comparing
+        patch lists.
+        """
+        np = _np()
+        rows = np.repeat(np.arange(len(self.resource_ids)), np.diff(self.indptr))
+        cols = self.indices
+        if severity is not None:
+            keep = self.severities[cols] == severity
+            rows, cols = rows[keep], cols[keep]
+        if not len(rows):
+            return []
+        weights = np.random.default_rng(0).integers(0, 2 ** 63, len(self.patch_ids), dtype=np.uint64)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(rows)) + 1))
+        signatures = np.add.reduceat(weights[cols], starts)
+        _, first, counts = np.unique(signatures, return_index=True, return_counts=True)
+        result = []
+        for n in np.argsort(-counts, kind='stable'):
+            start = starts[first[n]]
+            end = starts[first[n] + 1] if first[n] + 1 < len(starts) else len(rows)
+            result.append((int(counts[n]), self.patch_ids[cols[start:end]].tolist()))
+        return result
+
+    def size_bytes(self):
+        return (sum(b.size_bytes() for b in self.bitmaps) + self.indptr.nbytes + self.indices.nbytes
+                + self.resource_ids.nbytes + self.patch_ids.nbytes)
+
+
+def build_index(path):
+    """Build the index from the private database and save it; returns it"""
+    conn = db.connect_private()
+    try:
+        index = MissingIndex.load_from_db(conn)
+    finally:
+        conn.close()
+    index.save(path)
+    return index
+
+
+def _label(index, col):
+    kb = str(index.kbs[col])
+    return f"{int(index.patch_ids[col])}" + (f" ({kb})" if kb else '')
+
+
+def main(args):
+    """`patchmgr missing`: set queries over which systems are missing which patches"""
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        print("ERROR: The missing-patch index needs numpy: pip install patchmgr[simulate]")
+        return 1
+    path = args.index or config.missing_index_path()
+
+    start = time.perf_counter()
+    try:
+        if args.build:
+            index = build_index(path)
+            print(f"Index built from the private database and saved to {path}")
+        else:
+            try:
+                index = MissingIndex.load(path)
+            except FileNotFoundError:
+                print(f"No index at {path} yet; building it from the private database...")
+                index = build_index(path)
+            except ValueError as e:
+                print(f"{e}; rebuilding it from the private database...")
+                index = build_index(path)
+    except Exception as e:
+        print(f"ERROR: Could not build the index: {e}")
+        print("Run patchmgr sync and patchmgr extract first.")
+        return 1
+    print(f"{len(index.resource_ids):,} systems x {len(index.patch_ids):,} patches, built {index.built_at}, "
+          f"{index.size_bytes() / 1024 / 1024:.1f} MB in memory, loaded in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    if args.system is not None:
+        patches = index.missing_patches(args.system)
+        cols = _np().searchsorted(index.patch_ids, patches)
+        print(f"\nSystem {args.system} is missing {len(patches):,} patches")
+        for col in cols[:args.limit]:
+            print(f"  {_label(index, col)}")
+        return 0
+
+    if args.shared:
+        severity = SEVERITIES.get(args.severity) if args.severity != 'all' else None
+        start = time.perf_counter()
+        sets = index.shared_sets(severity)
+        print(f"\nDistinct missing {args.severity} patch sets: {len(sets):,} "
+              f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+        print(f"{'Systems':>8s} | {'Patches':>7s} | Patch IDs")
+        print("-" * 80)
+        for count, patch_ids in sets[:args.limit]:
+            shown = ', '.join(map(str, patch_ids[:8])) + (' ...' if len(patch_ids) > 8 else '')
+            print(f"{count:8,d} | {len(patch_ids):7d} | {shown}")
+        return 0
+
+    if not (args.any or args.all or args.none):
+        return 0
+    start = time.perf_counter()
+    try:
+        result = index.query(args.any or (), args.all or (), args.none or ())
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"\n{len(result):,} systems match ({elapsed:.2f} ms)")
+    if args.count:
+        return 0
+    print(f"{'Resource':>10s} | {'System':40s} | {'Missing':>8s}")
+    print("-" * 65)
+    for resource_id, name, missing in index.systems(result, args.limit):
+        print(f"{resource_id:10d} | {(name or f'(ID: {resource_id})')[:40]:40s} | {missing:8,d}")
+    return 0
@@ -0,0 +1,201 @@
+"""
+Searchable patch catalog in the private database
+
+patch_catalog is built from the pmp_patchdetails mirror (see extract.py), so
+lookups never touch PMP. Each patch has:
+
+- search_vector: weighted tsvector (identifiers A, description B) for ranked
+  full-text search
+- search_text: lower-cased identifiers + description with a pg_trgm GIN index,
+  for partial KB numbers, bulletin IDs and misspellings
+"""
+
+import re
+
+from . import db, registry
+
+CREATE_CATALOG_SQL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE TABLE IF NOT EXISTS patch_catalog (
+    patchid BIGINT PRIMARY KEY,
+    bulletinid VARCHAR(100),
+    kb_number VARCHAR(20),
+    severity_id INTEGER,
+    severity VARCHAR(100),
+    release_date TIMESTAMP,
+    description TEXT,
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(bulletinid, '') || ' ' || coalesce(kb_number, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED,
+    search_text TEXT GENERATED ALWAYS AS (
+        lower(coalesce(bulletinid, '') || ' ' || coalesce(kb_number, '') || ' ' || coalesce(description, ''))
+    ) STORED,
+    refreshed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_patch_catalog_search_vector ON patch_catalog USING gin (search_vector);
+CREATE INDEX IF NOT EXISTS idx_patch_catalog_search_text ON patch_catalog USING gin (search_text gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_patch_catalog_release_date ON patch_catalog(release_date);
+
+COMMENT ON TABLE patch_catalog IS 'Patch catalog with full-text and trigram search, built from pmp_patchdetails';
+COMMENT ON COLUMN patch_catalog.kb_number IS 'KB article number parsed from the description (e.g. KB5031361)';
+"""
+
+# Only rows whose source columns changed are rewritten, so the generated
+# search columns and GIN indexes are not rebuilt for the whole catalog each run
+REFRESH_CATALOG_SQL = """
+INSERT INTO patch_catalog (patchid, bulletinid, kb_number, severity_id, severity, release_date, description)
+SELECT
+    pd.patchid,
+    pd.bulletinid,
+    upper(substring(pd.description FROM '(?i)KB[0-9]{6,8}')),
+    pd.severityid,
+    s.name,
+    to_timestamp(pd.releasedtime/1000)::timestamp,
+    pd.description
+FROM pmp_patchdetails pd
+LEFT JOIN pmp_pmseverity s ON s.severityid = pd.severityid
+ON CONFLICT (patchid) DO UPDATE SET
+    bulletinid = EXCLUDED.bulletinid,
+    kb_number = EXCLUDED.kb_number,
+    severity_id = EXCLUDED.severity_id,
+    severity = EXCLUDED.severity,
+    release_date = EXCLUDED.release_date,
+    description = EXCLUDED.description,
+    refreshed_at = CURRENT_TIMESTAMP
+WHERE (patch_catalog.bulletinid, patch_catalog.severity_id, patch_catalog.severity,
+       patch_catalog.release_date, patch_catalog.description)
+    IS DISTINCT FROM
+      (EXCLUDED.bulletinid, EXCLUDED.severity_id, EXCLUDED.severity,
+       EXCLUDED.release_date, EXCLUDED.description);
+"""
+
+DELETE_MISSING_SQL = """
+DELETE FROM patch_catalog c
+WHERE NOT EXISTS (SELECT 1 FROM pmp_patchdetails pd WHERE pd.patchid = c.patchid);
+"""
+
+# Full-text matches rank first (identifier hits outrank description hits),
+# then trigram similarity for partial identifiers and typos
+SEARCH_SQL = """
+WITH q AS (
+    SELECT websearch_to_tsquery('english', %(query)s) AS ts,
+           lower(%(query)s) AS text
+)
+SELECT
+    c.patchid,
+    c.bulletinid,
+    c.kb_number,
+    c.severity,
+    c.release_date,
+    c.description,
+    ts_rank_cd(c.search_vector, q.ts) AS rank,
+    word_similarity(q.text, c.search_text) AS similarity
+FROM patch_catalog c, q
+WHERE c.search_vector @@ q.ts
+   OR c.search_text LIKE %(pattern)s
+   OR q.text <%% c.search_text
+ORDER BY rank DESC, similarity DESC, c.release_date DESC NULLS LAST
+LIMIT %(limit)s;
+"""
+
+PATCHID_SQL = """
+SELECT patchid, bulletinid, kb_number, severity, release_date, description, 1.0, 1.0
+FROM patch_catalog
+WHERE patchid = %(patchid)s;
+"""
+
+registry.register_all('catalog', {'search': SEARCH_SQL, 'patchid': PATCHID_SQL}, prepare={'search', 'patchid'})
+
+
+def create_catalog(priv_conn):
+    """Create patch_catalog and its search indexes if missing"""
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute(CREATE_CATALOG_SQL)
+        priv_conn.commit()
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def refresh_catalog(priv_conn):
+    """Bring patch_catalog in line with pmp_patchdetails; returns (changed, removed)"""
+    create_catalog(priv_conn)
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute(REFRESH_CATALOG_SQL)
+        changed = cursor.rowcount
+        cursor.execute(DELETE_MISSING_SQL)
+        removed = cursor.rowcount
+        priv_conn.commit()
+        return changed, removed
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def search(priv_conn, query, limit=20):
+    """
+    Ranked catalog matches for a free-text query
+
+    Returns [(patchid, bulletinid, kb_number, severity, release_date,
+    description, rank, similarity)]. A bare number is also tried as a patch ID.
+    """
+    cursor = priv_conn.cursor()
+    try:
+        rows = []
+        if re.fullmatch(r'\d+', query.strip()):
+            rows = registry.fetchall(cursor, 'catalog.patchid', {'patchid': int(query)})
+        pattern = '%' + re.sub(r'([%_\\])', r'\\\1', query.lower()) + '%'
+        matches = registry.fetchall(cursor, 'catalog.search', {'query': query, 'pattern': pattern, 'limit': limit})
+        seen = {row[0] for row in rows}
+        return (rows + [row for row in matches if row[0] not in seen])[:limit]
+    finally:
+        cursor.close()
+
+
+def print_results(rows):
+    print(f"{'Patch ID':>10s} | {'Bulletin':14s} | {'KB':10s} | {'Severity':9s} | {'Released':10s} | {'Rank':>5s} | Description")
+    print("-" * 120)
+    for patchid, bulletin, kb, severity, released, description, rank, sim in rows:
+        date_str = released.strftime("%Y-%m-%d") if released else "Unknown"
+        print(f"{patchid:10d} | {(bulletin or '')[:14]:14s} | {kb or '':10s} | {(severity or '')[:9]:9s} | "
+              f"{date_str:10s} | {float(rank) + float(sim):5.2f} | {description or ''}")
+
+
+def main(args):
+    """`patchmgr search`: search the patch catalog in the private database"""
+    conn = db.connect_private()
+    try:
+        if args.refresh:
+            try:
+                changed, removed = refresh_catalog(conn)
+                print(f"Catalog refreshed: {changed:,} patches added or changed, {removed:,} removed")
+            except Exception as e:
+                print(f"ERROR: Failed to refresh the catalog: {e}")
+                print("Run patchmgr extract patchdetails first.")
+                return 1
+        if not args.query:
+            return 0
+
+        query = ' '.join(args.query)
+        try:
+            rows = search(conn, query, args.limit)
+        except Exception as e:
+            print(f"ERROR: Search failed: {e}")
+            print("Build the catalog with: patchmgr search --refresh")
+            return 1
+    finally:
+        conn.close()
+
+    print(f"Patches matching '{query}' ({len(rows)} shown)")
+    print("=" * 120)
+    print_results(rows)
+    return 0 if rows else 1
@@ -0,0 +1,386 @@
+"""
+patchmgr command line
+
+Each subcommand lives in its own module and is imported only when it runs,
+so `patchmgr --help` and argument errors never load psycopg2 or dotenv.
+"""
+
+import argparse
+import importlib
+
+from . import __version__
+
+PROFILE_PATH = 'patchmgr-profile.txt'
+
+# subcommand -> (module, help)
+COMMANDS = {
+    'sync': ('patchmgr.sync', 'Sync patch compliance data to the private database'),
+    'report': ('patchmgr.report', 'Print the standard Patch Manager Plus report'),
+    'query': ('patchmgr.query', 'Run the example compliance queries, or page through systems matching filters'),
+    'explore': ('patchmgr.explore', 'Explore the Patch Manager Plus database schema'),
+    'schema': ('patchmgr.schemasnapshot', 'Save, search and diff offline snapshots of the PMP schema'),
+    'discover': ('patchmgr.discover', 'Test the connection and find the Patch Manager database'),
+    'check-plans': ('patchmgr.plancheck', 'Verify the compliance queries are served by indexes'),
+    'check-schema': ('patchmgr.schemacheck', 'Compare the PMP columns the tools read with the saved fingerprint'),
+    'extract': ('patchmgr.extract', 'Copy large PMP tables to the private database, resuming from checkpoints'),
+    'ingest': ('patchmgr.events', 'Append patch status changes since the last run to the event log'),
+    'anomalies': ('patchmgr.anomalies', 'List systems and domains flagged as unusual by recent syncs'),
+    'serve': ('patchmgr.api', 'Serve compliance data as a local read-only JSON API, reloaded after each sync'),
+    'reports': ('patchmgr.fanout', 'Write one compliance report per domain (or any column) in parallel'),
+    'dashboard': ('patchmgr.dashboard', 'Render the static HTML compliance dashboard, only pages whose data changed'),
+    'simulate': ('patchmgr.simulate', 'Simulate how a proposed deployment would change fleet compliance'),
+    'snapshot-file': ('patchmgr.snapfile', 'Write or inspect the memory-mapped binary snapshot of patch_compliance'),
+    'missing': ('patchmgr.bitmaps', 'Find systems missing any/all/none of a set of patches from the bitmap index'),
+    'missing-arrays': ('patchmgr.patcharrays', 'Look up missing patches per system or systems per patch from the GIN-indexed arrays'),
+    'collections': ('patchmgr.applicability', 'Show which systems and missing patches a collection would deploy'),
+    'search': ('patchmgr.catalog', 'Search the patch catalog by name, KB number or bulletin'),
+    'runs': ('patchmgr.runs', 'List recent sync runs and the run lock holder'),
+    'stats': ('patchmgr.registry', 'Show per-query latency and row counts recorded on this machine'),
+}
+
+
+def _plan_arguments(parser):
+    parser.add_argument('--dry-run', action='store_true',
+                        help='EXPLAIN every query and print estimated rows, size and cost without running anything')
+    parser.add_argument('--max-rows', type=int,
+                        help='refuse queries estimated to return more rows (0 = unlimited; env PATCHMGR_MAX_ROWS)')
+    parser.add_argument('--max-bytes', type=int,
+                        help='refuse queries estimated to transfer more bytes (0 = unlimited; env PATCHMGR_MAX_BYTES)')
+    parser.add_argument('--max-cost', type=float,
+                        help='refuse queries with a higher planner cost (0 = unlimited; env PATCHMGR_MAX_COST)')
+
+
+def _sync_arguments(parser):
+    _plan_arguments(parser)
+    parser.add_argument('--over-limit', choices=['refuse', 'chunk'],
+                        help='when the extraction is over a limit: refuse to run (default) or extract '
+                             'in chunks through a server-side cursor (env PATCHMGR_OVER_LIMIT)')
+    parser.add_argument('--chunk-size', type=int,
+                        help='rows per chunk for chunked extraction (default: 10000; env PATCHMGR_CHUNK_SIZE)')
+    parser.add_argument('--target', choices=['postgres', 'duckdb', 'sqlite'],
+                        help='write to the private PostgreSQL database (default) or an embedded file; '
+                             'duckdb falls back to sqlite when not installed (env PATCHMGR_TARGET)')
+    parser.add_argument('--target-path', metavar='FILE',
+                        help='embedded target file (default: patch_compliance.duckdb or .sqlite; '
+                             'env PATCHMGR_TARGET_PATH)')
+    _lock_arguments(parser)
+
+
+def _lock_arguments(parser):
+    parser.add_argument('--lock', choices=['skip', 'wait', 'queue', 'off'],
+                        help='when another run holds the run lock: skip this run (default), wait up to '
+                             '--lock-timeout, queue until it is free, or off to ignore it (env PATCHMGR_LOCK_MODE)')
+    parser.add_argument('--lock-timeout', type=float,
+                        help='seconds to wait for the run lock with --lock wait (default: 300, 0 = no limit; env PATCHMGR_LOCK_TIMEOUT)')
+
+
+def _extract_arguments(parser):
+    parser.add_argument('tables', nargs='*', metavar='table',
+                        help='tables to copy (default: every mirrored table, as listed by --status)')
+    parser.add_argument('--chunk-size', type=int,
+                        help='rows per chunk and checkpoint (default: 10000; env PATCHMGR_CHUNK_SIZE)')
+    parser.add_argument('--restart', action='store_true',
+                        help='ignore saved checkpoints and start a new pass')
+    parser.add_argument('--status', action='store_true',
+                        help='show the saved checkpoints and exit')
+    _lock_arguments(parser)
+
+
+def _ingest_arguments(parser):
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help='rescanned systems per committed batch (default: 500)')
+    parser.add_argument('--status', action='store_true',
+                        help='show the watermark, events per month and time to remediate, and exit')
+    _lock_arguments(parser)
+
+
+def _explore_arguments(parser):
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--examine', action='store_true',
+                      help='show columns and sample data for the key tables')
+    mode.add_argument('--severity', action='store_true',
+                      help='show the severity tables and per-resource severity counts')
+
+
+def _schema_arguments(parser):
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--save', action='store_true',
+                      help='snapshot the PMP catalog (tables, columns, indexes, row estimates) to the file')
+    mode.add_argument('--search', nargs='+', metavar='TERM',
+                      help='tables and columns whose name contains a term (* and ? are wildcards)')
+    mode.add_argument('--table', metavar='NAME',
+                      help='columns and indexes of one table')
+    mode.add_argument('--diff', metavar='OLD',
+                      help='changes from an older snapshot file to the current one')
+    parser.add_argument('--file', metavar='FILE',
+                        help='snapshot file (default: pmp-schema-snapshot.json.gz; env PATCHMGR_SCHEMA_SNAPSHOT)')
+    parser.add_argument('--limit', type=int, default=50,
+                        help='tables or columns to list (default: 50)')
+
+
+def _discover_arguments(parser):
+    parser.add_argument('--ports', action='store_true',
+                        help='scan the server for open database ports')
+
+
+def _query_arguments(parser):
+    parser.add_argument('--domain', help='only systems in this domain')
+    parser.add_argument('--risk', choices=['critical', 'important', 'moderate', 'low', 'compliant'],
+                        help='only systems at this risk level')
+    parser.add_argument('--contact', choices=['active', 'stale', 'inactive'],
+                        help='only systems with this contact status')
+    parser.add_argument('--min-compliance', type=float, metavar='PCT',
+                        help='only systems at or above this compliance percentage')
+    parser.add_argument('--max-compliance', type=float, metavar='PCT',
+                        help='only systems at or below this compliance percentage')
+    parser.add_argument('--name-prefix', metavar='TEXT',
+                        help='only systems whose name starts with this (case-insensitive)')
+    parser.add_argument('--sort', choices=['priority', 'name', 'compliance'],
+                        help='page order (default: priority)')
+    parser.add_argument('--page-size', type=int, metavar='N',
+                        help='systems per page (default: 50)')
+    parser.add_argument('--after', metavar='TOKEN',
+                        help='continue after the page that printed this token')
+    parser.add_argument('--pages', type=int, metavar='N',
+                        help='consecutive pages to print (default: 1)')
+
+
+def _check_plans_arguments(parser):
+    parser.add_argument('--rows', type=int, default=100000,
+                        help='synthetic systems to generate (default: 100000)')
+
+
+def _check_schema_arguments(parser):
+    parser.add_argument('--accept', action='store_true',
+                        help='record the current PMP schema as the fingerprint')
+    parser.add_argument('--fingerprint', metavar='FILE',
+                        help='fingerprint file (default: pmp-schema.json; env PATCHMGR_SCHEMA_FINGERPRINT)')
+
+
+def _search_arguments(parser):
+    parser.add_argument('query', nargs='*',
+                        help='words, KB number, bulletin ID or patch ID to search for')
+    parser.add_argument('--limit', type=int, default=20,
+                        help='results to show (default: 20)')
+    parser.add_argument('--refresh', action='store_true',
+                        help='rebuild patch_catalog from pmp_patchdetails first')
+
+
+def _collections_arguments(parser):
+    parser.add_argument('collection', nargs='*',
+                        help='collection ID or part of its name (default: list collections by impact)')
+    parser.add_argument('--systems', action='store_true',
+                        help='also list the systems a single matching collection would patch')
+    parser.add_argument('--limit', type=int, default=20,
+                        help='collections to list (default: 20)')
+    parser.add_argument('--refresh', action='store_true',
+                        help='refresh collection_applicability from the pmp_* mirrors first')
+
+
+def _simulate_arguments(parser):
+    parser.add_argument('--patches', nargs='+', metavar='ID',
+                        help='patch IDs to deploy (default with --collections: the patches in those collections)')
+    parser.add_argument('--collections', nargs='+', metavar='ID',
+                        help='deploy to the systems in these collections (default: every system)')
+    parser.add_argument('--systems', nargs='+', metavar='ID',
+                        help='deploy to these resource IDs as well')
+    parser.add_argument('--each-collection', action='store_true',
+                        help='evaluate every collection as its own deployment and rank them')
+    parser.add_argument('--candidates', metavar='FILE',
+                        help='JSON list of deployments to rank: [{"name", "patches", "collections", "systems"}]')
+    parser.add_argument('--limit', type=int, default=20,
+                        help='candidates or systems to show (default: 20)')
+
+
+def _missing_arguments(parser):
+    parser.add_argument('--any', nargs='+', metavar='PATCH',
+                        help='systems missing at least one of these patch IDs or KB numbers')
+    parser.add_argument('--all', nargs='+', metavar='PATCH',
+                        help='systems missing every one of these')
+    parser.add_argument('--none', nargs='+', metavar='PATCH',
+                        help='excluding systems missing any of these')
+    parser.add_argument('--count', action='store_true',
+                        help='print only the number of matching systems')
+    parser.add_argument('--system', type=int, metavar='RESOURCE_ID',
+                        help='list the patches one system is missing')
+    parser.add_argument('--shared', action='store_true',
+                        help='count how many systems share each distinct missing-patch set')
+    parser.add_argument('--severity', choices=['critical', 'important', 'moderate', 'low', 'unrated', 'all'],
+                        default='critical', help='patches considered by --shared (default: critical)')
+    parser.add_argument('--limit', type=int, default=20,
+                        help='systems or sets to list (default: 20)')
+    parser.add_argument('--build', action='store_true',
+                        help='rebuild the index from the private database first')
+    parser.add_argument('--index', metavar='FILE',
+                        help='index file (default: missing-index.npz; env PATCHMGR_MISSING_INDEX)')
+
+
+def _missing_arrays_arguments(parser):
+    parser.add_argument('--patch', nargs='+', type=int, metavar='PATCH_ID',
+                        help='list the systems missing these patches')
+    parser.add_argument('--match', choices=['any', 'all'], default='any',
+                        help='systems missing any (default) or all of the --patch IDs')
+    parser.add_argument('--system', type=int, metavar='RESOURCE_ID',
+                        help='list the patches one system is missing')
+    parser.add_argument('--limit', type=int, default=20,
+                        help='systems or patches to list (default: 20)')
+    parser.add_argument('--refresh', action='store_true',
+                        help='refresh the arrays from the pmp_* mirrors first')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='compare the arrays with normalized rows on a synthetic fleet in a scratch schema')
+    parser.add_argument('--systems', type=int, default=100000,
+                        help='synthetic systems for --benchmark (default: 100000)')
+    parser.add_argument('--patches', type=int, default=3000,
+                        help='synthetic patches for --benchmark (default: 3000)')
+    parser.add_argument('--samples', type=int, default=100,
+                        help='lookups timed per query and form for --benchmark (default: 100)')
+
+
+def _reports_arguments(parser):
+    parser.add_argument('--by', default='system_domain', metavar='COLUMN',
+                        help='patch_compliance column to split on (default: system_domain)')
+    parser.add_argument('--output', metavar='DIR',
+                        help='output directory; reports go in DIR/COLUMN (default: reports; env PATCHMGR_REPORTS_DIR)')
+    parser.add_argument('--format', choices=['text', 'csv'], default='text',
+                        help='report format (default: text)')
+    parser.add_argument('--workers', type=int,
+                        help='worker processes (default: one per core; 1 renders without a pool)')
+    parser.add_argument('--verbose', action='store_true',
+                        help='print each report as it is written')
+
+
+def _snapshot_file_arguments(parser):
+    parser.add_argument('--write', action='store_true',
+                        help='write the file from the private database first (the sync does this after loading)')
+    parser.add_argument('--file', metavar='FILE',
+                        help='snapshot file (default: patch-compliance.snap; env PATCHMGR_SNAPSHOT_FILE)')
+    parser.add_argument('--limit', type=int, default=20,
+                        help='domains to list (default: 20)')
+
+
+def _dashboard_arguments(parser):
+    parser.add_argument('--output', metavar='DIR',
+                        help='directory to write the pages to (default: dashboard; env PATCHMGR_DASHBOARD_DIR)')
+    parser.add_argument('--days', type=int, default=90,
+                        help='days of history in the trend charts (default: 90)')
+    parser.add_argument('--full', action='store_true',
+                        help='render every page, ignoring the saved input hashes')
+
+
+def _anomalies_arguments(parser):
+    parser.add_argument('--days', type=int, default=30,
+                        help='flagged values from syncs in the last N days (default: 30)')
+    parser.add_argument('--scope', choices=['system', 'domain'],
+                        help='only systems or only domains')
+    parser.add_argument('--limit', type=int, default=50,
+                        help='anomalies to list (default: 50)')
+
+
+def _serve_arguments(parser):
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='port to listen on (default: 8765)')
+    parser.add_argument('--log', action='store_true',
+                        help='print a line for every request')
+
+
+def _runs_arguments(parser):
+    parser.add_argument('--limit', type=int, default=20,
+                        help='runs to list (default: 20)')
+
+
+def _stats_arguments(parser):
+    parser.add_argument('--sort', choices=['total', 'mean', 'calls', 'rows'], default='total',
+                        help='order by total time (default), mean time, calls or rows')
+    parser.add_argument('--limit', type=int, default=30,
+                        help='queries to show (default: 30)')
+    parser.add_argument('--reset', action='store_true',
+                        help='clear the recorded stats')
+    parser.add_argument('--queries', action='store_true',
+                        help='list the registered queries with their versions and parameters')
+
+
+ARGUMENTS = {
+    'sync': _sync_arguments,
+    'report': _plan_arguments,
+    'query': _query_arguments,
+    'extract': _extract_arguments,
+    'ingest': _ingest_arguments,
+    'explore': _explore_arguments,
+    'schema': _schema_arguments,
+    'discover': _discover_arguments,
+    'check-plans': _check_plans_arguments,
+    'check-schema': _check_schema_arguments,
+    'search': _search_arguments,
+    'collections': _collections_arguments,
+    'reports': _reports_arguments,
+    'dashboard': _dashboard_arguments,
+    'serve': _serve_arguments,
+    'anomalies': _anomalies_arguments,
+    'simulate': _simulate_arguments,
+    'snapshot-file': _snapshot_file_arguments,
+    'missing': _missing_arguments,
+    'missing-arrays': _missing_arrays_arguments,
+    'runs': _runs_arguments,
+    'stats': _stats_arguments,
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='patchmgr',
+        description='Reporting and compliance sync for ManageEngine Patch Manager Plus',
+    )
+    parser.add_argument('--version', action='version', version=f'%(prog)s {__version__}')
+    fixtures = parser.add_mutually_exclusive_group()
+    fixtures.add_argument('--capture', metavar='DIR',
+                          help='record every PMP query result to DIR (env PATCHMGR_CAPTURE_DIR)')
+    fixtures.add_argument('--replay', metavar='DIR',
+                          help='serve PMP query results recorded with --capture instead of '
+                               'connecting (env PATCHMGR_REPLAY_DIR)')
+    parser.add_argument('--profile', metavar='FILE', nargs='?', const=PROFILE_PATH,
+                        help='time every query, EXPLAIN ANALYZE the read queries and run under cProfile; '
+                             f'write the ranked report to FILE (default: {PROFILE_PATH}; env PATCHMGR_PROFILE)')
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    subparsers.required = True
+    for name, (_, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text, description=help_text)
+        if name in ARGUMENTS:
+            ARGUMENTS[name](subparser)
+    return parser
+
+
+def main(argv=None):
+    """Entry point for the `patchmgr` console script; returns an exit code"""
+    args = build_parser().parse_args(argv)
+    if args.capture or args.replay:
+        from . import db
+
+        db.use_fixtures('replay' if args.replay else 'capture', args.replay or args.capture)
+    module = importlib.import_module(COMMANDS[args.command][0])
+    try:
+        if args.profile is None:
+            from . import config
+
+            args.profile = config.profile_path()
+        if args.profile:
+            return _profile(module, args)
+        return module.main(args)
+    except KeyboardInterrupt:
+        return 130
+
+
+def _profile(module, args):
+    """Run a command with profiling on and write the report even if it fails"""
+    from . import db, profiling
+
+    profiler = profiling.Profiler()
+    db.use_profiler(profiler)
+    try:
+        return profiler.run(module.main, args)
+    finally:
+        db.use_profiler(None)
+        with open(args.profile, 'w', encoding='utf-8') as f:
+            f.write(profiling.build_report(profiler, args.command))
+        print(f"\nProfile written to {args.profile}")
@@ -0,0 +1,596 @@
+"""
+SQL for the patch_compliance tables in the private database
+
+CREATE_TABLE_SQL is the table, index and view DDL run by the sync, and the
+HISTORY_* statements maintain patch_compliance_history. WORKLOAD is every query
+the tools run against the table; the index set in CREATE_TABLE_SQL is derived
+from it and `patchmgr check-plans` verifies that each query is served by an
+index rather than a full scan or sort.
+
+MISSING_STATUSES is the one definition of a missing patch used wherever the
+per-patch affectedpatchstatus rows are counted (applicability, simulate,
+bitmaps, missing-arrays, ingest). status_id can't tell them apart (Ignore
+appears as both 201 and 202), so the status text decides:
+
+    Available  missing   (applicable, not installed)
+    Missing    missing
+    Ignore     not missing (excluded from deployment by an administrator)
+    anything else (Installed, ...) not missing
+"""
+
+MISSING_STATUSES = ('Available', 'Missing')
+
+
+def missing_status(column):
+    """SQL condition: column holds one of MISSING_STATUSES"""
+    statuses = ', '.join(f"'{status}'" for status in MISSING_STATUSES)
+    return f"{column} IN ({statuses})"
+
+
+CREATE_TABLE_SQL = """
+DROP TABLE IF EXISTS patch_compliance CASCADE;
+
+CREATE TABLE patch_compliance (
+    id SERIAL PRIMARY KEY,
+
+    -- Snapshot metadata
+    snapshot_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    -- System identification
+    resource_id BIGINT NOT NULL,
+    system_name VARCHAR(255),
+    system_domain VARCHAR(100),
+    resource_type INTEGER,
+    fqdn_name VARCHAR(500),
+    friendly_name VARCHAR(255),
+
+    -- Dates
+    last_contact TIMESTAMP,
+    last_patch_date TIMESTAMP,
+    system_added_date TIMESTAMP,
+
+    -- Status fields
+    managed_status INTEGER,
+    agent_status INTEGER,
+    installation_status INTEGER,
+    agent_version VARCHAR(50),
+
+    -- Microsoft patches
+    total_ms_patches INTEGER DEFAULT 0,
+    missing_ms_patches INTEGER DEFAULT 0,
+    installed_ms_patches INTEGER DEFAULT 0,
+
+    -- Third-party patches
+    total_tp_patches INTEGER DEFAULT 0,
+    missing_tp_patches INTEGER DEFAULT 0,
+    installed_tp_patches INTEGER DEFAULT 0,
+
+    -- Driver patches
+    total_driver_patches INTEGER DEFAULT 0,
+    missing_driver_patches INTEGER DEFAULT 0,
+    installed_driver_patches INTEGER DEFAULT 0,
+
+    -- BIOS/Firmware patches
+    total_bios_patches INTEGER DEFAULT 0,
+    missing_bios_patches INTEGER DEFAULT 0,
+    installed_bios_patches INTEGER DEFAULT 0,
+
+    -- Missing patches by severity
+    missing_critical INTEGER DEFAULT 0,
+    missing_important INTEGER DEFAULT 0,
+    missing_moderate INTEGER DEFAULT 0,
+    missing_low INTEGER DEFAULT 0,
+    missing_unrated INTEGER DEFAULT 0,
+
+    -- Calculated totals
+    missing_patches_total INTEGER GENERATED ALWAYS AS (
+        missing_ms_patches + missing_tp_patches + missing_driver_patches + missing_bios_patches
+    ) STORED,
+
+    installed_patches_total INTEGER GENERATED ALWAYS AS (
+        installed_ms_patches + installed_tp_patches + installed_driver_patches + installed_bios_patches
+    ) STORED,
+
+    missing_by_severity_total INTEGER GENERATED ALWAYS AS (
+        missing_critical + missing_important + missing_moderate + missing_low + missing_unrated
+    ) STORED,
+
+    -- Compliance percentage (installed / total * 100)
+    patch_compliance_pct DECIMAL(5,2) GENERATED ALWAYS AS (
+        CASE
+            WHEN (total_ms_patches + total_tp_patches + total_driver_patches + total_bios_patches) > 0
+            THEN (
+                (installed_ms_patches + installed_tp_patches + installed_driver_patches + installed_bios_patches)::DECIMAL
+                / (total_ms_patches + total_tp_patches + total_driver_patches + total_bios_patches)::DECIMAL
+                * 100
+            )
+            ELSE 100.00
+        END
+    ) STORED,
+
+    -- Audit fields
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Create indexes (derived from WORKLOAD below; see patchmgr check-plans)
+-- Lookup by name
+CREATE INDEX idx_patch_compliance_system_name ON patch_compliance(system_name);
+-- Stale systems: last_contact < NOW() - INTERVAL '7 days'
+CREATE INDEX idx_patch_compliance_last_contact ON patch_compliance(last_contact);
+-- Compliance thresholds: patch_compliance_pct < 90 ORDER BY patch_compliance_pct
+-- (resource_id makes the order unique for keyset pages)
+CREATE INDEX idx_patch_compliance_compliance_pct ON patch_compliance(patch_compliance_pct, resource_id);
+-- Priority order of the summary view, top-N lists, the sync summary and query pages.
+-- missing_patches_total is NULL without PMP patch counts; those systems sort as 0
+-- missing, which also keeps the keyset comparison of query pages non-NULL.
+CREATE INDEX idx_patch_compliance_priority ON patch_compliance(
+    missing_critical DESC, missing_important DESC, (coalesce(missing_patches_total, 0)) DESC, resource_id DESC
+) INCLUDE (system_name, patch_compliance_pct);
+-- Query pages for one domain in priority order
+CREATE INDEX idx_patch_compliance_domain_priority ON patch_compliance(
+    system_domain, missing_critical DESC, missing_important DESC, (coalesce(missing_patches_total, 0)) DESC,
+    resource_id DESC
+);
+-- Query pages by name; the C collation lets a name prefix (LIKE 'web%') use it too
+CREATE INDEX idx_patch_compliance_name_keyset ON patch_compliance(
+    (lower(coalesce(system_name, ''))) COLLATE "C", resource_id
+);
+-- Systems with critical patches missing (about 1 in 10 systems)
+CREATE INDEX idx_patch_compliance_critical ON patch_compliance(
+    missing_critical DESC, missing_patches_total DESC
+) INCLUDE (system_name, system_domain, last_contact, missing_important)
+WHERE missing_critical > 0;
+
+-- Create view for easy querying
+CREATE OR REPLACE VIEW patch_compliance_summary AS
+SELECT
+    system_name,
+    system_domain,
+    last_contact,
+    last_patch_date,
+    coalesce(missing_patches_total, 0) AS missing_patches_total,
+    missing_ms_patches,
+    missing_tp_patches,
+    missing_critical,
+    missing_important,
+    missing_moderate,
+    installed_patches_total,
+    patch_compliance_pct,
+    CASE
+        WHEN last_contact > NOW() - INTERVAL '7 days' THEN 'Active'
+        WHEN last_contact > NOW() - INTERVAL '30 days' THEN 'Stale'
+        ELSE 'Inactive'
+    END as contact_status,
+    CASE
+        WHEN missing_critical > 0 THEN 'Critical'
+        WHEN missing_important > 0 THEN 'Important'
+        WHEN missing_moderate > 0 THEN 'Moderate'
+        WHEN missing_patches_total > 0 THEN 'Low'
+        ELSE 'Compliant'
+    END as risk_level
+FROM patch_compliance
+ORDER BY missing_critical DESC, missing_important DESC, coalesce(missing_patches_total, 0) DESC, resource_id DESC;
+
+COMMENT ON TABLE patch_compliance IS 'Patch compliance data synced from ManageEngine Patch Manager Plus';
+COMMENT ON COLUMN patch_compliance.snapshot_date IS 'When this data was captured';
+COMMENT ON COLUMN patch_compliance.last_contact IS 'When the system last contacted the patch server';
+COMMENT ON COLUMN patch_compliance.last_patch_date IS 'When patch data was last updated for this system';
+COMMENT ON COLUMN patch_compliance.missing_critical IS 'Count of missing critical severity patches';
+COMMENT ON COLUMN patch_compliance.patch_compliance_pct IS 'Percentage of patches installed (installed/total * 100)';
+"""
+
+# Row layout matches the column order of sync.EXTRACT_SQL
+INSERT_SQL = """
+    INSERT INTO patch_compliance (
+        resource_id, system_name, system_domain, resource_type,
+        last_contact, last_patch_date,
+        managed_status, agent_status, installation_status,
+        total_ms_patches, missing_ms_patches, installed_ms_patches,
+        total_tp_patches, missing_tp_patches, installed_tp_patches,
+        total_driver_patches, missing_driver_patches, installed_driver_patches,
+        total_bios_patches, missing_bios_patches, installed_bios_patches,
+        missing_critical, missing_important, missing_moderate, missing_low, missing_unrated,
+        fqdn_name, friendly_name, agent_version, system_added_date
+    ) VALUES (
+        %s, %s, %s, %s, %s, %s, %s, %s, %s,
+        %s, %s, %s, %s, %s, %s, %s, %s, %s,
+        %s, %s, %s, %s, %s, %s, %s, %s,
+        %s, %s, %s, %s
+    );
+"""
+
+# patch_compliance_history: one row per version of a system's state, valid over
+# [valid_from, valid_to). last_contact and last_patch_date move on nearly every
+# agent check-in, so they are not tracked (they would make every run a full copy).
+HISTORY_TRACKED_COLUMNS = """
+    system_name, system_domain, resource_type, fqdn_name, friendly_name,
+    system_added_date, managed_status, agent_status, installation_status, agent_version,
+    total_ms_patches, missing_ms_patches, installed_ms_patches,
+    total_tp_patches, missing_tp_patches, installed_tp_patches,
+    total_driver_patches, missing_driver_patches, installed_driver_patches,
+    total_bios_patches, missing_bios_patches, installed_bios_patches,
+    missing_critical, missing_important, missing_moderate, missing_low, missing_unrated,
+    missing_patches_total, installed_patches_total, patch_compliance_pct
+"""
+
+CREATE_HISTORY_SQL = """
+-- btree_gist lets the GiST index combine resource_id equality with ranges
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+CREATE TABLE IF NOT EXISTS patch_compliance_history (
+    history_id BIGSERIAL PRIMARY KEY,
+    resource_id BIGINT NOT NULL,
+
+    -- Validity range: valid_to IS NULL means this is the current version
+    valid_from TIMESTAMP NOT NULL,
+    valid_to TIMESTAMP,
+    valid_period TSRANGE GENERATED ALWAYS AS (tsrange(valid_from, valid_to, '[)')) STORED,
+    row_hash CHAR(32) NOT NULL,
+
+    -- System identification and status
+    system_name VARCHAR(255),
+    system_domain VARCHAR(100),
+    resource_type INTEGER,
+    fqdn_name VARCHAR(500),
+    friendly_name VARCHAR(255),
+    system_added_date TIMESTAMP,
+    managed_status INTEGER,
+    agent_status INTEGER,
+    installation_status INTEGER,
+    agent_version VARCHAR(50),
+
+    -- Patch counts
+    total_ms_patches INTEGER,
+    missing_ms_patches INTEGER,
+    installed_ms_patches INTEGER,
+    total_tp_patches INTEGER,
+    missing_tp_patches INTEGER,
+    installed_tp_patches INTEGER,
+    total_driver_patches INTEGER,
+    missing_driver_patches INTEGER,
+    installed_driver_patches INTEGER,
+    total_bios_patches INTEGER,
+    missing_bios_patches INTEGER,
+    installed_bios_patches INTEGER,
+
+    -- Missing patches by severity
+    missing_critical INTEGER,
+    missing_important INTEGER,
+    missing_moderate INTEGER,
+    missing_low INTEGER,
+    missing_unrated INTEGER,
+
+    -- Totals as calculated in patch_compliance at the time
+    missing_patches_total INTEGER,
+    installed_patches_total INTEGER,
+    patch_compliance_pct DECIMAL(5,2),
+
+    -- One version per system at any point in time (backed by a GiST index)
+    CONSTRAINT patch_compliance_history_no_overlap
+        EXCLUDE USING gist (resource_id WITH =, valid_period WITH &&)
+);
+
+CREATE INDEX IF NOT EXISTS idx_patch_compliance_history_period
+    ON patch_compliance_history USING gist (valid_period);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_patch_compliance_history_current
+    ON patch_compliance_history (resource_id) WHERE valid_to IS NULL;
+
+-- State of the fleet at a point in time
+CREATE OR REPLACE FUNCTION patch_compliance_as_of(as_of TIMESTAMP)
+RETURNS SETOF patch_compliance_history
+LANGUAGE sql STABLE AS $$
+    SELECT * FROM patch_compliance_history WHERE valid_period @> as_of;
+$$;
+
+COMMENT ON TABLE patch_compliance_history IS 'Versioned patch compliance per system; a row is written only when values change';
+COMMENT ON COLUMN patch_compliance_history.valid_period IS 'When this version was current, [valid_from, valid_to)';
+COMMENT ON COLUMN patch_compliance_history.row_hash IS 'md5 of the tracked columns, used to detect changes';
+"""
+
+# Close the current version of every system that changed or disappeared
+CLOSE_HISTORY_SQL = f"""
+    UPDATE patch_compliance_history h
+    SET valid_to = s.snapshot_date
+    FROM (SELECT MAX(snapshot_date) AS snapshot_date FROM patch_compliance) s
+    WHERE h.valid_to IS NULL
+    AND NOT EXISTS (
+        SELECT 1
+        FROM patch_compliance pc
+        WHERE pc.resource_id = h.resource_id
+        AND md5(ROW({HISTORY_TRACKED_COLUMNS})::text) = h.row_hash
+    );
+"""
+
+# Open a new version for every system without a current one
+INSERT_HISTORY_SQL = f"""
+    INSERT INTO patch_compliance_history (
+        resource_id, valid_from, row_hash,
+        {HISTORY_TRACKED_COLUMNS}
+    )
+    SELECT
+        pc.resource_id, pc.snapshot_date, md5(ROW({HISTORY_TRACKED_COLUMNS})::text),
+        {HISTORY_TRACKED_COLUMNS}
+    FROM patch_compliance pc
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM patch_compliance_history h
+        WHERE h.resource_id = pc.resource_id
+        AND h.valid_to IS NULL
+    );
+"""
+
+# Keyset-paginated system pages for `patchmgr query`. Every filter is a
+# parameter that is NULL when unused. psycopg2 sends parameters as literals,
+# so the planner folds unused filters away and plans only the ones given.
+# Pages continue after the last row's sort key (the after_* parameters),
+# never with OFFSET, so page 1,000 costs the same as page 1.
+RISK_PREDICATES = {
+    'Critical': "missing_critical > 0",
+    'Important': "missing_critical <= 0 AND missing_important > 0",
+    'Moderate': "missing_critical <= 0 AND missing_important <= 0 AND missing_moderate > 0",
+    'Low': "missing_critical <= 0 AND missing_important <= 0 AND missing_moderate <= 0"
+           " AND coalesce(missing_patches_total, 0) > 0",
+    'Compliant': "missing_critical <= 0 AND missing_important <= 0 AND missing_moderate <= 0"
+                 " AND coalesce(missing_patches_total, 0) <= 0",
+}
+
+CONTACT_PREDICATES = {
+    'Active': "last_contact > NOW() - INTERVAL '7 days'",
+    'Stale': "last_contact <= NOW() - INTERVAL '7 days' AND last_contact > NOW() - INTERVAL '30 days'",
+    'Inactive': "(last_contact <= NOW() - INTERVAL '30 days' OR last_contact IS NULL)",
+}
+
+PAGE_FILTERS = "\n    ".join(
+    [f"AND (%(risk)s::text IS DISTINCT FROM '{name}' OR ({predicate}))" for name, predicate in RISK_PREDICATES.items()]
+    + [f"AND (%(contact)s::text IS DISTINCT FROM '{name}' OR ({predicate}))"
+       for name, predicate in CONTACT_PREDICATES.items()]
+    + [
+        "AND (%(domain)s::text IS NULL OR system_domain = %(domain)s)",
+        "AND (%(min_compliance)s::numeric IS NULL OR patch_compliance_pct >= %(min_compliance)s)",
+        "AND (%(max_compliance)s::numeric IS NULL OR patch_compliance_pct <= %(max_compliance)s)",
+        "AND (%(name_prefix)s::text IS NULL OR lower(coalesce(system_name, '')) COLLATE \"C\" LIKE %(name_prefix)s)",
+    ]
+)
+
+PAGE_SQL = """
+    SELECT
+        resource_id,
+        system_name,
+        system_domain,
+        last_contact,
+        patch_compliance_pct,
+        coalesce(missing_patches_total, 0) AS missing_patches_total,
+        missing_critical,
+        missing_important,
+        CASE
+            WHEN last_contact > NOW() - INTERVAL '7 days' THEN 'Active'
+            WHEN last_contact > NOW() - INTERVAL '30 days' THEN 'Stale'
+            ELSE 'Inactive'
+        END as contact_status,
+        CASE
+            WHEN missing_critical > 0 THEN 'Critical'
+            WHEN missing_important > 0 THEN 'Important'
+            WHEN missing_moderate > 0 THEN 'Moderate'
+            WHEN missing_patches_total > 0 THEN 'Low'
+            ELSE 'Compliant'
+        END as risk_level,
+        lower(coalesce(system_name, '')) as name_key
+    FROM patch_compliance
+    WHERE TRUE
+    {filters}
+    AND ({keyset})
+    ORDER BY {order}
+    LIMIT %(limit)s;
+"""
+
+# sort -> (keyset condition, ORDER BY, key columns of the last row)
+PAGE_SORTS = {
+    'priority': (
+        "%(after_id)s::bigint IS NULL OR (missing_critical, missing_important, coalesce(missing_patches_total, 0),"
+        " resource_id) < (%(after_1)s::int, %(after_2)s::int, %(after_3)s::int, %(after_id)s::bigint)",
+        "missing_critical DESC, missing_important DESC, coalesce(missing_patches_total, 0) DESC, resource_id DESC",
+        ['missing_critical', 'missing_important', 'missing_patches_total'],
+    ),
+    'name': (
+        "%(after_id)s::bigint IS NULL OR (lower(coalesce(system_name, '')) COLLATE \"C\", resource_id)"
+        " > (%(after_1)s::text, %(after_id)s::bigint)",
+        "lower(coalesce(system_name, '')) COLLATE \"C\", resource_id",
+        ['name_key'],
+    ),
+    'compliance': (
+        "%(after_id)s::bigint IS NULL OR (patch_compliance_pct, resource_id)"
+        " > (%(after_1)s::numeric, %(after_id)s::bigint)",
+        "patch_compliance_pct, resource_id",
+        ['patch_compliance_pct'],
+    ),
+}
+
+PAGE_QUERIES = {
+    f'page_by_{sort}': PAGE_SQL.format(filters=PAGE_FILTERS, keyset=keyset, order=order)
+    for sort, (keyset, order, _) in PAGE_SORTS.items()
+}
+
+# Parameters for a page with no filters and no cursor
+PAGE_DEFAULTS = {
+    'risk': None, 'contact': None, 'domain': None, 'min_compliance': None, 'max_compliance': None,
+    'name_prefix': None, 'after_1': None, 'after_2': None, 'after_3': None, 'after_id': None, 'limit': 50,
+}
+
+
+def _page_params(**params):
+    return dict(PAGE_DEFAULTS, **params)
+
+
+# Bundled queries against patch_compliance.
+# full_scan=True marks fleet-wide aggregates that must read every row anyway.
+WORKLOAD = {
+    # sync summary
+    'count_systems': {
+        'sql': "SELECT COUNT(*) FROM patch_compliance;",
+        'full_scan': True,
+    },
+    'count_missing_any': {
+        # ~95% of systems match, so a scan is the right plan
+        'sql': "SELECT COUNT(*) FROM patch_compliance WHERE missing_patches_total > 0;",
+        'full_scan': True,
+    },
+    'count_missing_critical': {
+        'sql': "SELECT COUNT(*) FROM patch_compliance WHERE missing_critical > 0;",
+        'full_scan': False,
+    },
+    'sum_missing': {
+        'sql': "SELECT SUM(missing_patches_total) FROM patch_compliance;",
+        'full_scan': True,
+    },
+    'avg_compliance': {
+        'sql': "SELECT AVG(patch_compliance_pct) FROM patch_compliance;",
+        'full_scan': True,
+    },
+    'top_systems_needing_patches': {
+        'sql': """
+            SELECT
+                system_name,
+                missing_patches_total,
+                missing_critical,
+                missing_important,
+                patch_compliance_pct
+            FROM patch_compliance
+            WHERE missing_patches_total > 0
+            ORDER BY missing_critical DESC, missing_important DESC, coalesce(missing_patches_total, 0) DESC
+            LIMIT 10;
+        """,
+        'full_scan': False,
+    },
+
+    # patchmgr query pages; check_params are the pages `patchmgr check-plans` explains
+    'page_by_priority': {
+        'sql': PAGE_QUERIES['page_by_priority'],
+        'full_scan': False,
+        'check_params': {
+            'first page': _page_params(),
+            'critical, later page': _page_params(risk='Critical', after_1=2, after_2=1, after_3=20, after_id=5000),
+            'one domain': _page_params(domain='DOMAIN7', after_1=0, after_2=1, after_3=9, after_id=90007),
+        },
+    },
+    'page_by_name': {
+        'sql': PAGE_QUERIES['page_by_name'],
+        'full_scan': False,
+        'check_params': {
+            'later page': _page_params(after_1='system-0050000', after_id=50000),
+            'name prefix': _page_params(name_prefix='system-00123%'),
+        },
+    },
+    'page_by_compliance': {
+        'sql': PAGE_QUERIES['page_by_compliance'],
+        'full_scan': False,
+        'check_params': {
+            'below 90%': _page_params(max_compliance=90),
+            'later page': _page_params(min_compliance=50, max_compliance=90, after_1=80, after_id=1234),
+        },
+    },
+    'compliance_summary': {
+        'sql': """
+            SELECT
+                system_name,
+                missing_patches_total,
+                missing_critical,
+                patch_compliance_pct,
+                contact_status,
+                risk_level
+            FROM patch_compliance_summary
+            ORDER BY missing_critical DESC, missing_important DESC, missing_patches_total DESC
+            LIMIT 15;
+        """,
+        'full_scan': False,
+    },
+    'severity_totals': {
+        'sql': """
+            SELECT
+                SUM(missing_critical) as total_critical,
+                SUM(missing_important) as total_important,
+                SUM(missing_moderate) as total_moderate,
+                SUM(missing_low) as total_low,
+                SUM(missing_unrated) as total_unrated,
+                SUM(missing_patches_total) as grand_total
+            FROM patch_compliance;
+        """,
+        'full_scan': True,
+    },
+    'compliance_brackets': {
+        'sql': """
+            SELECT
+                CASE
+                    WHEN patch_compliance_pct >= 95 THEN '95-100%'
+                    WHEN patch_compliance_pct >= 90 THEN '90-94%'
+                    WHEN patch_compliance_pct >= 80 THEN '80-89%'
+                    WHEN patch_compliance_pct >= 70 THEN '70-79%'
+                    ELSE 'Below 70%'
+                END as compliance_bracket,
+                COUNT(*) as system_count
+            FROM patch_compliance
+            GROUP BY compliance_bracket
+            ORDER BY compliance_bracket DESC;
+        """,
+        'full_scan': True,
+    },
+    'contact_status': {
+        'sql': """
+            SELECT
+                CASE
+                    WHEN last_contact > NOW() - INTERVAL '7 days' THEN 'Active (< 7 days)'
+                    WHEN last_contact > NOW() - INTERVAL '30 days' THEN 'Stale (7-30 days)'
+                    WHEN last_contact > NOW() - INTERVAL '90 days' THEN 'Inactive (30-90 days)'
+                    ELSE 'Very Stale (> 90 days)'
+                END as status,
+                COUNT(*) as count
+            FROM patch_compliance
+            GROUP BY status
+            ORDER BY status;
+        """,
+        'full_scan': True,
+    },
+
+    # SYNC_GUIDE.md examples
+    'systems_with_critical': {
+        'sql': """
+            SELECT
+                system_name,
+                system_domain,
+                last_contact,
+                missing_critical,
+                missing_important,
+                missing_patches_total
+            FROM patch_compliance
+            WHERE missing_critical > 0
+            ORDER BY missing_critical DESC, missing_patches_total DESC;
+        """,
+        'full_scan': False,
+    },
+    'stale_systems': {
+        'sql': """
+            SELECT
+                system_name,
+                last_contact,
+                AGE(NOW(), last_contact) as time_since_contact,
+                missing_patches_total
+            FROM patch_compliance
+            WHERE last_contact < NOW() - INTERVAL '7 days'
+            ORDER BY last_contact ASC;
+        """,
+        'full_scan': False,
+    },
+    'below_90_pct': {
+        'sql': """
+            SELECT
+                system_name,
+                patch_compliance_pct,
+                missing_patches_total,
+                installed_patches_total
+            FROM patch_compliance
+            WHERE patch_compliance_pct < 90
+            ORDER BY patch_compliance_pct ASC;
+        """,
+        'full_scan': False,
+    },
+}
@@ -0,0 +1,172 @@
+"""
+Connection settings for the Patch Manager Plus and private databases
+
+Credentials are read from environment variables, loaded once from the
+credentials file (override its location with PATCHMGR_CREDENTIALS).
+"""
+
+import os
+
+CREDENTIALS_FILE = 'C:/Users/admbwagner/Documents/claude/.claude/credentials.env'
+
+_loaded = False
+
+
+def load_credentials(path=None):
+    """Load the credentials file into the environment (only once)"""
+    global _loaded
+    if _loaded:
+        return
+    from dotenv import load_dotenv
+
+    load_dotenv(path or os.getenv('PATCHMGR_CREDENTIALS', CREDENTIALS_FILE))
+    _loaded = True
+
+
+def pmp_settings():
+    """Connection settings for the Patch Manager Plus database"""
+    load_credentials()
+    return {
+        'host': os.getenv('PATCHMGR_HOST'),
+        'port': os.getenv('PATCHMGR_PORT'),
+        'user': os.getenv('PATCHMGR_USER'),
+        'password': os.getenv('PATCHMGR_PASSWORD'),
+        'database': os.getenv('PATCHMGR_DATABASE'),
+    }
+
+
+def private_settings():
+    """Connection settings for the private reporting database"""
+    load_credentials()
+    return {
+        'host': os.getenv('POSTGRES_HOST'),
+        'port': os.getenv('POSTGRES_PORT'),
+        'user': os.getenv('POSTGRES_USER'),
+        'password': os.getenv('POSTGRES_PASSWORD'),
+        'database': os.getenv('POSTGRES_DB_PRIVATE'),
+    }
+
+
+def _env_number(name, default, kind=int):
+    value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    value = kind(value)
+    return value if value > 0 else None
+
+
+def plan_limits():
+    """
+    Pre-flight limits for extraction and report queries
+
+    PATCHMGR_MAX_ROWS, PATCHMGR_MAX_BYTES and PATCHMGR_MAX_COST override the
+    defaults; 0 means unlimited. PATCHMGR_OVER_LIMIT chooses what the sync does
+    when an extraction is over a limit: 'refuse' (default) or 'chunk'.
+    """
+    load_credentials()
+    return {
+        'max_rows': _env_number('PATCHMGR_MAX_ROWS', 500000),
+        'max_bytes': _env_number('PATCHMGR_MAX_BYTES', 256 * 1024 * 1024),
+        'max_cost': _env_number('PATCHMGR_MAX_COST', None, float),
+        'over_limit': os.getenv('PATCHMGR_OVER_LIMIT', 'refuse'),
+        'chunk_size': _env_number('PATCHMGR_CHUNK_SIZE', 10000),
+    }
+
+
+def run_lock():
+    """
+    Run coordination for the sync
+
+    PATCHMGR_LOCK_MODE is what a sync does when another is already running:
+    'skip' (default), 'wait' up to PATCHMGR_LOCK_TIMEOUT seconds (default 300)
+    or 'queue' until the lock is free.
+    """
+    load_credentials()
+    return {
+        'mode': os.getenv('PATCHMGR_LOCK_MODE', 'skip'),
+        'timeout': _env_number('PATCHMGR_LOCK_TIMEOUT', 300, float),
+    }
+
+
+def fixture_settings():
+    """
+    Capture or replay of PMP results from the environment
+
+    PATCHMGR_CAPTURE_DIR records every PMP result set to that directory;
+    PATCHMGR_REPLAY_DIR serves them from it instead of connecting.
+    Returns (mode, directory) or None.
+    """
+    if os.getenv('PATCHMGR_REPLAY_DIR'):
+        return ('replay', os.getenv('PATCHMGR_REPLAY_DIR'))
+    if os.getenv('PATCHMGR_CAPTURE_DIR'):
+        return ('capture', os.getenv('PATCHMGR_CAPTURE_DIR'))
+    return None
+
+
+def stats_path():
+    """
+    Local query stats file (PATCHMGR_STATS_PATH, default patchmgr-stats.sqlite)
+
+    Returns None when set to 'off'.
+    """
+    path = os.getenv('PATCHMGR_STATS_PATH', 'patchmgr-stats.sqlite')
+    return None if path.lower() in ('', 'off', 'none') else path
+
+
+def profile_path():
+    """PATCHMGR_PROFILE: write a profiling report for every command to this file, or None"""
+    return os.getenv('PATCHMGR_PROFILE') or None
+
+
+def dashboard_dir():
+    """PATCHMGR_DASHBOARD_DIR: where `patchmgr dashboard` writes its pages (default dashboard)"""
+    return os.getenv('PATCHMGR_DASHBOARD_DIR') or 'dashboard'
+
+
+def reports_dir():
+    """PATCHMGR_REPORTS_DIR: where `patchmgr reports` writes its per-partition reports (default reports)"""
+    return os.getenv('PATCHMGR_REPORTS_DIR') or 'reports'
+
+
+def snapshot_file_path():
+    """
+    Binary columnar snapshot written by each sync (PATCHMGR_SNAPSHOT_FILE,
+    default patch-compliance.snap)
+
+    Returns None when set to 'off'.
+    """
+    path = os.getenv('PATCHMGR_SNAPSHOT_FILE', 'patch-compliance.snap')
+    return None if path.lower() in ('', 'off', 'none') else path
+
+
+def missing_index_path():
+    """PATCHMGR_MISSING_INDEX: the saved `patchmgr missing` bitmap index (default missing-index.npz)"""
+    return os.getenv('PATCHMGR_MISSING_INDEX') or 'missing-index.npz'
+
+
+def schema_fingerprint_path():
+    """
+    PMP schema fingerprint checked before each sync (PATCHMGR_SCHEMA_FINGERPRINT,
+    default pmp-schema.json)
+
+    Returns None when set to 'off'.
+    """
+    path = os.getenv('PATCHMGR_SCHEMA_FINGERPRINT', 'pmp-schema.json')
+    return None if path.lower() in ('', 'off', 'none') else path
+
+
+def schema_snapshot_path():
+    """PATCHMGR_SCHEMA_SNAPSHOT: the `patchmgr schema` snapshot file (default pmp-schema-snapshot.json.gz)"""
+    return os.getenv('PATCHMGR_SCHEMA_SNAPSHOT') or 'pmp-schema-snapshot.json.gz'
+
+
+def sync_target():
+    """
+    Where the sync writes: PATCHMGR_TARGET is 'postgres' (default), 'duckdb'
+    or 'sqlite'; PATCHMGR_TARGET_PATH is the file for the embedded targets.
+    """
+    load_credentials()
+    return {
+        'kind': os.getenv('PATCHMGR_TARGET', 'postgres'),
+        'path': os.getenv('PATCHMGR_TARGET_PATH') or None,
+    }
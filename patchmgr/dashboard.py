@@ -0,0 +1,562 @@
+"""
+Static HTML compliance dashboard (`patchmgr dashboard`)
+
+Renders self-contained pages (inline CSS and SVG charts, no scripts) from
+patch_compliance and patch_compliance_history in the private database:
+
+- index.html              fleet summary, compliance trend, domains
+- domains/<domain>.html   systems in the domain, domain trend
+- systems/<id>.html       patch counts, severities, compliance history
+
+Every page carries a hash of the rows it is rendered from. A system page's
+hash is md5 of the same tracked columns as patch_compliance_history plus its
+contact status, computed in one pass over patch_compliance. Domain and fleet
+hashes are built from the system hashes and trend points they show. The hashes
+are kept in manifest.json in the output directory, and only pages whose hash
+changed are rendered again. A sync that changes a few hundred systems
+re-renders a few hundred system pages, their domains and the index.
+
+last_contact and last_patch_date move on nearly every check-in, so pages show
+the contact status bucket instead, as the history does.
+"""
+
+import hashlib
+import html
+import json
+import os
+import re
+import time
+from datetime import date, timedelta
+
+from . import config, db, registry
+from .compliance_sql import HISTORY_TRACKED_COLUMNS
+
+# Bump when the page layout changes so every page is rendered again
+RENDER_VERSION = 1
+
+MANIFEST = 'manifest.json'
+DETAIL_BATCH = 5000
+HISTORY_VERSIONS = 60
+
+# Every system with the columns the index and domain pages show. The patch
+# type counts, and so missing_patches_total, are NULL for systems with no
+# pmresourcepatchcount row (the sync LEFT JOINs it).
+PAGE_INPUTS_SQL = f"""
+    SELECT
+        resource_id, system_name, system_domain,
+        patch_compliance_pct, coalesce(missing_patches_total, 0),
+        missing_critical, missing_important, missing_moderate, missing_low, missing_unrated,
+        contact_status, risk_level,
+        md5(row_text || contact_status) AS input_hash
+    FROM (
+        SELECT
+            pc.*,
+            ROW({HISTORY_TRACKED_COLUMNS})::text AS row_text,
+            CASE
+                WHEN last_contact > NOW() - INTERVAL '7 days' THEN 'Active'
+                WHEN last_contact > NOW() - INTERVAL '30 days' THEN 'Stale'
+                ELSE 'Inactive'
+            END AS contact_status,
+            CASE
+                WHEN missing_critical > 0 THEN 'Critical'
+                WHEN missing_important > 0 THEN 'Important'
+                WHEN missing_moderate > 0 THEN 'Moderate'
+                WHEN missing_patches_total > 0 THEN 'Low'
+                ELSE 'Compliant'
+            END AS risk_level
+        FROM patch_compliance pc
+    ) s;
+"""
+
+SYSTEM_DETAILS_SQL = """
+    SELECT
+        resource_id, fqdn_name, friendly_name, agent_version, system_added_date,
+        total_ms_patches, missing_ms_patches, installed_ms_patches,
+        total_tp_patches, missing_tp_patches, installed_tp_patches,
+        total_driver_patches, missing_driver_patches, installed_driver_patches,
+        total_bios_patches, missing_bios_patches, installed_bios_patches
+    FROM patch_compliance
+    WHERE resource_id = ANY(%(resource_ids)s);
+"""
+
+# The latest versions of each system, oldest first
+SYSTEM_HISTORY_SQL = """
+    SELECT resource_id, valid_from, patch_compliance_pct, coalesce(missing_patches_total, 0), missing_critical
+    FROM (
+        SELECT
+            h.*,
+            row_number() OVER (PARTITION BY resource_id ORDER BY valid_from DESC) AS version
+        FROM patch_compliance_history h
+        WHERE resource_id = ANY(%(resource_ids)s)
+    ) v
+    WHERE version <= %(versions)s
+    ORDER BY resource_id, valid_from;
+"""
+
+# Daily changes per domain: each version counts from the end of the day it
+# opened until the end of the day it closed, so a running sum over the days
+# gives the fleet at the end of every day from one pass over the history.
+TREND_CHANGES_SQL = """
+    WITH changes AS (
+        SELECT
+            valid_from::date AS day, system_domain,
+            1 AS systems, patch_compliance_pct AS pct, missing_critical AS critical,
+            (missing_critical > 0)::int AS critical_systems
+        FROM patch_compliance_history
+        UNION ALL
+        SELECT
+            valid_to::date, system_domain,
+            -1, -patch_compliance_pct, -missing_critical, -(missing_critical > 0)::int
+        FROM patch_compliance_history
+        WHERE valid_to IS NOT NULL
+    )
+    SELECT day, system_domain, SUM(systems), SUM(pct), SUM(critical), SUM(critical_systems)
+    FROM changes
+    GROUP BY day, system_domain
+    ORDER BY day;
+"""
+
+registry.register_all('dashboard', {
+    'page_inputs': PAGE_INPUTS_SQL,
+    'system_details': SYSTEM_DETAILS_SQL,
+    'system_history': SYSTEM_HISTORY_SQL,
+    'trend_changes': TREND_CHANGES_SQL,
+})
+
+BRACKETS = [(95, '95-100%'), (90, '90-94%'), (80, '80-89%'), (70, '70-79%'), (None, 'Below 70%')]
+
+PATCH_TYPES = [('Microsoft', 'ms'), ('Third-party', 'tp'), ('Driver', 'driver'), ('BIOS/Firmware', 'bios')]
+
+STYLE = """
+body { font-family: Segoe UI, Helvetica, Arial, sans-serif; margin: 24px; color: #222; }
+h1 { margin-bottom: 4px; }
+nav, .muted { color: #777; font-size: 13px; }
+a { color: #1f5fa8; text-decoration: none; }
+table { border-collapse: collapse; margin: 12px 0 24px; font-size: 14px; }
+th, td { padding: 4px 10px; border-bottom: 1px solid #ddd; text-align: left; }
+td.n, th.n { text-align: right; }
+.cards { display: flex; gap: 16px; flex-wrap: wrap; margin: 16px 0; }
+.card { border: 1px solid #ddd; border-radius: 6px; padding: 10px 16px; min-width: 130px; }
+.card b { display: block; font-size: 22px; }
+.Critical { color: #b71c1c; } .Important { color: #e65100; } .Moderate { color: #9a7d00; }
+.Low { color: #555; } .Compliant { color: #2e7d32; }
+svg { margin: 4px 0 20px; }
+svg text { font-size: 11px; fill: #777; }
+"""
+
+
+class System:
+    """One row of PAGE_INPUTS_SQL"""
+
+    __slots__ = ('resource_id', 'name', 'domain', 'compliance', 'missing', 'critical', 'important',
+                 'moderate', 'low', 'unrated', 'contact', 'risk', 'input_hash')
+
+    def __init__(self, row):
+        (self.resource_id, self.name, self.domain, compliance, self.missing, self.critical, self.important,
+         self.moderate, self.low, self.unrated, self.contact, self.risk, self.input_hash) = row
+        self.compliance = float(compliance or 0)
+
+    @property
+    def label(self):
+        return self.name or f"Unknown (ID: {self.resource_id})"
+
+    def priority(self):
+        return (-self.critical, -self.important, -self.missing, self.label.lower())
+
+
+def _digest(*parts):
+    return hashlib.sha256(repr((RENDER_VERSION,) + parts).encode('utf-8')).hexdigest()[:32]
+
+
+def domain_pages(domains):
+    """
+    domain -> page file name, unique even on case-insensitive file systems
+
+    Systems without a domain are listed under 'N/A'.
+    """
+    pages = {}
+    used = set()
+    for domain in sorted(domains, key=lambda d: (d is None, d or '')):
+        base = re.sub(r'[^a-z0-9._-]+', '_', (domain or 'n_a').lower()).strip('._') or 'domain'
+        name, n = base, 2
+        while name in used:
+            name, n = f"{base}-{n}", n + 1
+        used.add(name)
+        pages[domain] = f"domains/{name}.html"
+    return pages
+
+
+def load_trend(priv_conn, days):
+    """
+    Daily trend for the last `days` days from patch_compliance_history
+
+    Returns ({domain: points}, fleet points), each point being
+    (day, systems, avg_compliance, missing_critical, critical_systems).
+    """
+    cursor = priv_conn.cursor()
+    try:
+        changes = registry.fetchall(cursor, 'dashboard.trend_changes')
+    finally:
+        cursor.close()
+
+    today = date.today()
+    window = [today - timedelta(days=n) for n in range(days - 1, -1, -1)]
+    running = {}
+    series = {}
+    fleet = []
+    changes = iter(changes)
+    pending = next(changes, None)
+    for day in window:
+        while pending is not None and pending[0] <= day:
+            _, domain, systems, pct, critical, critical_systems = pending
+            totals = running.setdefault(domain, [0, 0.0, 0, 0])
+            totals[0] += systems
+            totals[1] += float(pct or 0)
+            totals[2] += critical or 0
+            totals[3] += critical_systems or 0
+            pending = next(changes, None)
+        totals = [0, 0.0, 0, 0]
+        for domain, (systems, pct, critical, critical_systems) in running.items():
+            if systems > 0:
+                series.setdefault(domain, []).append(
+                    (day, systems, round(pct / systems, 2), critical, critical_systems))
+            for i, value in enumerate((systems, pct, critical, critical_systems)):
+                totals[i] += value
+        if totals[0] > 0:
+            fleet.append((day, totals[0], round(totals[1] / totals[0], 2), totals[2], totals[3]))
+    return series, fleet
+
+
+def plan_pages(systems, trend, fleet_trend):
+    """{page path: (input hash, kind, key)} for every page the data produces"""
+    by_domain = {}
+    for system in systems:
+        by_domain.setdefault(system.domain, []).append(system)
+    names = domain_pages(by_domain)
+
+    pages = {}
+    domain_hashes = []
+    for domain, members in by_domain.items():
+        members.sort(key=lambda s: s.resource_id)
+        for system in members:
+            pages[f"systems/{system.resource_id}.html"] = (_digest(system.input_hash), 'system', system.resource_id)
+        page_hash = _digest(domain, names[domain], [(s.resource_id, s.input_hash) for s in members],
+                            trend.get(domain, []))
+        pages[names[domain]] = (page_hash, 'domain', domain)
+        domain_hashes.append((names[domain], page_hash))
+    pages['index.html'] = (_digest(sorted(domain_hashes), fleet_trend), 'index', None)
+    return pages, by_domain, names
+
+
+def load_manifest(output_dir):
+    """{page path: input hash} from the last run, or {}"""
+    try:
+        with open(os.path.join(output_dir, MANIFEST), encoding='utf-8') as f:
+            return json.load(f).get('pages', {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir, pages):
+    _write(output_dir, MANIFEST, json.dumps({'render_version': RENDER_VERSION, 'pages': pages},
+                                            indent=0, sort_keys=True))
+
+
+def _write(output_dir, path, text):
+    """Write a file atomically so a reader never sees half a page"""
+    target = os.path.join(output_dir, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = target + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, target)
+
+
+def _fetch_by_id(priv_conn, name, resource_ids, params=None):
+    """Rows of a resource_id = ANY(...) query, in batches"""
+    rows = []
+    cursor = priv_conn.cursor()
+    try:
+        for start in range(0, len(resource_ids), DETAIL_BATCH):
+            batch = {'resource_ids': resource_ids[start:start + DETAIL_BATCH]}
+            batch.update(params or {})
+            rows.extend(registry.fetchall(cursor, name, batch))
+    finally:
+        cursor.close()
+    return rows
+
+
+def system_history(priv_conn, resource_ids):
+    """resource_id -> [(valid_from, compliance, missing, critical)], or {} without the history table"""
+    try:
+        rows = _fetch_by_id(priv_conn, 'dashboard.system_history', resource_ids, {'versions': HISTORY_VERSIONS})
+    except Exception as e:
+        print(f"  WARNING: No compliance history ({e}); system pages are rendered without trends")
+        priv_conn.rollback()
+        return {}
+    history = {}
+    for resource_id, valid_from, pct, missing, critical in rows:
+        history.setdefault(resource_id, []).append((valid_from, float(pct or 0), missing, critical))
+    return history
+
+
+# HTML
+
+def _e(value):
+    return html.escape('' if value is None else str(value))
+
+
+def _page(title, page_hash, body, root=''):
+    return (
+        "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"utf-8\">\n"
+        f"<meta name=\"patchmgr-input-hash\" content=\"{page_hash}\">\n"
+        f"<title>{_e(title)}</title>\n<style>{STYLE}</style>\n</head>\n<body>\n"
+        f"<nav><a href=\"{root}index.html\">Fleet</a></nav>\n<h1>{_e(title)}</h1>\n"
+        f"{body}\n<p class=\"muted\">Input hash {page_hash}</p>\n</body>\n</html>\n"
+    )
+
+
+def _cards(items):
+    return '<div class="cards">' + ''.join(
+        f'<div class="card"><b>{_e(value)}</b>{_e(label)}</div>' for label, value in items) + '</div>'
+
+
+def _table(headers, rows, numeric=()):
+    head = ''.join(f'<th class="n">{_e(h)}</th>' if i in numeric else f'<th>{_e(h)}</th>'
+                   for i, h in enumerate(headers))
+    body = []
+    for row in rows:
+        cells = []
+        for i, cell in enumerate(row):
+            # Cells given as (html,) are already markup
+            text = cell[0] if isinstance(cell, tuple) else _e(cell)
+            cells.append(f'<td class="n">{text}</td>' if i in numeric else f'<td>{text}</td>')
+        body.append(f'<tr>{"".join(cells)}</tr>')
+    return f'<table><tr>{head}</tr>{"".join(body)}</table>'
+
+
+def _chart(title, points, percent=False, step=False):
+    """Inline SVG line chart of [(date or datetime, value)]"""
+    if len(points) < 2:
+        return f'<p class="muted">{_e(title)}: not enough history yet</p>'
+    width, height, left, pad = 640, 170, 44, 22
+    xs = [p[0].toordinal() + getattr(p[0], 'hour', 0) / 24 for p in points]
+    values = [float(p[1]) for p in points]
+    low = 0 if not percent else min(min(values), 90) // 10 * 10
+    high = 100 if percent else max(max(values), 1)
+    x_span = (xs[-1] - xs[0]) or 1
+    y_span = (high - low) or 1
+
+    def x(v):
+        return left + (v - xs[0]) / x_span * (width - left - pad)
+
+    def y(v):
+        return height - pad - (v - low) / y_span * (height - 2 * pad)
+
+    coords = []
+    for i, (xv, value) in enumerate(zip(xs, values)):
+        if step and i:
+            coords.append(f"{x(xv):.1f},{y(values[i - 1]):.1f}")
+        coords.append(f"{x(xv):.1f},{y(value):.1f}")
+    fmt = '{:.0f}%' if percent else '{:,.0f}'
+    return (
+        f'<h3>{_e(title)}</h3>'
+        f'<svg width="{width}" height="{height}" role="img" aria-label="{_e(title)}">'
+        f'<line x1="{left}" y1="{height - pad}" x2="{width - pad}" y2="{height - pad}" stroke="#ccc"/>'
+        f'<line x1="{left}" y1="{pad}" x2="{left}" y2="{height - pad}" stroke="#ccc"/>'
+        f'<text x="{left - 4}" y="{pad + 4}" text-anchor="end">{fmt.format(high)}</text>'
+        f'<text x="{left - 4}" y="{height - pad}" text-anchor="end">{fmt.format(low)}</text>'
+        f'<text x="{left}" y="{height - 6}">{points[0][0]:%Y-%m-%d}</text>'
+        f'<text x="{width - pad}" y="{height - 6}" text-anchor="end">{points[-1][0]:%Y-%m-%d}</text>'
+        f'<polyline fill="none" stroke="#1f5fa8" stroke-width="2" points="{" ".join(coords)}"/>'
+        f'</svg>'
+    )
+
+
+def _risk(system):
+    return (f'<span class="{system.risk}">{system.risk}</span>',)
+
+
+def _systems_table(systems, root=''):
+    rows = [
+        ((f'<a href="{root}systems/{s.resource_id}.html">{_e(s.label)}</a>',), f"{s.compliance:.2f}%",
+         s.missing, s.critical, s.important, _risk(s), s.contact)
+        for s in sorted(systems, key=System.priority)
+    ]
+    return _table(['System', 'Compliance', 'Missing', 'Critical', 'Important', 'Risk', 'Contact'],
+                  rows, numeric={1, 2, 3, 4})
+
+
+def _summary_cards(systems):
+    count = len(systems)
+    return _cards([
+        ('Systems', f"{count:,}"),
+        ('Average compliance', f"{sum(s.compliance for s in systems) / count:.2f}%" if count else '-'),
+        ('Missing patches', f"{sum(s.missing for s in systems):,}"),
+        ('Systems missing criticals', f"{sum(1 for s in systems if s.critical > 0):,}"),
+        ('Stale or inactive', f"{sum(1 for s in systems if s.contact != 'Active'):,}"),
+    ])
+
+
+def render_index(page_hash, by_domain, names, fleet_trend):
+    systems = [s for members in by_domain.values() for s in members]
+    severities = [
+        ('Critical', sum(s.critical for s in systems)),
+        ('Important', sum(s.important for s in systems)),
+        ('Moderate', sum(s.moderate for s in systems)),
+        ('Low', sum(s.low for s in systems)),
+        ('Unrated', sum(s.unrated for s in systems)),
+    ]
+    brackets = {label: 0 for _, label in BRACKETS}
+    for s in systems:
+        brackets[next(label for floor, label in BRACKETS if floor is None or s.compliance >= floor)] += 1
+    contact = {}
+    for s in systems:
+        contact[s.contact] = contact.get(s.contact, 0) + 1
+
+    domains = []
+    for domain, members in sorted(by_domain.items(), key=lambda item: (item[0] is None, item[0] or '')):
+        domains.append((
+            (f'<a href="{names[domain]}">{_e(domain or "N/A")}</a>',), len(members),
+            f"{sum(s.compliance for s in members) / len(members):.2f}%",
+            sum(s.missing for s in members), sum(1 for s in members if s.critical > 0),
+        ))
+    body = [
+        _summary_cards(systems),
+        _chart('Average compliance', [(p[0], p[2]) for p in fleet_trend], percent=True),
+        _chart('Systems missing critical patches', [(p[0], p[4]) for p in fleet_trend]),
+        '<h2>Missing patches by severity</h2>',
+        _table(['Severity', 'Missing'], [(name, f"{count:,}") for name, count in severities], numeric={1}),
+        '<h2>Systems by compliance</h2>',
+        _table(['Compliance', 'Systems'], [(label, f"{brackets[label]:,}") for _, label in BRACKETS], numeric={1}),
+        '<h2>Contact status</h2>',
+        _table(['Status', 'Systems'], sorted(contact.items()), numeric={1}),
+        '<h2>Domains</h2>',
+        _table(['Domain', 'Systems', 'Compliance', 'Missing', 'Missing criticals'], domains, numeric={1, 2, 3, 4}),
+        '<h2>Systems needing attention</h2>',
+        _systems_table(sorted(systems, key=System.priority)[:25]),
+    ]
+    return _page('Patch Compliance', page_hash, '\n'.join(body))
+
+
+def render_domain(page_hash, domain, members, trend):
+    body = [
+        _summary_cards(members),
+        _chart('Average compliance', [(p[0], p[2]) for p in trend], percent=True),
+        _chart('Systems missing critical patches', [(p[0], p[4]) for p in trend]),
+        '<h2>Systems</h2>',
+        _systems_table(members, root='../'),
+    ]
+    return _page(f"Domain {domain or 'N/A'}", page_hash, '\n'.join(body), root='../')
+
+
+def render_system(page_hash, system, domain_page, details, history):
+    (_, fqdn, friendly, agent_version, added, *counts) = details
+    body = [
+        f'<p><a href="../{domain_page}">Domain {_e(system.domain or "N/A")}</a></p>',
+        _cards([
+            ('Compliance', f"{system.compliance:.2f}%"),
+            ('Missing patches', f"{system.missing:,}"),
+            ('Risk', system.risk),
+            ('Contact', system.contact),
+        ]),
+        _table(['FQDN', 'Friendly name', 'Agent version', 'Added'],
+               [(fqdn or '-', friendly or '-', agent_version or '-',
+                 added.strftime('%Y-%m-%d') if added else '-')]),
+        '<h2>Patches by type</h2>',
+        _table(['Type', 'Total', 'Missing', 'Installed'],
+               [(label, *counts[i * 3:i * 3 + 3]) for i, (label, _) in enumerate(PATCH_TYPES)],
+               numeric={1, 2, 3}),
+        '<h2>Missing by severity</h2>',
+        _table(['Critical', 'Important', 'Moderate', 'Low', 'Unrated'],
+               [(system.critical, system.important, system.moderate, system.low, system.unrated)],
+               numeric={0, 1, 2, 3, 4}),
+        _chart('Compliance by version', [(v[0], v[1]) for v in history], percent=True, step=True),
+        _chart('Missing patches by version', [(v[0], v[2]) for v in history], step=True),
+    ]
+    return _page(system.label, page_hash, '\n'.join(body), root='../')
+
+
+def generate(priv_conn, output_dir, days=90, full=False, progress=print):
+    """
+    Render the pages whose inputs changed since the last run
+
+    Returns (rendered, removed, unchanged).
+    """
+    cursor = priv_conn.cursor()
+    try:
+        systems = [System(row) for row in registry.fetchall(cursor, 'dashboard.page_inputs')]
+    finally:
+        cursor.close()
+    try:
+        trend, fleet_trend = load_trend(priv_conn, days)
+    except Exception as e:
+        print(f"  WARNING: No compliance history ({e}); pages are rendered without trends")
+        priv_conn.rollback()
+        trend, fleet_trend = {}, []
+    pages, by_domain, names = plan_pages(systems, trend, fleet_trend)
+    progress(f"  {len(systems):,} systems in {len(by_domain):,} domains, {len(pages):,} pages")
+
+    previous = {} if full else load_manifest(output_dir)
+    stale = {
+        path: entry for path, entry in pages.items()
+        if previous.get(path) != entry[0] or not os.path.exists(os.path.join(output_dir, path))
+    }
+    removed = [path for path in previous if path not in pages]
+    progress(f"  {len(stale):,} pages changed, {len(removed):,} removed")
+
+    manifest = {path: page_hash for path, page_hash in previous.items() if path in pages}
+    try:
+        changed_ids = [key for _, kind, key in stale.values() if kind == 'system']
+        if changed_ids:
+            details = {row[0]: row for row in _fetch_by_id(priv_conn, 'dashboard.system_details', changed_ids)}
+            history = system_history(priv_conn, changed_ids)
+        by_id = {s.resource_id: s for s in systems}
+        for path, (page_hash, kind, key) in stale.items():
+            if kind == 'system':
+                system = by_id[key]
+                text = render_system(page_hash, system, names[system.domain], details[key], history.get(key, []))
+            elif kind == 'domain':
+                text = render_domain(page_hash, key, by_domain[key], trend.get(key, []))
+            else:
+                text = render_index(page_hash, by_domain, names, fleet_trend)
+            _write(output_dir, path, text)
+            manifest[path] = page_hash
+        for path in removed:
+            try:
+                os.remove(os.path.join(output_dir, path))
+            except FileNotFoundError:
+                pass
+    finally:
+        # Pages written so far keep their new hash even if a later one failed
+        save_manifest(output_dir, manifest)
+    return len(stale), len(removed), len(pages) - len(stale)
+
+
+def main(args):
+    """`patchmgr dashboard`"""
+    output_dir = args.output or config.dashboard_dir()
+    print("PATCH COMPLIANCE DASHBOARD")
+    print("=" * 80)
+    print("STEP 1: Connecting to private database...")
+    try:
+        conn = db.connect_private()
+    except Exception as e:
+        print(f"  ERROR: Failed to connect to private database: {e}")
+        return 1
+    try:
+        print(f"STEP 2: Rendering changed pages to {output_dir}{' (all pages)' if args.full else ''}...")
+        start = time.perf_counter()
+        try:
+            rendered, removed, unchanged = generate(conn, output_dir, args.days, args.full)
+        except Exception as e:
+            print(f"  ERROR: Failed to build the dashboard: {e}")
+            print("Run patchmgr sync first to create patch_compliance.")
+            return 1
+        print(f"  Rendered {rendered:,} pages, removed {removed:,}, {unchanged:,} unchanged "
+              f"in {time.perf_counter() - start:.1f}s")
+    finally:
+        conn.close()
+    print("\n" + "=" * 80)
+    print(f"Dashboard: {os.path.join(output_dir, 'index.html')}")
+    return 0
@@ -0,0 +1,76 @@
+"""
+Database connections
+
+psycopg2 is imported on first connect, so commands that never touch a
+database don't pay for it. The PMP connection can record or replay its
+results (see fixtures.py), set with use_fixtures() or PATCHMGR_CAPTURE_DIR /
+PATCHMGR_REPLAY_DIR. While profiling (use_profiler(), see profiling.py)
+both connections time every statement.
+"""
+
+from . import config
+
+# ('capture' | 'replay', directory) set by use_fixtures()
+_fixtures = None
+
+# profiling.Profiler set by use_profiler()
+_profiler = None
+
+
+def connect(settings, **options):
+    """Open a psycopg2 connection from a settings dict"""
+    import psycopg2
+
+    params = dict(settings)
+    params.update(options)
+    return psycopg2.connect(**params)
+
+
+def use_fixtures(mode, directory):
+    """Record ('capture') or serve ('replay') PMP results in directory; None turns it off"""
+    global _fixtures
+    _fixtures = (mode, directory) if mode else None
+
+
+def fixture_mode():
+    """(mode, directory) for PMP connections, or None when they go to the server"""
+    return _fixtures or config.fixture_settings()
+
+
+def use_profiler(profiler):
+    """Time statements on connections opened from now on; None turns it off"""
+    global _profiler
+    _profiler = profiler
+
+
+def _profiled(conn, source, explain=True):
+    if _profiler is None:
+        return conn
+    from . import profiling
+
+    return profiling.ProfilingConnection(conn, _profiler, source, explain)
+
+
+def connect_pmp(**options):
+    """Connect to the Patch Manager Plus database (read-only user)"""
+    from . import fixtures
+
+    mode = fixture_mode()
+    if mode and mode[0] == 'replay':
+        return _profiled(fixtures.ReplayConnection(mode[1]), 'pmp', explain=False)
+    conn = connect(config.pmp_settings(), **options)
+    if mode and mode[0] == 'capture':
+        conn = fixtures.CapturingConnection(conn, mode[1])
+    return _profiled(conn, 'pmp')
+
+
+def connect_private(profiled=True, **options):
+    """
+    Connect to the private reporting database
+
+    profiled=False keeps the connection out of profiling, for statements
+    with side effects EXPLAIN ANALYZE would repeat (advisory locks).
+    """
+    conn = connect(config.private_settings(), **options)
+    conn.autocommit = False
+    return _profiled(conn, 'private') if profiled else conn
@@ -0,0 +1,164 @@
+"""
+Discover and test the Patch Manager Plus database connection
+
+- Connection test: connects, lists databases and finds the PMP database
+- Port scan (--ports): tests common PostgreSQL and MS SQL ports on the server
+"""
+
+import socket
+
+from . import config, db
+
+POSSIBLE_DATABASE_NAMES = ['pmpdb', 'desktopcentral', 'patchmanager', 'patch_manager', 'dcdb']
+
+# Common ports for Patch Manager Plus
+PORTS_TO_TEST = [
+    (5432, "PostgreSQL default"),
+    (15432, "PMP PostgreSQL alternate"),
+    (33061, "PMP PostgreSQL common"),
+    (65432, "PMP PostgreSQL alternate"),
+    (1433, "MS SQL Server default"),
+    (3306, "MySQL/MariaDB"),
+    (8383, "PMP Web Interface"),
+]
+
+
+def list_databases(conn):
+    """Names of non-template databases on the server"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT datname FROM pg_database WHERE datistemplate = false ORDER BY datname;")
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def find_pmp_database(databases):
+    """First database whose name looks like a Patch Manager database, or None"""
+    for db_name in POSSIBLE_DATABASE_NAMES:
+        for database in databases:
+            if db_name in database.lower():
+                return database
+    return None
+
+
+def scan_ports(host, ports=PORTS_TO_TEST, timeout=2):
+    """Return [(port, description, is_open)] for each port"""
+    results = []
+    for port, description in ports:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            results.append((port, description, sock.connect_ex((host, port)) == 0))
+        finally:
+            sock.close()
+    return results
+
+
+def print_connection_test():
+    settings = config.pmp_settings()
+    print(f"Connecting to {settings['host']}:{settings['port']}/{settings['database']} as {settings['user']}...")
+
+    print("\n1. Attempting connection to default 'postgres' database...")
+    conn = db.connect(settings, database='postgres', connect_timeout=10)
+    try:
+        databases = list_databases(conn)
+    finally:
+        conn.close()
+    print("  Connection successful!")
+    print("\nAvailable databases:")
+    for database in databases:
+        print(f"  - {database}")
+
+    print("\n2. Looking for Patch Manager database...")
+    found_db = find_pmp_database(databases)
+    if not found_db:
+        print("  Could not identify Patch Manager database automatically.")
+        print("  Please check the database list above and update PATCHMGR_DATABASE in credentials.env")
+        return 1
+    print(f"  Found potential Patch Manager database: {found_db}")
+
+    print(f"\n3. Connecting to {found_db}...")
+    conn = db.connect(settings, database=found_db, connect_timeout=10)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT table_name
+            FROM information_schema.tables
+            WHERE table_schema = 'public'
+            ORDER BY table_name;
+        """)
+        tables = cursor.fetchall()
+        cursor.close()
+    finally:
+        conn.close()
+
+    print(f"  Connected! Found {len(tables)} tables:")
+    for i, table in enumerate(tables[:20], 1):
+        print(f"  {i}. {table[0]}")
+    if len(tables) > 20:
+        print(f"  ... and {len(tables) - 20} more tables")
+
+    print("\n" + "=" * 60)
+    print("CONNECTION TEST COMPLETE!")
+    if found_db != settings['database']:
+        print(f"Update credentials.env with: PATCHMGR_DATABASE={found_db}")
+    print("=" * 60)
+    return 0
+
+
+def print_port_scan():
+    settings = config.pmp_settings()
+    host = settings['host']
+    print(f"Scanning {host} for database ports...")
+    print("-" * 60)
+
+    open_ports = []
+    for port, description, is_open in scan_ports(host):
+        print(f"{'[OPEN]  ' if is_open else '[CLOSED]'} Port {port:5d} - {description}")
+        if is_open:
+            open_ports.append((port, description))
+
+    print("\n" + "=" * 60)
+    if not open_ports:
+        print("No open database ports found.")
+        print("\nThe database may be:")
+        print("  1. Configured to only listen on localhost")
+        print("  2. Behind a firewall")
+        print("  3. Using a non-standard port")
+        return 1
+
+    print(f"Found {len(open_ports)} open port(s):")
+    for port, desc in open_ports:
+        print(f"  - Port {port}: {desc}")
+
+    print("\n" + "=" * 60)
+    print("Testing PostgreSQL connections on open ports...")
+    for port, desc in open_ports:
+        if "PostgreSQL" not in desc:
+            continue
+        print(f"\nTrying port {port}...")
+        try:
+            conn = db.connect(settings, port=port, database='postgres', connect_timeout=5)
+            conn.close()
+            print(f"  SUCCESS! PostgreSQL connection on port {port}")
+            break
+        except Exception as e:
+            print(f"  PostgreSQL failed: {str(e)[:80]}")
+    return 0
+
+
+def main(args):
+    """`patchmgr discover`"""
+    if args.ports:
+        return print_port_scan()
+    try:
+        return print_connection_test()
+    except Exception as e:
+        print(f"\nConnection failed: {e}")
+        print("\nTroubleshooting:")
+        print("1. Verify the server is reachable: ping <PATCHMGR_HOST>")
+        print("2. Check if PostgreSQL is running on PATCHMGR_PORT")
+        print("3. Verify username and password are correct")
+        print("4. Check firewall settings")
+        return 1
@@ -0,0 +1,348 @@
+"""
+Embedded sync targets: DuckDB (preferred) or SQLite
+
+`patchmgr sync --target duckdb` writes patch_compliance, its generated total
+and compliance columns, the patch_compliance_summary view and
+patch_compliance_history to a local file instead of the private PostgreSQL
+database, so compliance data can be queried in-process with no server.
+DuckDB is used when installed (pip install patchmgr[duckdb]); otherwise
+the sync falls back to SQLite from the standard library.
+
+The functions mirror sync.create_tables / load_systems / record_history /
+summary_stats / top_systems and take an EmbeddedTarget.
+"""
+
+import hashlib
+import os
+
+from .compliance_sql import HISTORY_TRACKED_COLUMNS, INSERT_SQL, WORKLOAD
+
+DEFAULT_PATHS = {
+    'duckdb': 'patch_compliance.duckdb',
+    'sqlite': 'patch_compliance.sqlite',
+}
+
+# Dialect differences in the DDL below
+DIALECTS = {
+    'duckdb': {
+        'generated': 'VIRTUAL',
+        'real': 'DOUBLE',
+        'now': 'CAST(now() AS TIMESTAMP)',
+        'days_ago': "CAST(now() AS TIMESTAMP) - INTERVAL {days} DAY",
+    },
+    'sqlite': {
+        'generated': 'STORED',
+        'real': 'REAL',
+        'now': "(datetime('now', 'localtime'))",
+        'days_ago': "datetime('now', 'localtime', '-{days} days')",
+    },
+}
+
+CREATE_TABLE_SQL = """
+DROP VIEW IF EXISTS patch_compliance_summary;
+DROP TABLE IF EXISTS patch_compliance;
+
+CREATE TABLE patch_compliance (
+    snapshot_date TIMESTAMP DEFAULT {now},
+    resource_id BIGINT NOT NULL PRIMARY KEY,
+    system_name VARCHAR(255),
+    system_domain VARCHAR(100),
+    resource_type INTEGER,
+    fqdn_name VARCHAR(500),
+    friendly_name VARCHAR(255),
+    last_contact TIMESTAMP,
+    last_patch_date TIMESTAMP,
+    system_added_date TIMESTAMP,
+    managed_status INTEGER,
+    agent_status INTEGER,
+    installation_status INTEGER,
+    agent_version VARCHAR(50),
+    total_ms_patches INTEGER DEFAULT 0,
+    missing_ms_patches INTEGER DEFAULT 0,
+    installed_ms_patches INTEGER DEFAULT 0,
+    total_tp_patches INTEGER DEFAULT 0,
+    missing_tp_patches INTEGER DEFAULT 0,
+    installed_tp_patches INTEGER DEFAULT 0,
+    total_driver_patches INTEGER DEFAULT 0,
+    missing_driver_patches INTEGER DEFAULT 0,
+    installed_driver_patches INTEGER DEFAULT 0,
+    total_bios_patches INTEGER DEFAULT 0,
+    missing_bios_patches INTEGER DEFAULT 0,
+    installed_bios_patches INTEGER DEFAULT 0,
+    missing_critical INTEGER DEFAULT 0,
+    missing_important INTEGER DEFAULT 0,
+    missing_moderate INTEGER DEFAULT 0,
+    missing_low INTEGER DEFAULT 0,
+    missing_unrated INTEGER DEFAULT 0,
+
+    missing_patches_total INTEGER GENERATED ALWAYS AS (
+        missing_ms_patches + missing_tp_patches + missing_driver_patches + missing_bios_patches
+    ) {generated},
+    installed_patches_total INTEGER GENERATED ALWAYS AS (
+        installed_ms_patches + installed_tp_patches + installed_driver_patches + installed_bios_patches
+    ) {generated},
+    missing_by_severity_total INTEGER GENERATED ALWAYS AS (
+        missing_critical + missing_important + missing_moderate + missing_low + missing_unrated
+    ) {generated},
+    patch_compliance_pct DECIMAL(5,2) GENERATED ALWAYS AS (
+        CASE
+            WHEN (total_ms_patches + total_tp_patches + total_driver_patches + total_bios_patches) > 0
+            THEN ROUND(
+                CAST(installed_ms_patches + installed_tp_patches + installed_driver_patches + installed_bios_patches AS {real})
+                / (total_ms_patches + total_tp_patches + total_driver_patches + total_bios_patches)
+                * 100, 2)
+            ELSE 100.00
+        END
+    ) {generated}
+);
+
+CREATE VIEW patch_compliance_summary AS
+SELECT
+    system_name,
+    system_domain,
+    last_contact,
+    last_patch_date,
+    missing_patches_total,
+    missing_ms_patches,
+    missing_tp_patches,
+    missing_critical,
+    missing_important,
+    missing_moderate,
+    installed_patches_total,
+    patch_compliance_pct,
+    CASE
+        WHEN last_contact > {days_ago_7} THEN 'Active'
+        WHEN last_contact > {days_ago_30} THEN 'Stale'
+        ELSE 'Inactive'
+    END as contact_status,
+    CASE
+        WHEN missing_critical > 0 THEN 'Critical'
+        WHEN missing_important > 0 THEN 'Important'
+        WHEN missing_moderate > 0 THEN 'Moderate'
+        WHEN missing_patches_total > 0 THEN 'Low'
+        ELSE 'Compliant'
+    END as risk_level
+FROM patch_compliance
+ORDER BY missing_critical DESC, missing_important DESC, missing_patches_total DESC, resource_id DESC;
+"""
+
+# SQLite only: DuckDB scans are columnar and don't benefit from these
+SQLITE_INDEXES_SQL = """
+CREATE INDEX idx_patch_compliance_system_name ON patch_compliance(system_name);
+CREATE INDEX idx_patch_compliance_last_contact ON patch_compliance(last_contact);
+CREATE INDEX idx_patch_compliance_priority ON patch_compliance(
+    missing_critical DESC, missing_important DESC, missing_patches_total DESC
+);
+"""
+
+CREATE_HISTORY_SQL = """
+CREATE TABLE IF NOT EXISTS patch_compliance_history (
+    resource_id BIGINT NOT NULL,
+    valid_from TIMESTAMP NOT NULL,
+    valid_to TIMESTAMP,
+    row_hash CHAR(32) NOT NULL,
+    {columns},
+    PRIMARY KEY (resource_id, valid_from)
+);
+"""
+
+HISTORY_COLUMN_TYPES = {
+    'system_name': 'VARCHAR(255)', 'system_domain': 'VARCHAR(100)', 'fqdn_name': 'VARCHAR(500)',
+    'friendly_name': 'VARCHAR(255)', 'agent_version': 'VARCHAR(50)',
+    'system_added_date': 'TIMESTAMP', 'patch_compliance_pct': 'DECIMAL(5,2)',
+}
+
+TRACKED = [name.strip() for name in HISTORY_TRACKED_COLUMNS.split(',')]
+
+
+class EmbeddedTarget:
+    """An open DuckDB or SQLite file used in place of the private database"""
+
+    def __init__(self, conn, dialect, path):
+        self.conn = conn
+        self.dialect = dialect
+        self.path = path
+
+    def sql(self, text):
+        """Adapt psycopg2 %s placeholders to the embedded driver's ?"""
+        return text.replace('%s', '?')
+
+    def script(self, text):
+        """Run a multi-statement script"""
+        cursor = self.conn.cursor()
+        try:
+            for statement in text.split(';'):
+                if statement.strip():
+                    cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    def begin(self):
+        # DuckDB autocommits unless a transaction is opened explicitly;
+        # sqlite3 opens one implicitly before the first write
+        if self.dialect == 'duckdb':
+            self.conn.begin()
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        self.conn.close()
+
+
+def connect(kind='duckdb', path=None):
+    """
+    Open an embedded target file
+
+    kind 'duckdb' falls back to SQLite when the duckdb package is missing.
+    """
+    if kind == 'duckdb':
+        try:
+            import duckdb
+        except ImportError:
+            kind = 'sqlite'
+            if path and path.endswith('.duckdb'):
+                path = path[:-len('.duckdb')] + '.sqlite'
+        else:
+            path = path or DEFAULT_PATHS['duckdb']
+            return EmbeddedTarget(duckdb.connect(path), 'duckdb', os.path.abspath(path))
+
+    import sqlite3
+
+    path = path or DEFAULT_PATHS['sqlite']
+    return EmbeddedTarget(sqlite3.connect(path), 'sqlite', os.path.abspath(path))
+
+
+def _ddl(target, text):
+    dialect = DIALECTS[target.dialect]
+    return text.format(
+        generated=dialect['generated'],
+        real=dialect['real'],
+        now=dialect['now'],
+        days_ago_7=dialect['days_ago'].format(days=7),
+        days_ago_30=dialect['days_ago'].format(days=30),
+    )
+
+
+def create_tables(target):
+    """Drop and recreate patch_compliance and the summary view"""
+    target.begin()
+    try:
+        target.script(_ddl(target, CREATE_TABLE_SQL))
+        if target.dialect == 'sqlite':
+            target.script(SQLITE_INDEXES_SQL)
+        target.commit()
+    except Exception:
+        target.rollback()
+        raise
+
+
+def _value(target, value):
+    # SQLite has no timestamp type; ISO text sorts and compares correctly
+    if target.dialect == 'sqlite' and hasattr(value, 'isoformat'):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def load_systems(target, systems, batch_size=1000):
+    """Insert extracted rows into patch_compliance; returns the row count"""
+    cursor = target.conn.cursor()
+    sql = target.sql(INSERT_SQL)
+    inserted = 0
+    target.begin()
+    try:
+        batch = []
+        for row in systems:
+            batch.append(tuple(_value(target, value) for value in row))
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                inserted += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            inserted += len(batch)
+        target.commit()
+    except Exception:
+        target.rollback()
+        raise
+    finally:
+        cursor.close()
+    return inserted
+
+
+def _row_hash(values):
+    return hashlib.md5('|'.join('' if v is None else str(v) for v in values).encode('utf-8')).hexdigest()
+
+
+def record_history(target):
+    """
+    Write a new patch_compliance_history version for each changed system
+
+    Same validity-range model as the PostgreSQL history, with the change
+    detection hash computed here instead of md5(ROW(...)). Returns (opened, closed).
+    """
+    columns = ',\n    '.join(f"{name} {HISTORY_COLUMN_TYPES.get(name, 'INTEGER')}" for name in TRACKED)
+    cursor = target.conn.cursor()
+    target.begin()
+    try:
+        target.script(CREATE_HISTORY_SQL.format(columns=columns))
+        cursor.execute("SELECT MAX(snapshot_date) FROM patch_compliance")
+        snapshot = cursor.fetchone()[0]
+        cursor.execute(f"SELECT resource_id, {', '.join(TRACKED)} FROM patch_compliance")
+        systems = {row[0]: (_row_hash(row[1:]), row[1:]) for row in cursor.fetchall()}
+        cursor.execute("SELECT resource_id, row_hash FROM patch_compliance_history WHERE valid_to IS NULL")
+        current = dict(cursor.fetchall())
+
+        closing = [(snapshot, resource_id) for resource_id, row_hash in current.items()
+                   if systems.get(resource_id, (None,))[0] != row_hash]
+        opening = [(resource_id, snapshot, row_hash) + values
+                   for resource_id, (row_hash, values) in systems.items()
+                   if current.get(resource_id) != row_hash]
+        if closing:
+            cursor.executemany(
+                "UPDATE patch_compliance_history SET valid_to = ? WHERE resource_id = ? AND valid_to IS NULL",
+                closing)
+        if opening:
+            cursor.executemany(
+                f"INSERT INTO patch_compliance_history (resource_id, valid_from, row_hash, {', '.join(TRACKED)}) "
+                f"VALUES ({', '.join(['?'] * (len(TRACKED) + 3))})",
+                opening)
+        target.commit()
+        return len(opening), len(closing)
+    except Exception:
+        target.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def summary_stats(target):
+    """Fleet-wide totals from patch_compliance as a dict"""
+    cursor = target.conn.cursor()
+    try:
+        stats = {}
+        for key, name in [
+            ('total_systems', 'count_systems'),
+            ('systems_with_missing', 'count_missing_any'),
+            ('systems_critical', 'count_missing_critical'),
+            ('total_missing', 'sum_missing'),
+            ('avg_compliance', 'avg_compliance'),
+        ]:
+            cursor.execute(WORKLOAD[name]['sql'])
+            stats[key] = cursor.fetchone()[0] or 0
+        return stats
+    finally:
+        cursor.close()
+
+
+def top_systems(target):
+    """Top 10 systems needing patches, most critical first"""
+    cursor = target.conn.cursor()
+    try:
+        cursor.execute(WORKLOAD['top_systems_needing_patches']['sql'])
+        return cursor.fetchall()
+    finally:
+        cursor.close()
@@ -0,0 +1,104 @@
+"""
+Pre-flight cost estimation for extraction and report queries
+
+Runs EXPLAIN (never ANALYZE) so nothing is executed on the server, and turns
+the top plan node into estimated rows, total cost and transfer size
+(row width x rows). Commands compare the estimates against configurable
+limits before running anything against production.
+"""
+
+from . import config
+
+
+def explain(conn, sql, params=None):
+    """Return the JSON plan for a query without executing it"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        return cursor.fetchone()[0][0]['Plan']
+    finally:
+        cursor.close()
+
+
+def plan_shape(plan, depth=0):
+    """Indented one-line-per-node outline of a plan"""
+    label = plan['Node Type']
+    if plan.get('Relation Name'):
+        label += f" on {plan['Relation Name']}"
+    if plan.get('Index Name'):
+        label += f" using {plan['Index Name']}"
+    lines = [f"{'  ' * depth}{label} (rows={plan['Plan Rows']:,})"]
+    for child in plan.get('Plans', []):
+        lines.extend(plan_shape(child, depth + 1))
+    return lines
+
+
+def estimate_query(conn, name, sql, params=None):
+    """EXPLAIN a query and summarise what running it would cost"""
+    plan = explain(conn, sql, params)
+    rows = int(plan['Plan Rows'])
+    width = int(plan['Plan Width'])
+    return {
+        'name': name,
+        'rows': rows,
+        'width': width,
+        'bytes': rows * width,
+        'cost': float(plan['Total Cost']),
+        'shape': plan_shape(plan),
+    }
+
+
+def over_limits(estimate, limits):
+    """List of limits the estimate exceeds (empty when within limits)"""
+    exceeded = []
+    if limits.get('max_rows') is not None and estimate['rows'] > limits['max_rows']:
+        exceeded.append(f"{estimate['rows']:,} rows > {limits['max_rows']:,}")
+    if limits.get('max_bytes') is not None and estimate['bytes'] > limits['max_bytes']:
+        exceeded.append(f"{format_bytes(estimate['bytes'])} > {format_bytes(limits['max_bytes'])}")
+    if limits.get('max_cost') is not None and estimate['cost'] > limits['max_cost']:
+        exceeded.append(f"cost {estimate['cost']:,.0f} > {limits['max_cost']:,.0f}")
+    return exceeded
+
+
+def limits_from_args(args):
+    """Plan limits from the environment, overridden by command line flags"""
+    limits = config.plan_limits()
+    for key in ('max_rows', 'max_bytes', 'max_cost'):
+        value = getattr(args, key, None)
+        if value is not None:
+            limits[key] = value if value > 0 else None
+    for key in ('over_limit', 'chunk_size'):
+        if getattr(args, key, None):
+            limits[key] = getattr(args, key)
+    return limits
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
+
+
+def print_estimates(estimates, limits, show_plans=True):
+    """Print a table of estimates; returns True if all are within limits"""
+    print(f"{'Query':30s} | {'Est. rows':>12s} | {'Width':>6s} | {'Est. size':>10s} | {'Total cost':>12s} | {'Limits':8s}")
+    print("-" * 96)
+    within = True
+    for estimate in estimates:
+        exceeded = over_limits(estimate, limits)
+        within = within and not exceeded
+        print(f"{estimate['name']:30s} | {estimate['rows']:12,d} | {estimate['width']:6d} | "
+              f"{format_bytes(estimate['bytes']):>10s} | {estimate['cost']:12,.2f} | "
+              f"{'OVER' if exceeded else 'ok':8s}")
+        for reason in exceeded:
+            print(f"{'':30s}   -> {reason}")
+        if show_plans:
+            for line in estimate['shape']:
+                print(f"{'':4s}{line}")
+
+    print("\nLimits: "
+          f"rows {'unlimited' if limits['max_rows'] is None else format(limits['max_rows'], ',')} | "
+          f"size {'unlimited' if limits['max_bytes'] is None else format_bytes(limits['max_bytes'])} | "
+          f"cost {'unlimited' if limits['max_cost'] is None else format(limits['max_cost'], ',.0f')}")
+    return within
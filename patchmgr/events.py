@@ -0,0 +1,532 @@
+"""
+Patch status event log with time-to-remediate rollup (`patchmgr ingest`)
+
+PMP keeps only the current affectedpatchstatus rows, so installation history
+is rebuilt here from what changes between agent scans. Each system's
+pmresourcepatchcount.db_updated_time is the scan time PMP recorded. It is the
+time watermark, so every run reads only the systems rescanned since the last
+one, and only their affectedpatchstatus rows.
+
+Those rows are diffed against patch_status_current (the last known state) and
+appended to patch_status_events, an insert-only table partitioned by month:
+
+- detected:       a patch becomes missing on a system, either newly listed
+                  in a missing status or moved into one (Ignore -> Missing)
+- status_changed: same patch, different status, without becoming missing or
+                  no longer missing (Available -> Missing, Ignore -> Installed)
+- remediated:     a missing patch that is no longer missing: not listed any
+                  more for a rescanned system, or moved to another status
+                  (Installed, Ignore), with the hours it was missing
+- baseline:       patches missing on the very first run, before history existed
+
+Missing means one of compliance_sql.MISSING_STATUSES.
+
+remediation_rollup keeps per-severity counts and hour totals. It is
+incremented from each run's remediated events, so mean time to remediate
+never needs a scan of the history. Event times have agent scan resolution.
+"""
+
+from datetime import date, datetime
+
+from . import db, registry, runs
+from .compliance_sql import missing_status
+
+STREAM = 'patch_status'
+
+SEVERITY_NAMES = {0: 'Unrated', 1: 'Low', 2: 'Moderate', 3: 'Important', 4: 'Critical', 5: 'Info'}
+
+CHANGED_SYSTEMS_SQL = """
+    SELECT resource_id, db_updated_time
+    FROM pmresourcepatchcount
+    WHERE db_updated_time > %(watermark)s
+    ORDER BY db_updated_time, resource_id;
+"""
+
+SYSTEM_STATUS_SQL = """
+    SELECT resource_id, patch_id, status_id, status, severity_id
+    FROM affectedpatchstatus
+    WHERE resource_id = ANY(%(resource_ids)s);
+"""
+
+registry.register_all('ingest', {
+    'changed_systems': CHANGED_SYSTEMS_SQL,
+    'system_status': SYSTEM_STATUS_SQL,
+})
+
+CREATE_EVENTS_SQL = """
+CREATE TABLE IF NOT EXISTS patch_status_events (
+    event_time TIMESTAMP NOT NULL,
+    resource_id BIGINT NOT NULL,
+    patch_id BIGINT NOT NULL,
+    severity_id INTEGER,
+    event_type VARCHAR(20) NOT NULL,
+    status_id INTEGER,
+    status VARCHAR(100),
+    previous_status_id INTEGER,
+    hours_open NUMERIC(10,2),
+    ingested_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+) PARTITION BY RANGE (event_time);
+
+CREATE INDEX IF NOT EXISTS idx_patch_status_events_system ON patch_status_events(resource_id, patch_id, event_time);
+CREATE INDEX IF NOT EXISTS idx_patch_status_events_type ON patch_status_events(event_type, event_time);
+
+CREATE TABLE IF NOT EXISTS patch_status_current (
+    resource_id BIGINT NOT NULL,
+    patch_id BIGINT NOT NULL,
+    severity_id INTEGER,
+    status_id INTEGER,
+    status VARCHAR(100),
+    first_seen TIMESTAMP NOT NULL,
+    last_seen TIMESTAMP NOT NULL,
+    missing_since TIMESTAMP,
+    baseline BOOLEAN NOT NULL DEFAULT false,
+    PRIMARY KEY (resource_id, patch_id)
+);
+
+-- Tables from before missing_since: rows in a missing status have been
+-- missing since they were first seen
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'patch_status_current' AND column_name = 'missing_since'
+    ) THEN
+        ALTER TABLE patch_status_current ADD COLUMN missing_since TIMESTAMP;
+        UPDATE patch_status_current SET missing_since = first_seen WHERE {missing};
+    END IF;
+END $$;
+
+-- Tables from before status matched the extract mirror's VARCHAR(100);
+-- widening a VARCHAR does not rewrite the table
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'patch_status_events' AND column_name = 'status' AND character_maximum_length < 100
+    ) THEN
+        ALTER TABLE patch_status_events ALTER COLUMN status TYPE VARCHAR(100);
+    END IF;
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'patch_status_current' AND column_name = 'status' AND character_maximum_length < 100
+    ) THEN
+        ALTER TABLE patch_status_current ALTER COLUMN status TYPE VARCHAR(100);
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS ingest_watermarks (
+    stream VARCHAR(50) PRIMARY KEY,
+    watermark_ms BIGINT NOT NULL DEFAULT 0,
+    runs INTEGER NOT NULL DEFAULT 0,
+    events BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS remediation_rollup (
+    severity_id INTEGER PRIMARY KEY,
+    remediated BIGINT NOT NULL DEFAULT 0,
+    total_hours NUMERIC NOT NULL DEFAULT 0,
+    min_hours NUMERIC,
+    max_hours NUMERIC,
+    baseline_remediated BIGINT NOT NULL DEFAULT 0,
+    last_remediated TIMESTAMP
+);
+
+COMMENT ON TABLE patch_status_events IS 'Insert-only patch status change log, partitioned by month';
+COMMENT ON TABLE remediation_rollup IS 'Per-severity time-to-remediate totals, updated incrementally by patchmgr ingest';
+COMMENT ON COLUMN patch_status_current.missing_since IS 'Scan time the patch became missing; NULL when it is not missing';
+""".format(missing=missing_status('status'))
+
+CREATE_PARTITION_SQL = """
+CREATE TABLE IF NOT EXISTS patch_status_events_{suffix}
+PARTITION OF patch_status_events FOR VALUES FROM ('{start}') TO ('{end}');
+"""
+
+CREATE_BATCH_SQL = """
+CREATE TEMP TABLE ingest_systems (resource_id BIGINT PRIMARY KEY, scanned_at TIMESTAMP NOT NULL) ON COMMIT DROP;
+CREATE TEMP TABLE ingest_status (
+    resource_id BIGINT, patch_id BIGINT, status_id INTEGER, status VARCHAR(100), severity_id INTEGER
+) ON COMMIT DROP;
+CREATE TEMP TABLE ingest_remediated (
+    resource_id BIGINT, patch_id BIGINT, severity_id INTEGER, previous_status_id INTEGER,
+    status_id INTEGER, status VARCHAR(100), baseline BOOLEAN, scanned_at TIMESTAMP, hours_open NUMERIC
+) ON COMMIT DROP;
+"""
+
+BATCH_MONTHS_SQL = "SELECT DISTINCT date_trunc('month', scanned_at)::date FROM ingest_systems;"
+
+# Items of rescanned systems that are no longer listed; those that were
+# missing are remediated, the rest are dropped without an event
+REMOVE_GONE_SQL = """
+WITH gone AS (
+    DELETE FROM patch_status_current c
+    USING ingest_systems s
+    WHERE c.resource_id = s.resource_id
+    AND NOT EXISTS (
+        SELECT 1 FROM ingest_status t
+        WHERE t.resource_id = c.resource_id AND t.patch_id = c.patch_id
+    )
+    RETURNING c.resource_id, c.patch_id, c.severity_id, c.status_id, c.missing_since, c.baseline, s.scanned_at
+)
+INSERT INTO ingest_remediated
+SELECT resource_id, patch_id, severity_id, status_id, NULL, NULL, baseline, scanned_at,
+       GREATEST(EXTRACT(EPOCH FROM scanned_at - missing_since) / 3600, 0)
+FROM gone
+WHERE missing_since IS NOT NULL;
+"""
+
+# Missing items still listed, but now in a status that isn't missing
+CLOSE_CHANGED_SQL = f"""
+INSERT INTO ingest_remediated
+SELECT c.resource_id, c.patch_id, t.severity_id, c.status_id, t.status_id, t.status, c.baseline, s.scanned_at,
+       GREATEST(EXTRACT(EPOCH FROM s.scanned_at - c.missing_since) / 3600, 0)
+FROM ingest_status t
+JOIN ingest_systems s ON s.resource_id = t.resource_id
+JOIN patch_status_current c ON c.resource_id = t.resource_id AND c.patch_id = t.patch_id
+WHERE c.missing_since IS NOT NULL
+AND (t.status IS NULL OR NOT {missing_status('t.status')});
+"""
+
+INSERT_REMEDIATED_SQL = """
+INSERT INTO patch_status_events
+    (event_time, resource_id, patch_id, severity_id, event_type, status_id, status, previous_status_id, hours_open)
+SELECT scanned_at, resource_id, patch_id, severity_id, 'remediated', status_id, status, previous_status_id,
+       round(hours_open, 2)
+FROM ingest_remediated;
+"""
+
+# Items first seen in the baseline have an unknown start, so they are counted
+# separately and kept out of the hour totals
+UPDATE_ROLLUP_SQL = """
+INSERT INTO remediation_rollup AS r
+    (severity_id, remediated, total_hours, min_hours, max_hours, baseline_remediated, last_remediated)
+SELECT
+    coalesce(severity_id, 0),
+    COUNT(*) FILTER (WHERE NOT baseline),
+    coalesce(SUM(hours_open) FILTER (WHERE NOT baseline), 0),
+    MIN(hours_open) FILTER (WHERE NOT baseline),
+    MAX(hours_open) FILTER (WHERE NOT baseline),
+    COUNT(*) FILTER (WHERE baseline),
+    MAX(scanned_at)
+FROM ingest_remediated
+GROUP BY coalesce(severity_id, 0)
+ON CONFLICT (severity_id) DO UPDATE SET
+    remediated = r.remediated + EXCLUDED.remediated,
+    total_hours = r.total_hours + EXCLUDED.total_hours,
+    min_hours = LEAST(r.min_hours, EXCLUDED.min_hours),
+    max_hours = GREATEST(r.max_hours, EXCLUDED.max_hours),
+    baseline_remediated = r.baseline_remediated + EXCLUDED.baseline_remediated,
+    last_remediated = GREATEST(r.last_remediated, EXCLUDED.last_remediated);
+"""
+
+# Items that became missing: newly listed, or moved from a status that isn't missing
+INSERT_DETECTED_SQL = f"""
+INSERT INTO patch_status_events
+    (event_time, resource_id, patch_id, severity_id, event_type, status_id, status, previous_status_id)
+SELECT s.scanned_at, t.resource_id, t.patch_id, t.severity_id, %(event_type)s, t.status_id, t.status, c.status_id
+FROM ingest_status t
+JOIN ingest_systems s ON s.resource_id = t.resource_id
+LEFT JOIN patch_status_current c ON c.resource_id = t.resource_id AND c.patch_id = t.patch_id
+WHERE {missing_status('t.status')}
+AND c.missing_since IS NULL;
+"""
+
+# Status changes on the same side of missing (the others are detected or remediated)
+INSERT_CHANGED_SQL = f"""
+INSERT INTO patch_status_events
+    (event_time, resource_id, patch_id, severity_id, event_type, status_id, status, previous_status_id)
+SELECT s.scanned_at, t.resource_id, t.patch_id, t.severity_id, 'status_changed', t.status_id, t.status, c.status_id
+FROM ingest_status t
+JOIN ingest_systems s ON s.resource_id = t.resource_id
+JOIN patch_status_current c ON c.resource_id = t.resource_id AND c.patch_id = t.patch_id
+WHERE (c.status_id, c.status) IS DISTINCT FROM (t.status_id, t.status)
+AND (c.missing_since IS NOT NULL) = coalesce({missing_status('t.status')}, false);
+"""
+
+# missing_since keeps the time an item became missing while it stays missing;
+# baseline is only carried over with it
+UPSERT_CURRENT_SQL = f"""
+INSERT INTO patch_status_current
+    (resource_id, patch_id, severity_id, status_id, status, first_seen, last_seen, missing_since, baseline)
+SELECT t.resource_id, t.patch_id, t.severity_id, t.status_id, t.status, s.scanned_at, s.scanned_at,
+       CASE WHEN {missing_status('t.status')} THEN s.scanned_at END, %(baseline)s
+FROM ingest_status t
+JOIN ingest_systems s ON s.resource_id = t.resource_id
+ON CONFLICT (resource_id, patch_id) DO UPDATE SET
+    severity_id = EXCLUDED.severity_id,
+    status_id = EXCLUDED.status_id,
+    status = EXCLUDED.status,
+    last_seen = EXCLUDED.last_seen,
+    missing_since = CASE WHEN EXCLUDED.missing_since IS NOT NULL
+                         THEN coalesce(patch_status_current.missing_since, EXCLUDED.missing_since) END,
+    baseline = CASE WHEN EXCLUDED.missing_since IS NOT NULL AND patch_status_current.missing_since IS NOT NULL
+                    THEN patch_status_current.baseline ELSE EXCLUDED.baseline END;
+"""
+
+SAVE_WATERMARK_SQL = """
+INSERT INTO ingest_watermarks (stream, watermark_ms, runs, events, updated_at)
+VALUES (%(stream)s, %(watermark)s, %(runs)s, %(events)s, CURRENT_TIMESTAMP)
+ON CONFLICT (stream) DO UPDATE SET
+    watermark_ms = GREATEST(ingest_watermarks.watermark_ms, EXCLUDED.watermark_ms),
+    runs = ingest_watermarks.runs + EXCLUDED.runs,
+    events = ingest_watermarks.events + EXCLUDED.events,
+    updated_at = EXCLUDED.updated_at;
+"""
+
+ROLLUP_SQL = """
+SELECT severity_id, remediated,
+       CASE WHEN remediated > 0 THEN total_hours / remediated END AS mean_hours,
+       min_hours, max_hours, baseline_remediated, last_remediated
+FROM remediation_rollup
+ORDER BY severity_id DESC;
+"""
+
+
+def create_tables(priv_conn):
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute(CREATE_EVENTS_SQL)
+        priv_conn.commit()
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def watermark(priv_conn):
+    """(watermark_ms, runs, events, updated_at) for the status stream, or None"""
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute("SELECT watermark_ms, runs, events, updated_at FROM ingest_watermarks WHERE stream = %s;",
+                       (STREAM,))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def _batches(systems, batch_size):
+    """
+    Split (resource_id, db_updated_time) rows, ordered by time, into batches
+
+    A batch only ends where the time changes, so committing its highest time
+    as the watermark never skips systems scanned in the same millisecond.
+    """
+    batch = []
+    for row in systems:
+        if len(batch) >= batch_size and row[1] != batch[-1][1]:
+            yield batch
+            batch = []
+        batch.append(row)
+    if batch:
+        yield batch
+
+
+def _ensure_partitions(cursor):
+    cursor.execute(BATCH_MONTHS_SQL)
+    for (month,) in cursor.fetchall():
+        following = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        cursor.execute(CREATE_PARTITION_SQL.format(suffix=month.strftime('%Y_%m'), start=month, end=following))
+
+
+def _apply_batch(pmp_conn, priv_conn, batch, baseline):
+    """Diff one batch of rescanned systems; returns {event_type: count}"""
+    from psycopg2.extras import execute_values
+
+    pmp_cursor = pmp_conn.cursor()
+    try:
+        rows = registry.fetchall(pmp_cursor, 'ingest.system_status',
+                                 {'resource_ids': [resource_id for resource_id, _ in batch]})
+    finally:
+        pmp_cursor.close()
+        pmp_conn.rollback()
+
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute(CREATE_BATCH_SQL)
+        execute_values(cursor, "INSERT INTO ingest_systems VALUES %s",
+                       [(resource_id, updated_ms / 1000.0) for resource_id, updated_ms in batch],
+                       template="(%s, to_timestamp(%s)::timestamp)")
+        if rows:
+            execute_values(cursor, "INSERT INTO ingest_status VALUES %s", rows, page_size=5000)
+        _ensure_partitions(cursor)
+
+        counts = {}
+        cursor.execute(REMOVE_GONE_SQL)
+        cursor.execute(CLOSE_CHANGED_SQL)
+        cursor.execute(INSERT_REMEDIATED_SQL)
+        counts['remediated'] = cursor.rowcount
+        cursor.execute(UPDATE_ROLLUP_SQL)
+        cursor.execute(INSERT_DETECTED_SQL, {'event_type': 'baseline' if baseline else 'detected'})
+        counts['baseline' if baseline else 'detected'] = cursor.rowcount
+        cursor.execute(INSERT_CHANGED_SQL)
+        counts['status_changed'] = cursor.rowcount
+        cursor.execute(UPSERT_CURRENT_SQL, {'baseline': baseline})
+        cursor.execute(SAVE_WATERMARK_SQL, {'stream': STREAM, 'watermark': batch[-1][1], 'runs': 0,
+                                            'events': sum(counts.values())})
+        priv_conn.commit()
+        return counts
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def ingest(pmp_conn, priv_conn, batch_size=500, progress=None):
+    """
+    Append events for systems rescanned since the watermark
+
+    Each batch commits its events, state and watermark together, so a failed
+    run resumes after the last committed batch. Returns ({event_type: count}, systems).
+    """
+    create_tables(priv_conn)
+    state = watermark(priv_conn)
+    since = state[0] if state else 0
+    baseline = state is None or state[1] == 0
+
+    cursor = pmp_conn.cursor()
+    try:
+        systems = registry.fetchall(cursor, 'ingest.changed_systems', {'watermark': since})
+    finally:
+        cursor.close()
+        pmp_conn.rollback()
+
+    totals = {}
+    for number, batch in enumerate(_batches(systems, batch_size), 1):
+        for event_type, count in _apply_batch(pmp_conn, priv_conn, batch, baseline).items():
+            totals[event_type] = totals.get(event_type, 0) + count
+        if progress:
+            progress(number, batch, totals)
+
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute(SAVE_WATERMARK_SQL, {'stream': STREAM, 'watermark': since, 'runs': 1, 'events': 0})
+        cursor.execute("ANALYZE patch_status_current;")
+        priv_conn.commit()
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return totals, len(systems)
+
+
+def rollup(priv_conn):
+    """[(severity_id, remediated, mean_hours, min_hours, max_hours, baseline_remediated, last_remediated)]"""
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute(ROLLUP_SQL)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def print_rollup(priv_conn):
+    print(f"{'Severity':10s} | {'Remediated':>10s} | {'Mean hours':>10s} | {'Min':>8s} | {'Max':>8s} | "
+          f"{'Baseline':>8s} | Last remediated")
+    print("-" * 95)
+    for severity_id, count, mean, low, high, baseline, last in rollup(priv_conn):
+        hours = [f"{float(value):.1f}" if value is not None else "-" for value in (mean, low, high)]
+        last_str = last.strftime("%Y-%m-%d %H:%M") if last else "-"
+        print(f"{SEVERITY_NAMES.get(severity_id, str(severity_id)):10s} | {count:10,d} | {hours[0]:>10s} | "
+              f"{hours[1]:>8s} | {hours[2]:>8s} | {baseline:8,d} | {last_str}")
+
+
+def print_status(priv_conn):
+    """Watermark, events per monthly partition and the remediation rollup"""
+    create_tables(priv_conn)
+    state = watermark(priv_conn)
+    if not state:
+        print("No ingestion has run yet")
+        return 0
+    watermark_ms, run_count, events, updated = state
+    print(f"Watermark: {datetime.fromtimestamp(watermark_ms / 1000):%Y-%m-%d %H:%M:%S} "
+          f"({run_count} runs, {events:,} events, last run {updated:%Y-%m-%d %H:%M:%S})")
+
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT date_trunc('month', event_time)::date, event_type, COUNT(*)
+            FROM patch_status_events
+            GROUP BY 1, 2
+            ORDER BY 1, 2;
+        """)
+        print(f"\n{'Month':10s} | {'Event':15s} | {'Count':>10s}")
+        print("-" * 42)
+        for month, event_type, count in cursor.fetchall():
+            print(f"{month:%Y-%m}    | {event_type:15s} | {count:10,d}")
+    finally:
+        cursor.close()
+
+    print("\nTIME TO REMEDIATE")
+    print_rollup(priv_conn)
+    return 0
+
+
+def _ingest(args):
+    print("STEP 1: Connecting to Patch Manager Plus and private databases...")
+    try:
+        pmp_conn = db.connect_pmp()
+    except Exception as e:
+        print(f"  ERROR: Failed to connect to PMP database: {e}")
+        return 1
+    try:
+        try:
+            priv_conn = db.connect_private()
+        except Exception as e:
+            print(f"  ERROR: Failed to connect to private database: {e}")
+            return 1
+        try:
+            return _ingest_steps(args, pmp_conn, priv_conn)
+        finally:
+            priv_conn.close()
+    finally:
+        pmp_conn.close()
+
+
+def _ingest_steps(args, pmp_conn, priv_conn):
+    """STEP 2 onwards of `patchmgr ingest`"""
+    print("  Connected!")
+    print("\nSTEP 2: Reading systems rescanned since the watermark...")
+
+    def progress(number, batch, totals):
+        print(f"  batch {number}: {len(batch):,} systems, "
+              f"{', '.join(f'{count:,} {name}' for name, count in sorted(totals.items()))}")
+
+    try:
+        totals, systems = ingest(pmp_conn, priv_conn, args.batch_size, progress)
+    except Exception as e:
+        print(f"  ERROR: Ingestion failed: {e}")
+        print("  Committed batches are kept; run patchmgr ingest again to resume.")
+        return 1
+    if not systems:
+        print("  No systems rescanned since the last run")
+    else:
+        print(f"  {systems:,} systems: "
+              f"{', '.join(f'{count:,} {name}' for name, count in sorted(totals.items())) or 'no changes'}")
+
+    print("\nSTEP 3: Time to remediate by severity")
+    print_rollup(priv_conn)
+
+    print("\n" + "=" * 80)
+    print("INGEST COMPLETE")
+    print(f"Completed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 80)
+    return 0
+
+
+def main(args):
+    """`patchmgr ingest`: append patch status events since the last run"""
+    if args.status:
+        conn = db.connect_private()
+        try:
+            return print_status(conn)
+        finally:
+            conn.close()
+
+    print("=" * 80)
+    print("PATCH STATUS EVENT INGEST")
+    print("=" * 80)
+    print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    return runs.run_locked('ingest', args, lambda: _ingest(args))
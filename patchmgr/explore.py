@@ -0,0 +1,254 @@
+"""
+Explore Patch Manager Plus database schema
+
+- Keyword search for tables related to systems, patches, policies, and deployment
+- Column definitions and sample data for the key tables (--examine)
+- Severity level tables and how severity is stored per resource (--severity)
+"""
+
+from . import db, registry
+
+KEYWORDS_SYSTEMS = ['computer', 'system', 'machine', 'resource', 'device', 'endpoint', 'agent']
+KEYWORDS_PATCHES = ['patch', 'update', 'vulnerability', 'missing', 'deployed', 'installed']
+KEYWORDS_POLICIES = ['policy', 'group', 'config', 'deployment', 'schedule']
+
+KEY_TABLE_HINTS = [
+    'ManagedComputer', 'Resource', 'PatchDetails', 'PatchInstalled',
+    'PatchMissing', 'PatchStatus', 'ResourcePatch', 'PatchApproval',
+    'DeploymentPolicy', 'ConfigData', 'SystemPatch', 'PatchHistory'
+]
+
+# Key tables to examine
+TABLES_TO_EXAMINE = [
+    ('managedcomputer', 'Systems/Computers being managed'),
+    ('patchdetails', 'Available patches'),
+    ('affectedpatchstatus', 'Patch status per system'),
+    ('customerpatchstatus', 'Custom patch statuses'),
+    ('pmresourcepatchcount', 'Patch counts per resource'),
+    ('collectiontopatch', 'Collection-patch mappings'),
+]
+
+SEVERITY_TABLES = ['pmseverity', 'pmrespatchseveritycount', 'resourcepatchseveritycount']
+
+ALL_TABLES_SQL = """
+    SELECT table_name
+    FROM information_schema.tables
+    WHERE table_schema = 'public'
+    ORDER BY table_name;
+"""
+
+# {table} is filled with a quoted identifier, not a parameter
+ROW_COUNT_SQL = 'SELECT COUNT(*) FROM {table};'
+
+TABLE_COLUMNS_SQL = """
+    SELECT column_name, data_type, character_maximum_length
+    FROM information_schema.columns
+    WHERE table_name = %(table)s
+    ORDER BY ordinal_position;
+"""
+
+SAMPLE_ROWS_SQL = 'SELECT * FROM {table} LIMIT %(limit)s;'
+
+MANAGED_COMPUTERS_SQL = """
+    SELECT
+        resource_id,
+        resource_name,
+        domain_netbios_name,
+        branch_office_id,
+        customer_id
+    FROM managedcomputer
+    LIMIT 10;
+"""
+
+PATCH_STATUS_SAMPLE_SQL = """
+    SELECT
+        patch_id,
+        resource_id,
+        status_id,
+        severity_id
+    FROM affectedpatchstatus
+    LIMIT 10;
+"""
+
+SEVERITY_DISTRIBUTION_SQL = """
+    SELECT severity_id, COUNT(*) as count
+    FROM affectedpatchstatus
+    WHERE severity_id IS NOT NULL
+    GROUP BY severity_id
+    ORDER BY severity_id;
+"""
+
+registry.register_all('explore', {
+    'all_tables': ALL_TABLES_SQL,
+    'row_count': ROW_COUNT_SQL,
+    'table_columns': TABLE_COLUMNS_SQL,
+    'sample_rows': SAMPLE_ROWS_SQL,
+    'managed_computers': MANAGED_COMPUTERS_SQL,
+    'patch_status_sample': PATCH_STATUS_SAMPLE_SQL,
+    'severity_distribution': SEVERITY_DISTRIBUTION_SQL,
+}, prepare={'table_columns'})
+
+
+def all_tables(cursor):
+    """Names of all tables in the public schema"""
+    return [row[0] for row in registry.fetchall(cursor, 'explore.all_tables')]
+
+
+def find_tables_by_keywords(tables, keywords):
+    """Tables whose name contains any of the keywords"""
+    matches = []
+    for table in tables:
+        table_lower = table.lower()
+        for keyword in keywords:
+            if keyword in table_lower:
+                matches.append(table)
+                break
+    return matches
+
+
+def row_count(cursor, table):
+    return registry.fetchone(cursor, 'explore.row_count', identifiers={'table': table})[0]
+
+
+def table_columns(cursor, table):
+    """(column_name, data_type, character_maximum_length) in column order"""
+    return registry.fetchall(cursor, 'explore.table_columns', {'table': table})
+
+
+def sample_rows(cursor, table, limit):
+    """First rows of a table; column names are in cursor.description"""
+    return registry.fetchall(cursor, 'explore.sample_rows', {'limit': limit}, identifiers={'table': table})
+
+
+def print_schema_search(cursor):
+    """Print tables matching the system, patch and policy keywords with row counts"""
+    print("Patch Manager Plus Database Schema Explorer")
+    print("=" * 70)
+
+    tables = all_tables(cursor)
+
+    for number, title, keywords, kind in [
+        (1, "SYSTEM/COMPUTER TABLES", KEYWORDS_SYSTEMS, "system"),
+        (2, "PATCH/UPDATE TABLES", KEYWORDS_PATCHES, "patch"),
+        (3, "POLICY/GROUP TABLES", KEYWORDS_POLICIES, "policy"),
+    ]:
+        print(f"\n{number}. {title}:")
+        print("-" * 70)
+        matches = find_tables_by_keywords(tables, keywords)
+        for table in matches[:30]:
+            print(f"  {table:50s} ({row_count(cursor, table):,} rows)")
+        if len(matches) > 30:
+            print(f"  ... and {len(matches) - 30} more {kind} tables")
+
+    # Look for key tables (common ME table names)
+    print("\n4. KEY TABLES (likely most important):")
+    print("-" * 70)
+    for hint in KEY_TABLE_HINTS:
+        matching = [t for t in tables if hint.lower() in t.lower()]
+        if matching:
+            print(f"\n  Tables matching '{hint}':")
+            for table in matching[:10]:
+                print(f"    {table:48s} ({row_count(cursor, table):,} rows)")
+
+    print("\n" + "=" * 70)
+    print("Schema exploration complete!")
+
+
+def print_key_tables(cursor):
+    """Print column definitions and sample rows for the key tables"""
+    print("Examining Key Patch Manager Tables")
+    print("=" * 80)
+
+    for table_name, description in TABLES_TO_EXAMINE:
+        print(f"\n{table_name.upper()} - {description}")
+        print("-" * 80)
+
+        columns = table_columns(cursor, table_name)
+        print(f"  Columns ({len(columns)} total):")
+        for col_name, data_type, max_length in columns:
+            type_str = f"{data_type}"
+            if max_length:
+                type_str += f"({max_length})"
+            print(f"    - {col_name:40s} {type_str}")
+
+        print(f"\n  Sample data (first 3 rows):")
+        try:
+            rows = sample_rows(cursor, table_name, 3)
+            if rows:
+                col_names = [desc[0] for desc in cursor.description]
+                print(f"    Columns: {', '.join(col_names[:10])}")
+                if len(col_names) > 10:
+                    print(f"             ... and {len(col_names) - 10} more columns")
+
+                for i, row in enumerate(rows, 1):
+                    print(f"    Row {i}: {str(row[:5])[:120]}...")
+            else:
+                print("    (no data)")
+        except Exception as e:
+            cursor.connection.rollback()
+            print(f"    Error reading sample data: {e}")
+
+    print("\n\n" + "=" * 80)
+    print("DETAILED ANALYSIS: MANAGEDCOMPUTER TABLE")
+    print("=" * 80)
+    print("\nSample managed computers:")
+    for row in registry.fetchall(cursor, 'explore.managed_computers'):
+        print(f"  ID: {row[0]:5d} | Name: {row[1]:30s} | Domain: {str(row[2]):20s}")
+
+    print("\n\n" + "=" * 80)
+    print("DETAILED ANALYSIS: AFFECTEDPATCHSTATUS TABLE")
+    print("=" * 80)
+    print("\nSample patch status records:")
+    for row in registry.fetchall(cursor, 'explore.patch_status_sample'):
+        print(f"  Patch: {row[0]:8d} | Resource: {row[1]:5d} | Status: {row[2]:3d} | Severity: {row[3]}")
+
+    print("\n" + "=" * 80)
+    print("Examination complete!")
+
+
+def print_severity(cursor):
+    """Print the severity tables and how severity is stored per resource"""
+    print("Checking Severity Level Structure")
+    print("=" * 80)
+
+    print("\n1. Severity ID distribution in affectedpatchstatus:")
+    for sev_id, count in registry.fetchall(cursor, 'explore.severity_distribution'):
+        print(f"  Severity {sev_id}: {count:,} patches")
+
+    for number, table in enumerate(SEVERITY_TABLES, 2):
+        print(f"\n{number}. {table.upper()}")
+        print("-" * 80)
+        try:
+            print("Columns:")
+            for col, dtype, _ in table_columns(cursor, table):
+                print(f"  - {col}: {dtype}")
+
+            rows = sample_rows(cursor, table, 10)
+            col_names = [desc[0] for desc in cursor.description]
+            print(f"\nSample data ({len(rows)} rows shown):")
+            print(f"  {col_names}")
+            for row in rows:
+                print(f"  {row}")
+        except Exception as e:
+            cursor.connection.rollback()
+            print(f"Error: {e}")
+
+    print("\n" + "=" * 80)
+    print("Severity check complete!")
+
+
+def main(args):
+    """`patchmgr explore`"""
+    conn = db.connect_pmp()
+    cursor = conn.cursor()
+    try:
+        if args.examine:
+            print_key_tables(cursor)
+        elif args.severity:
+            print_severity(cursor)
+        else:
+            print_schema_search(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+    return 0
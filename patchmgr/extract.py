@@ -0,0 +1,426 @@
+"""
+Checkpointed, resumable extraction of large PMP tables
+
+Mirrors patchdetails, affectedpatchstatus and pmseverity, plus the collection
+and deployment policy tables, into pmp_* tables in the private database. Each
+table is copied in primary-key order, one chunk per query (keyset pagination,
+no long-running PMP transaction). A chunk and its checkpoint in
+sync_checkpoints commit together, so a failed run resumes from the last
+committed chunk instead of re-reading everything.
+
+Rows are upserted and stamped with the pass start time; when a pass
+completes, rows not seen in that pass (deleted in PMP) are removed.
+Tables marked optional are skipped when the PMP build doesn't have them.
+"""
+
+from datetime import datetime
+
+from . import applicability, catalog, config, db, patcharrays, runs
+
+# PMP table -> primary key and copied columns
+MIRRORED_TABLES = {
+    'pmseverity': {
+        'key': ['severityid'],
+        'columns': [
+            ('severityid', 'INTEGER'),
+            ('name', 'VARCHAR(100)'),
+        ],
+    },
+    'patchdetails': {
+        'key': ['patchid'],
+        'columns': [
+            ('patchid', 'BIGINT'),
+            ('bulletinid', 'VARCHAR(100)'),
+            ('description', 'TEXT'),
+            ('severityid', 'INTEGER'),
+            ('releasedtime', 'BIGINT'),
+        ],
+    },
+    'affectedpatchstatus': {
+        'key': ['resource_id', 'patch_id'],
+        'columns': [
+            ('resource_id', 'BIGINT'),
+            ('patch_id', 'BIGINT'),
+            ('status_id', 'INTEGER'),
+            ('status', 'VARCHAR(100)'),
+        ],
+    },
+    'collection': {
+        'key': ['collection_id'],
+        'columns': [
+            ('collection_id', 'BIGINT'),
+            ('collection_name', 'VARCHAR(255)'),
+        ],
+        'optional': True,
+    },
+    'collectiontopatch': {
+        'key': ['collection_id', 'patch_id'],
+        'columns': [
+            ('collection_id', 'BIGINT'),
+            ('patch_id', 'BIGINT'),
+        ],
+        'optional': True,
+    },
+    'collntoresources': {
+        'key': ['collection_id', 'resource_id'],
+        'columns': [
+            ('collection_id', 'BIGINT'),
+            ('resource_id', 'BIGINT'),
+        ],
+        'optional': True,
+    },
+    'deploymentpolicy': {
+        'key': ['deployment_policy_id'],
+        'columns': [
+            ('deployment_policy_id', 'BIGINT'),
+            ('deployment_policy_name', 'VARCHAR(255)'),
+        ],
+        'optional': True,
+    },
+    'collectiontodeploymentpolicy': {
+        'key': ['collection_id', 'deployment_policy_id'],
+        'columns': [
+            ('collection_id', 'BIGINT'),
+            ('deployment_policy_id', 'BIGINT'),
+        ],
+        'optional': True,
+    },
+}
+
+CREATE_CHECKPOINTS_SQL = """
+CREATE TABLE IF NOT EXISTS sync_checkpoints (
+    table_name VARCHAR(100) PRIMARY KEY,
+    status VARCHAR(20) NOT NULL,
+    pass_started_at TIMESTAMP NOT NULL,
+    last_key BIGINT[],
+    rows_copied BIGINT NOT NULL DEFAULT 0,
+    chunks_copied INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP
+);
+
+COMMENT ON TABLE sync_checkpoints IS 'Last committed chunk of each mirrored PMP table';
+COMMENT ON COLUMN sync_checkpoints.status IS 'in_progress (resume from last_key) or complete';
+"""
+
+START_PASS_SQL = """
+INSERT INTO sync_checkpoints (table_name, status, pass_started_at)
+VALUES (%s, 'in_progress', clock_timestamp()::timestamp)
+ON CONFLICT (table_name) DO UPDATE SET
+    status = 'in_progress',
+    pass_started_at = EXCLUDED.pass_started_at,
+    last_key = NULL,
+    rows_copied = 0,
+    chunks_copied = 0,
+    updated_at = CURRENT_TIMESTAMP,
+    completed_at = NULL
+RETURNING pass_started_at;
+"""
+
+SAVE_CHECKPOINT_SQL = """
+UPDATE sync_checkpoints
+SET last_key = %s,
+    rows_copied = rows_copied + %s,
+    chunks_copied = chunks_copied + 1,
+    updated_at = CURRENT_TIMESTAMP
+WHERE table_name = %s;
+"""
+
+COMPLETE_PASS_SQL = """
+UPDATE sync_checkpoints
+SET status = 'complete', updated_at = CURRENT_TIMESTAMP, completed_at = CURRENT_TIMESTAMP
+WHERE table_name = %s;
+"""
+
+
+def _table_sql(table, spec):
+    """DDL and DML for one mirrored table, built from its spec"""
+    target = f"pmp_{table}"
+    names = [name for name, _ in spec['columns']]
+    key = ', '.join(spec['key'])
+    key_params = ', '.join(['%s'] * len(spec['key']))
+    column_defs = ',\n    '.join(f"{name} {kind}" for name, kind in spec['columns'])
+    updates = ',\n    '.join(f"{name} = EXCLUDED.{name}" for name in names if name not in spec['key'])
+    return {
+        'target': target,
+        'create': f"""
+CREATE TABLE IF NOT EXISTS {target} (
+    {column_defs},
+    synced_at TIMESTAMP NOT NULL,
+    PRIMARY KEY ({key})
+);
+CREATE INDEX IF NOT EXISTS idx_{target}_synced_at ON {target}(synced_at);
+COMMENT ON TABLE {target} IS 'Mirror of PMP {table}, refreshed by patchmgr extract';
+""",
+        'first_chunk': f"SELECT {', '.join(names)} FROM {table} ORDER BY {key} LIMIT %s;",
+        'next_chunk': f"SELECT {', '.join(names)} FROM {table} WHERE ({key}) > ({key_params}) ORDER BY {key} LIMIT %s;",
+        'upsert': f"""
+INSERT INTO {target} ({', '.join(names)}, synced_at)
+VALUES %s
+ON CONFLICT ({key}) DO UPDATE SET
+    {updates + ',' if updates else ''}
+    synced_at = EXCLUDED.synced_at;
+""",
+        'delete_stale': f"DELETE FROM {target} WHERE synced_at < %s;",
+        'key_positions': [names.index(name) for name in spec['key']],
+    }
+
+
+TABLE_SQL = {table: _table_sql(table, spec) for table, spec in MIRRORED_TABLES.items()}
+
+
+def create_tables(priv_conn):
+    """Create sync_checkpoints and the pmp_* mirror tables if missing"""
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute(CREATE_CHECKPOINTS_SQL)
+        for sql in TABLE_SQL.values():
+            cursor.execute(sql['create'])
+        priv_conn.commit()
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def checkpoint(priv_conn, table):
+    """(status, pass_started_at, last_key, rows_copied, chunks_copied, updated_at) or None"""
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT status, pass_started_at, last_key, rows_copied, chunks_copied, updated_at
+            FROM sync_checkpoints
+            WHERE table_name = %s;
+        """, (table,))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def source_exists(pmp_conn, table):
+    """True if the table exists in the PMP database"""
+    cursor = pmp_conn.cursor()
+    try:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL;", (table,))
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        pmp_conn.rollback()
+
+
+def _fetch_chunk(pmp_conn, sql, last_key, chunk_size):
+    cursor = pmp_conn.cursor()
+    try:
+        if last_key is None:
+            cursor.execute(sql['first_chunk'], (chunk_size,))
+        else:
+            cursor.execute(sql['next_chunk'], (*last_key, chunk_size))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        # Don't hold a snapshot open on PMP between chunks
+        pmp_conn.rollback()
+
+
+def copy_table(pmp_conn, priv_conn, table, chunk_size=10000, restart=False, progress=None):
+    """
+    Copy one table chunk by chunk, resuming from its checkpoint
+
+    Returns (rows_copied_this_run, total_rows_in_pass, resumed).
+    progress(rows_in_pass, chunks_in_pass) is called after each chunk.
+    """
+    from psycopg2.extras import execute_values
+
+    sql = TABLE_SQL[table]
+    state = checkpoint(priv_conn, table)
+    resumed = bool(state) and state[0] == 'in_progress' and not restart
+
+    cursor = priv_conn.cursor()
+    try:
+        if resumed:
+            _, pass_started_at, last_key, total, chunks, _ = state
+        else:
+            cursor.execute(START_PASS_SQL, (table,))
+            pass_started_at = cursor.fetchone()[0]
+            priv_conn.commit()
+            last_key, total, chunks = None, 0, 0
+
+        copied = 0
+        while True:
+            rows = _fetch_chunk(pmp_conn, sql, last_key, chunk_size)
+            if not rows:
+                break
+            execute_values(cursor, sql['upsert'], [row + (pass_started_at,) for row in rows],
+                           page_size=1000)
+            last_key = [rows[-1][i] for i in sql['key_positions']]
+            cursor.execute(SAVE_CHECKPOINT_SQL, (last_key, len(rows), table))
+            # The chunk and its checkpoint commit together
+            priv_conn.commit()
+            copied += len(rows)
+            total += len(rows)
+            chunks += 1
+            if progress:
+                progress(total, chunks)
+            if len(rows) < chunk_size:
+                break
+
+        cursor.execute(sql['delete_stale'], (pass_started_at,))
+        cursor.execute(COMPLETE_PASS_SQL, (table,))
+        priv_conn.commit()
+        return copied, total, resumed
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def analyze_tables(priv_conn, tables):
+    """ANALYZE the mirror tables after a copy (needs autocommit)"""
+    priv_conn.autocommit = True
+    cursor = priv_conn.cursor()
+    try:
+        for table in tables:
+            cursor.execute(f"ANALYZE {TABLE_SQL[table]['target']};")
+    finally:
+        cursor.close()
+        priv_conn.autocommit = False
+
+
+def _copy_all(args, pmp_conn, priv_conn, tables, chunk_size):
+    """STEP 2 onwards of `patchmgr extract`; returns the tables that failed"""
+    failed = []
+    skipped = []
+    for step, table in enumerate(tables, 2):
+        print(f"\nSTEP {step}: Copying {table} -> {TABLE_SQL[table]['target']} "
+              f"(chunks of {chunk_size:,} rows)...")
+        if MIRRORED_TABLES[table].get('optional') and not source_exists(pmp_conn, table):
+            print(f"  Skipped: {table} does not exist in this PMP database")
+            skipped.append(table)
+            continue
+        state = checkpoint(priv_conn, table)
+        if state and state[0] == 'in_progress' and not args.restart:
+            print(f"  Resuming after key {tuple(state[2]) if state[2] else '(start)'}: "
+                  f"{state[3]:,} rows in {state[4]} chunks already committed")
+
+        def progress(total, chunks):
+            print(f"  chunk {chunks}: {total:,} rows committed")
+
+        try:
+            copied, total, resumed = copy_table(pmp_conn, priv_conn, table, chunk_size,
+                                                args.restart, progress)
+            print(f"  Complete: {copied:,} rows copied this run, {total:,} rows in this pass")
+        except Exception as e:
+            print(f"  ERROR: Failed to copy {table}: {e}")
+            print("  Committed chunks are kept; run patchmgr extract again to resume.")
+            failed.append(table)
+
+    try:
+        analyze_tables(priv_conn, [t for t in tables if t not in failed + skipped])
+    except Exception as e:
+        print(f"  ERROR: Failed to analyze mirror tables: {e}")
+
+    step = len(tables) + 2
+    if 'patchdetails' in tables and 'patchdetails' not in failed:
+        print(f"\nSTEP {step}: Refreshing patch_catalog search index...")
+        step += 1
+        try:
+            changed, removed = catalog.refresh_catalog(priv_conn)
+            print(f"  {changed:,} patches added or changed, {removed:,} removed")
+        except Exception as e:
+            print(f"  ERROR: Failed to refresh patch_catalog: {e}")
+
+    # Skipped tables leave empty mirrors, which the refresh handles
+    sources = set(applicability.SOURCE_TABLES)
+    if sources & set(tables) and not sources & set(failed):
+        print(f"\nSTEP {step}: Refreshing collection_applicability...")
+        step += 1
+        try:
+            changed, collections = applicability.refresh(priv_conn)
+            print(f"  {changed:,} mappings added, changed or removed in {collections:,} collections")
+        except Exception as e:
+            print(f"  ERROR: Failed to refresh collection_applicability: {e}")
+
+    sources = set(patcharrays.SOURCE_TABLES)
+    if sources & set(tables) and not sources & set(failed):
+        print(f"\nSTEP {step}: Refreshing system_missing_patches arrays...")
+        try:
+            changed, removed = patcharrays.refresh(priv_conn)
+            print(f"  {changed:,} systems written, {removed:,} removed")
+        except Exception as e:
+            print(f"  ERROR: Failed to refresh system_missing_patches: {e}")
+    return failed
+
+
+def _extract(args):
+    tables = args.tables or list(MIRRORED_TABLES)
+    chunk_size = args.chunk_size or config.plan_limits()['chunk_size'] or 10000
+
+    print("STEP 1: Connecting to Patch Manager Plus and private databases...")
+    try:
+        pmp_conn = db.connect_pmp()
+    except Exception as e:
+        print(f"  ERROR: Failed to connect to PMP database: {e}")
+        return 1
+    try:
+        try:
+            priv_conn = db.connect_private()
+        except Exception as e:
+            print(f"  ERROR: Failed to connect to private database: {e}")
+            return 1
+        try:
+            try:
+                create_tables(priv_conn)
+            except Exception as e:
+                print(f"  ERROR: Failed to create the mirror tables: {e}")
+                return 1
+            print("  Connected!")
+            failed = _copy_all(args, pmp_conn, priv_conn, tables, chunk_size)
+        finally:
+            priv_conn.close()
+    finally:
+        pmp_conn.close()
+
+    print("\n" + "=" * 80)
+    print("EXTRACT COMPLETE" if not failed else f"EXTRACT INCOMPLETE: {', '.join(failed)} will resume on the next run")
+    print(f"Completed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 80)
+    return 1 if failed else 0
+
+
+def print_status(priv_conn):
+    """Print the checkpoint of every mirrored table"""
+    create_tables(priv_conn)
+    print(f"{'Table':22s} | {'Status':11s} | {'Rows':>12s} | {'Chunks':>7s} | {'Last key':20s} | {'Updated':19s}")
+    print("-" * 105)
+    for table in MIRRORED_TABLES:
+        state = checkpoint(priv_conn, table)
+        if not state:
+            print(f"{table:22s} | {'never run':11s} |")
+            continue
+        status, _, last_key, rows, chunks, updated = state
+        key = str(tuple(last_key)) if last_key else '-'
+        print(f"{table:22s} | {status:11s} | {rows:12,d} | {chunks:7d} | {key[:20]:20s} | {updated:%Y-%m-%d %H:%M:%S}")
+    return 0
+
+
+def main(args):
+    """`patchmgr extract`: copy the large PMP tables, resuming from checkpoints"""
+    if args.status:
+        conn = db.connect_private()
+        try:
+            return print_status(conn)
+        finally:
+            conn.close()
+
+    unknown = [table for table in args.tables if table not in MIRRORED_TABLES]
+    if unknown:
+        print(f"ERROR: Unknown table(s) {', '.join(unknown)}; choose from {', '.join(MIRRORED_TABLES)}")
+        return 1
+
+    print("=" * 80)
+    print("PMP TABLE EXTRACT")
+    print("=" * 80)
+    print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    return runs.run_locked('extract', args, lambda: _extract(args))
@@ -0,0 +1,250 @@
+"""
+One compliance report per domain (or any other column), rendered in parallel
+
+`patchmgr reports` reads the patch_compliance snapshot once (the same query
+as `patchmgr serve`), splits it by --by (system_domain by default) and writes
+one report per partition:
+
+    reports/system_domain/corp.txt
+    reports/system_domain/emea.txt
+    ...
+
+Partitions are rendered and written by a process pool with one worker per
+core, largest first. The database connection is closed before the pool
+starts; workers only see their own partition's rows. Systems with no value
+in the column are reported under 'N/A'.
+"""
+
+import csv
+import io
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from . import api, config, db, registry
+
+FORMATS = {'text': 'txt', 'csv': 'csv'}
+
+CSV_COLUMNS = ['resource_id', 'system_name', 'system_domain', 'last_contact', 'last_patch_date',
+               'patch_compliance_pct', 'missing_patches_total', 'missing_critical', 'missing_important',
+               'missing_moderate', 'missing_low', 'missing_unrated', 'contact_status', 'risk_level']
+
+SEVERITIES = ['critical', 'important', 'moderate', 'low', 'unrated']
+
+COMPLIANCE_BRACKETS = [(95, '95-100%'), (90, '90-94%'), (80, '80-89%'), (70, '70-79%'), (None, 'Below 70%')]
+
+
+def load_snapshot(priv_conn):
+    """
+    (columns, rows as dicts in priority order) of patch_compliance
+
+    Uses the API's snapshot query, which returns NULL patch counts as 0, so
+    the renderers can add and format them directly.
+    """
+    cursor = priv_conn.cursor()
+    try:
+        rows = registry.fetchall(cursor, 'api.snapshot')
+        columns = [column[0] for column in cursor.description]
+    finally:
+        cursor.close()
+    return columns, [dict(zip(columns, row)) for row in rows]
+
+
+def partition(rows, column):
+    """value -> rows with that value in column, each list still in priority order"""
+    partitions = {}
+    for row in rows:
+        partitions.setdefault(row[column], []).append(row)
+    return partitions
+
+
+def file_names(values, extension):
+    """value -> report file name, unique even on case-insensitive file systems"""
+    names = {}
+    used = set()
+    for value in sorted(values, key=lambda v: (v is None, str(v) if v is not None else '')):
+        base = re.sub(r'[^a-z0-9._-]+', '_', ('n_a' if value is None else str(value)).lower()).strip('._') or 'value'
+        name, n = base, 2
+        while name in used:
+            name, n = f"{base}-{n}", n + 1
+        used.add(name)
+        names[value] = f"{name}.{extension}"
+    return names
+
+
+def _bracket(pct):
+    for floor, label in COMPLIANCE_BRACKETS:
+        if floor is None or (pct is not None and pct >= floor):
+            return label
+
+
+def render_text(column, value, rows, synced_at):
+    """The report for one partition as text"""
+    label = 'N/A' if value is None else value
+    missing = sum(row['missing_patches_total'] for row in rows)
+    with_missing = sum(row['missing_patches_total'] > 0 for row in rows)
+    with_critical = sum(row['missing_critical'] > 0 for row in rows)
+    compliance = [row['patch_compliance_pct'] for row in rows if row['patch_compliance_pct'] is not None]
+    average = sum(compliance) / len(compliance) if compliance else 0
+
+    out = io.StringIO()
+    w = out.write
+    w(f"PATCH COMPLIANCE REPORT: {column} = {label}\n")
+    w("=" * 110 + "\n")
+    w(f"Snapshot:  {synced_at:%Y-%m-%d %H:%M}\n" if synced_at else "Snapshot:  N/A\n")
+    w(f"Generated: {datetime.now():%Y-%m-%d %H:%M:%S}\n\n")
+    w(f"Total Systems:                 {len(rows):,}\n")
+    w(f"Systems with Missing Patches:  {with_missing:,} ({with_missing / len(rows) * 100:.1f}%)\n")
+    w(f"Systems with Critical Patches: {with_critical:,} ({with_critical / len(rows) * 100:.1f}%)\n")
+    w(f"Total Missing Patches:         {missing:,}\n")
+    w(f"Average Compliance:            {average:.2f}%\n")
+
+    w("\nMISSING PATCHES BY SEVERITY\n")
+    w("-" * 40 + "\n")
+    for severity in SEVERITIES:
+        w(f"{severity.capitalize() + ':':11s}{sum(row[f'missing_{severity}'] for row in rows):8,d}\n")
+
+    w("\nSYSTEMS BY COMPLIANCE LEVEL\n")
+    w("-" * 40 + "\n")
+    brackets = {}
+    for row in rows:
+        bracket = _bracket(row['patch_compliance_pct'])
+        brackets[bracket] = brackets.get(bracket, 0) + 1
+    for _, bracket in COMPLIANCE_BRACKETS:
+        w(f"{bracket:20s} | {brackets.get(bracket, 0):12,d}\n")
+
+    for title, key, values in (('RISK LEVEL', 'risk_level', api.RISK_LEVELS),
+                               ('CONTACT STATUS', 'contact_status', api.CONTACT_STATUSES)):
+        w(f"\nSYSTEMS BY {title}\n")
+        w("-" * 40 + "\n")
+        for status in values:
+            w(f"{status:20s} | {sum(row[key] == status for row in rows):12,d}\n")
+
+    w("\nSYSTEMS (most in need of patches first)\n")
+    w("-" * 110 + "\n")
+    w(f"{'System':30s} | {'Domain':15s} | {'Compliance':>10s} | {'Missing':>7s} | {'Crit':>4s} | "
+      f"{'Imp':>4s} | {'Contact':8s} | {'Risk':10s}\n")
+    w("-" * 110 + "\n")
+    for row in rows:
+        name = (row['system_name'] or f"(resource {row['resource_id']})")[:30]
+        domain = (row['system_domain'] or "N/A")[:15]
+        pct = f"{row['patch_compliance_pct']:9.2f}%" if row['patch_compliance_pct'] is not None else "N/A"
+        w(f"{name:30s} | {domain:15s} | {pct:>10s} | {row['missing_patches_total']:7d} | "
+          f"{row['missing_critical']:4d} | {row['missing_important']:4d} | {row['contact_status']:8s} | "
+          f"{row['risk_level']:10s}\n")
+    return out.getvalue()
+
+
+def render_csv(column, value, rows, synced_at):
+    """The systems of one partition as CSV, in priority order"""
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(CSV_COLUMNS)
+    for row in rows:
+        writer.writerow(['' if row[name] is None else row[name] for name in CSV_COLUMNS])
+    return out.getvalue()
+
+
+RENDERERS = {'text': render_text, 'csv': render_csv}
+
+
+def write_report(task):
+    """
+    Render and write one partition; runs in a pool worker
+
+    task is (path, format, column, value, rows, synced_at). Returns
+    (path, systems, bytes written). The file is replaced atomically.
+    """
+    path, fmt, column, value, rows, synced_at = task
+    data = RENDERERS[fmt](column, value, rows, synced_at).encode('utf-8')
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return path, len(rows), len(data)
+
+
+def generate(rows, column, output_dir, fmt='text', workers=None, progress=None):
+    """
+    Write one report per value of column to output_dir/column/
+
+    workers defaults to the number of cores; 1 renders in this process.
+    Returns [(path, systems, bytes)] in completion order.
+    """
+    partitions = partition(rows, column)
+    names = file_names(partitions, FORMATS[fmt])
+    directory = os.path.join(output_dir, column)
+    os.makedirs(directory, exist_ok=True)
+    synced_at = max((row['snapshot_date'] for row in rows if row['snapshot_date']), default=None)
+    # Largest first, so one big partition doesn't start last and finish alone
+    tasks = [(os.path.join(directory, names[value]), fmt, column, value, members, synced_at)
+             for value, members in sorted(partitions.items(), key=lambda item: -len(item[1]))]
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    written = []
+    if workers <= 1:
+        for task in tasks:
+            written.append(write_report(task))
+            if progress:
+                progress(*written[-1])
+        return written
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(write_report, task) for task in tasks]):
+            written.append(future.result())
+            if progress:
+                progress(*written[-1])
+    return written
+
+
+def main(args):
+    """`patchmgr reports`"""
+    output_dir = args.output or config.reports_dir()
+    print("PATCH COMPLIANCE REPORTS BY PARTITION")
+    print("=" * 80)
+    print("STEP 1: Loading patch_compliance from the private database...")
+    start = time.perf_counter()
+    try:
+        conn = db.connect_private()
+    except Exception as e:
+        print(f"  ERROR: Failed to connect to private database: {e}")
+        return 1
+    try:
+        columns, rows = load_snapshot(conn)
+    except Exception as e:
+        print(f"  ERROR: Failed to load patch_compliance: {e}")
+        print("Run patchmgr sync first to create patch_compliance.")
+        return 1
+    finally:
+        conn.close()
+    print(f"  Loaded {len(rows):,} systems in {time.perf_counter() - start:.2f}s")
+
+    if args.by not in columns:
+        print(f"ERROR: Unknown column '{args.by}'. Partition by one of: {', '.join(columns)}")
+        return 1
+    if not rows:
+        print("No systems in patch_compliance; nothing to write.")
+        return 0
+
+    workers = args.workers or os.cpu_count() or 1
+    print(f"\nSTEP 2: Writing one {args.format} report per {args.by} to "
+          f"{os.path.join(output_dir, args.by)} ({workers} worker{'s' if workers != 1 else ''})...")
+    start = time.perf_counter()
+
+    def progress(path, systems, size):
+        if args.verbose:
+            print(f"  {os.path.basename(path):40s} {systems:8,d} systems {size:12,d} bytes")
+
+    try:
+        written = generate(rows, args.by, output_dir, args.format, workers, progress)
+    except Exception as e:
+        print(f"  ERROR: Failed to write reports: {e}")
+        return 1
+    print(f"  Wrote {len(written):,} reports ({sum(size for _, _, size in written):,} bytes) "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    print("\n" + "=" * 80)
+    print(f"Reports: {os.path.join(output_dir, args.by)}")
+    return 0
@@ -0,0 +1,275 @@
+"""
+Recorded PMP query fixtures: capture from the live server, replay offline
+
+In capture mode the PMP connection is wrapped so every query's result set is
+written to DIR/<key>.json.gz as it is read. The key is a hash of the
+normalized SQL and its parameters. Each file holds the SQL, the parameters,
+the column names and PostgreSQL types, the row count and the rows.
+
+In replay mode connect_pmp() returns a connection that serves those files
+and never touches the network, so the report, sync transforms and load can
+run from CI or a laptop off the VPN. Replay needs neither psycopg2 nor the
+PMP credentials. A query with no recording raises FixtureMissing.
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import os
+from datetime import date, datetime, time
+from decimal import Decimal
+
+# PostgreSQL type OID -> name, for the types PMP queries return
+TYPE_NAMES = {
+    16: 'bool', 17: 'bytea', 18: 'char', 19: 'name', 20: 'int8', 21: 'int2', 23: 'int4',
+    25: 'text', 26: 'oid', 114: 'json', 700: 'float4', 701: 'float8', 1042: 'bpchar',
+    1043: 'varchar', 1082: 'date', 1083: 'time', 1114: 'timestamp', 1184: 'timestamptz',
+    1700: 'numeric', 3802: 'jsonb',
+}
+
+
+class FixtureMissing(LookupError):
+    """Replay found no recording for a query"""
+
+
+class ReplayedError(Exception):
+    """A query that failed when it was captured fails the same way on replay"""
+
+
+def fixture_key(sql, params=None):
+    """Stable file key for a query: normalized whitespace plus parameters"""
+    text = ' '.join(sql.split()) + '\n' + json.dumps(params, default=str, sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:24]
+
+
+def _encode(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, memoryview)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+    return value
+
+
+def _decoder(type_name):
+    """Function turning a stored value back into what psycopg2 would return"""
+    if type_name in ('timestamp', 'timestamptz'):
+        return datetime.fromisoformat
+    if type_name == 'date':
+        return date.fromisoformat
+    if type_name == 'time':
+        return time.fromisoformat
+    if type_name == 'numeric':
+        return Decimal
+    if type_name == 'bytea':
+        return lambda value: memoryview(base64.b64decode(value))
+    return None
+
+
+def write_fixture(directory, sql, params, description, rows, rowcount, error=None):
+    columns = [(col[0], TYPE_NAMES.get(col[1], str(col[1]))) for col in description or []]
+    record = {
+        'error': error,
+        'sql': sql,
+        'params': json.loads(json.dumps(params, default=_encode)) if params is not None else None,
+        'columns': columns,
+        'type_codes': [col[1] for col in description or []],
+        'rowcount': rowcount,
+        'rows': [[_encode(value) for value in row] for row in rows],
+    }
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, fixture_key(sql, params) + '.json.gz')
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(record, f)
+    return path
+
+
+def read_fixture(directory, sql, params=None):
+    """(description, rows, rowcount) for a recorded query"""
+    path = os.path.join(directory, fixture_key(sql, params) + '.json.gz')
+    if not os.path.exists(path):
+        raise FixtureMissing(f"no recording in {directory} for: {' '.join(sql.split())[:200]}")
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        record = json.load(f)
+    if record.get('error'):
+        raise ReplayedError(record['error'])
+
+    description = [(name, type_code, None, None, None, None, None)
+                   for (name, _), type_code in zip(record['columns'], record['type_codes'])]
+    decoders = [_decoder(type_name) for _, type_name in record['columns']]
+    rows = [
+        tuple(decode(value) if decode and value is not None else value
+              for decode, value in zip(decoders, row))
+        for row in record['rows']
+    ]
+    return (description or None), rows, record['rowcount']
+
+
+class _CapturingCursor:
+    """Cursor proxy that records each result set as it is read"""
+
+    def __init__(self, cursor, directory, connection):
+        self._cursor = cursor
+        self._directory = directory
+        self._pending = None
+        self._connection = connection
+
+    @property
+    def connection(self):
+        return self._connection
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def execute(self, sql, params=None):
+        self._flush()
+        try:
+            self._cursor.execute(sql, params)
+        except Exception as e:
+            write_fixture(self._directory, sql, params, None, [], -1, error=str(e))
+            raise
+        self._pending = {'sql': sql, 'params': params, 'rows': [], 'rowcount': self._cursor.rowcount}
+
+    def _record(self, rows):
+        if self._pending is not None:
+            self._pending['rows'].extend(rows)
+        return rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._record([row])
+        return row
+
+    def fetchmany(self, size=None):
+        return self._record(self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany())
+
+    def fetchall(self):
+        return self._record(self._cursor.fetchall())
+
+    def _flush(self):
+        if self._pending is None:
+            return
+        # Rows not read by the caller are fetched too, so replay can serve them
+        if self._cursor.description and not self._cursor.closed:
+            try:
+                self._record(self._cursor.fetchall())
+            except Exception:
+                pass
+        write_fixture(self._directory, self._pending['sql'], self._pending['params'],
+                      self._cursor.description, self._pending['rows'], self._pending['rowcount'])
+        self._pending = None
+
+    def close(self):
+        if not self._cursor.closed:
+            self._flush()
+            self._cursor.close()
+
+
+class CapturingConnection:
+    """Live PMP connection whose cursors write fixtures to a directory"""
+
+    def __init__(self, conn, directory):
+        self._conn = conn
+        self._directory = directory
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return _CapturingCursor(self._conn.cursor(*args, **kwargs), self._directory, self)
+
+
+class _ReplayCursor:
+    """Cursor serving recorded result sets"""
+
+    def __init__(self, directory, connection):
+        self._directory = directory
+        self.connection = connection
+        self._rows = []
+        self._position = 0
+        self.description = None
+        self.rowcount = -1
+        self.itersize = 2000
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def execute(self, sql, params=None):
+        self.description, self._rows, self.rowcount = read_fixture(self._directory, sql, params)
+        self._position = 0
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        self._position += 1
+        return self._rows[self._position - 1]
+
+    def fetchmany(self, size=None):
+        size = size or self.itersize
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+    def close(self):
+        self.closed = True
+
+
+class ReplayConnection:
+    """Stand-in for the PMP connection that reads fixtures from a directory"""
+
+    def __init__(self, directory):
+        if not os.path.isdir(directory):
+            raise FixtureMissing(f"fixture directory {directory} does not exist")
+        self._directory = directory
+        self.autocommit = False
+        self.closed = False
+
+    def cursor(self, *args, **kwargs):
+        return _ReplayCursor(self._directory, self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
@@ -0,0 +1,524 @@
+"""
+Per-system missing-patch arrays (`patchmgr missing-arrays`)
+
+A compact alternative to the normalized pmp_affectedpatchstatus mirror for
+the two common lookups, "which systems are missing patch P" and "which
+patches is system S missing":
+
+- patch_codes: a dictionary numbering every patch missing on some system
+  with a dense INTEGER code (PMP patch IDs are BIGINT). Codes never change
+  once assigned, so arrays stay comparable across refreshes.
+- system_missing_patches: one row per system with the sorted codes of its
+  missing patches in one INTEGER[] column per severity (critical,
+  important, moderate, low, unrated), each with a GIN index.
+
+A patch is missing while its status is Available or Missing (see
+compliance_sql.MISSING_STATUSES); ignored and installed patches are left out.
+
+"Systems missing P" looks up P's code and severity in the dictionary and
+answers from a single GIN index (`critical @> ARRAY[code]`); any-of and
+all-of a set use `&&` and `@>`. "Patches S is missing" is a primary key
+lookup and an unnest. The arrays are refreshed after `patchmgr extract`;
+only systems whose arrays changed are rewritten.
+
+`patchmgr missing-arrays --benchmark` builds both forms from a synthetic
+fleet in a scratch schema and compares their size and lookup latency.
+"""
+
+import random
+import statistics
+import time
+
+from . import db, registry
+from .compliance_sql import missing_status
+
+# Mirrors the arrays are built from
+SOURCE_TABLES = ['affectedpatchstatus', 'patchdetails']
+
+# Array column -> severity_id; any other severity_id (or none) is 'unrated'
+SEVERITY_COLUMNS = {'critical': 4, 'important': 3, 'moderate': 2, 'low': 1, 'unrated': 0}
+
+BENCHMARK_SCHEMA = 'patchmgr_array_bench'
+
+CREATE_ARRAYS_SQL = """
+CREATE TABLE IF NOT EXISTS patch_codes (
+    code SERIAL PRIMARY KEY,
+    patch_id BIGINT NOT NULL UNIQUE,
+    severity_id INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS system_missing_patches (
+    resource_id BIGINT PRIMARY KEY,
+    critical INTEGER[] NOT NULL DEFAULT '{}',
+    important INTEGER[] NOT NULL DEFAULT '{}',
+    moderate INTEGER[] NOT NULL DEFAULT '{}',
+    low INTEGER[] NOT NULL DEFAULT '{}',
+    unrated INTEGER[] NOT NULL DEFAULT '{}',
+    refreshed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_system_missing_critical ON system_missing_patches USING gin (critical);
+CREATE INDEX IF NOT EXISTS idx_system_missing_important ON system_missing_patches USING gin (important);
+CREATE INDEX IF NOT EXISTS idx_system_missing_moderate ON system_missing_patches USING gin (moderate);
+CREATE INDEX IF NOT EXISTS idx_system_missing_low ON system_missing_patches USING gin (low);
+CREATE INDEX IF NOT EXISTS idx_system_missing_unrated ON system_missing_patches USING gin (unrated);
+
+COMMENT ON TABLE patch_codes IS 'Dense integer code per patch_id used by system_missing_patches';
+COMMENT ON TABLE system_missing_patches IS 'Sorted patch_codes each system is missing, per severity; refreshed from the pmp_* mirrors';
+"""
+
+# New patches get the next code; a patch whose severity changed keeps its code
+REFRESH_CODES_SQL = f"""
+INSERT INTO patch_codes (patch_id, severity_id)
+SELECT a.patch_id, max(pd.severityid)
+FROM (SELECT DISTINCT patch_id FROM pmp_affectedpatchstatus WHERE {missing_status('status')}) a
+LEFT JOIN pmp_patchdetails pd ON pd.patchid = a.patch_id
+GROUP BY a.patch_id
+ORDER BY a.patch_id
+ON CONFLICT (patch_id) DO UPDATE SET
+    severity_id = EXCLUDED.severity_id
+WHERE patch_codes.severity_id IS DISTINCT FROM EXCLUDED.severity_id;
+"""
+
+# Upserts systems whose arrays changed and deletes systems with nothing missing
+REFRESH_ARRAYS_SQL = f"""
+WITH source AS (
+    SELECT
+        a.resource_id,
+        coalesce(array_agg(DISTINCT c.code ORDER BY c.code) FILTER (WHERE c.severity_id = 4), '{{}}') AS critical,
+        coalesce(array_agg(DISTINCT c.code ORDER BY c.code) FILTER (WHERE c.severity_id = 3), '{{}}') AS important,
+        coalesce(array_agg(DISTINCT c.code ORDER BY c.code) FILTER (WHERE c.severity_id = 2), '{{}}') AS moderate,
+        coalesce(array_agg(DISTINCT c.code ORDER BY c.code) FILTER (WHERE c.severity_id = 1), '{{}}') AS low,
+        coalesce(array_agg(DISTINCT c.code ORDER BY c.code)
+                 FILTER (WHERE c.severity_id IS NULL OR c.severity_id NOT IN (1, 2, 3, 4)), '{{}}') AS unrated
+    FROM pmp_affectedpatchstatus a
+    JOIN patch_codes c ON c.patch_id = a.patch_id
+    WHERE {missing_status('a.status')}
+    GROUP BY a.resource_id
+),
+upserted AS (
+    INSERT INTO system_missing_patches (resource_id, critical, important, moderate, low, unrated)
+    SELECT * FROM source
+    ON CONFLICT (resource_id) DO UPDATE SET
+        critical = EXCLUDED.critical,
+        important = EXCLUDED.important,
+        moderate = EXCLUDED.moderate,
+        low = EXCLUDED.low,
+        unrated = EXCLUDED.unrated,
+        refreshed_at = CURRENT_TIMESTAMP
+    WHERE (system_missing_patches.critical, system_missing_patches.important, system_missing_patches.moderate,
+           system_missing_patches.low, system_missing_patches.unrated)
+        IS DISTINCT FROM (EXCLUDED.critical, EXCLUDED.important, EXCLUDED.moderate, EXCLUDED.low, EXCLUDED.unrated)
+    RETURNING 1
+),
+deleted AS (
+    DELETE FROM system_missing_patches s
+    WHERE NOT EXISTS (SELECT 1 FROM source WHERE source.resource_id = s.resource_id)
+    RETURNING 1
+)
+SELECT (SELECT COUNT(*) FROM upserted), (SELECT COUNT(*) FROM deleted);
+"""
+
+CODES_SQL = """
+    SELECT patch_id, code, severity_id
+    FROM patch_codes
+    WHERE patch_id = ANY(%(patch_ids)s);
+"""
+
+# Empty arrays never overlap, so severities with no requested patch add nothing
+SYSTEMS_ANY_SQL = """
+    SELECT resource_id
+    FROM system_missing_patches
+    WHERE critical && %(critical)s::int[]
+       OR important && %(important)s::int[]
+       OR moderate && %(moderate)s::int[]
+       OR low && %(low)s::int[]
+       OR unrated && %(unrated)s::int[]
+    ORDER BY resource_id;
+"""
+
+# Every array contains the empty array; the planner drives from the non-empty ones
+SYSTEMS_ALL_SQL = """
+    SELECT resource_id
+    FROM system_missing_patches
+    WHERE critical @> %(critical)s::int[]
+      AND important @> %(important)s::int[]
+      AND moderate @> %(moderate)s::int[]
+      AND low @> %(low)s::int[]
+      AND unrated @> %(unrated)s::int[]
+    ORDER BY resource_id;
+"""
+
+SYSTEM_PATCHES_SQL = """
+    SELECT c.patch_id, c.severity_id
+    FROM system_missing_patches s
+    CROSS JOIN LATERAL unnest(s.critical || s.important || s.moderate || s.low || s.unrated) AS m(code)
+    JOIN patch_codes c ON c.code = m.code
+    WHERE s.resource_id = %(resource_id)s
+    ORDER BY c.severity_id DESC NULLS LAST, c.patch_id;
+"""
+
+SYSTEM_NAMES_SQL = """
+    SELECT resource_id, system_name
+    FROM patch_compliance
+    WHERE resource_id = ANY(%(resource_ids)s);
+"""
+
+registry.register_all('arrays', {
+    'codes': CODES_SQL,
+    'systems_any': SYSTEMS_ANY_SQL,
+    'systems_all': SYSTEMS_ALL_SQL,
+    'system_patches': SYSTEM_PATCHES_SQL,
+    'system_names': SYSTEM_NAMES_SQL,
+}, prepare={'codes', 'system_patches'})
+
+# The normalized form the benchmark compares against: the extract mirror
+# plus the index "systems missing P" needs, partial so that lookups of
+# missing rows stay index-only scans
+BENCHMARK_TABLES_SQL = """
+CREATE TABLE pmp_patchdetails (
+    patchid BIGINT PRIMARY KEY,
+    severityid INTEGER
+);
+
+CREATE TABLE pmp_affectedpatchstatus (
+    resource_id BIGINT NOT NULL,
+    patch_id BIGINT NOT NULL,
+    status_id INTEGER,
+    status VARCHAR(100),
+    PRIMARY KEY (resource_id, patch_id)
+);
+"""
+
+BENCHMARK_INDEX_SQL = f"""
+CREATE INDEX idx_bench_affected_patch ON pmp_affectedpatchstatus(patch_id, resource_id)
+WHERE {missing_status('status')};
+"""
+
+# 10% critical, 25% important, 30% moderate, 25% low, 10% unrated
+BENCHMARK_PATCHES_SQL = """
+INSERT INTO pmp_patchdetails (patchid, severityid)
+SELECT 100000 + g,
+       CASE WHEN r < 0.10 THEN 4 WHEN r < 0.35 THEN 3 WHEN r < 0.65 THEN 2 WHEN r < 0.90 THEN 1 ELSE 0 END
+FROM (SELECT g, random() AS r FROM generate_series(1, %(patches)s) g) s;
+"""
+
+# Systems list 0-120 patches (about 40 on average), mostly the lower-numbered
+# (older, widely missed) ones, so some patches are missing almost everywhere
+# and most on a few systems. Statuses follow a production PMP: 90.7%
+# Available (201), 8.6% Ignore (201) and 0.7% Missing (202)
+BENCHMARK_MISSING_SQL = """
+INSERT INTO pmp_affectedpatchstatus (resource_id, patch_id, status_id, status)
+SELECT resource_id, patch_id,
+       CASE WHEN r < 0.993 THEN 201 ELSE 202 END,
+       CASE WHEN r < 0.907 THEN 'Available' WHEN r < 0.993 THEN 'Ignore' ELSE 'Missing' END
+FROM (
+    SELECT resource_id, patch_id, random() AS r
+    FROM (
+        SELECT DISTINCT s.g AS resource_id, 100001 + floor(power(random(), 3) * %(patches)s)::int AS patch_id
+        FROM generate_series(1, %(systems)s) s(g)
+        CROSS JOIN LATERAL generate_series(1, floor(power(random(), 2) * 121)::int + s.g * 0) n
+    ) listed
+) s;
+"""
+
+BENCHMARK_COUNT_SQL = f"SELECT COUNT(*) FROM pmp_affectedpatchstatus WHERE {missing_status('status')};"
+
+BENCHMARK_SIZES_SQL = """
+    SELECT pg_relation_size(%(table)s::regclass),
+           pg_total_relation_size(%(table)s::regclass) - pg_relation_size(%(table)s::regclass)
+           - pg_indexes_size(%(table)s::regclass),
+           pg_indexes_size(%(table)s::regclass);
+"""
+
+# Normalized-form equivalents of the array lookups
+NORMALIZED_QUERIES = {
+    'any': f"""
+        SELECT DISTINCT resource_id
+        FROM pmp_affectedpatchstatus
+        WHERE patch_id = ANY(%(patch_ids)s)
+          AND {missing_status('status')}
+        ORDER BY resource_id;
+    """,
+    'all': f"""
+        SELECT resource_id
+        FROM pmp_affectedpatchstatus
+        WHERE patch_id = ANY(%(patch_ids)s)
+          AND {missing_status('status')}
+        GROUP BY resource_id
+        HAVING COUNT(*) = cardinality(%(patch_ids)s)
+        ORDER BY resource_id;
+    """,
+    'system': f"""
+        SELECT a.patch_id, pd.severityid
+        FROM pmp_affectedpatchstatus a
+        LEFT JOIN pmp_patchdetails pd ON pd.patchid = a.patch_id
+        WHERE a.resource_id = %(resource_id)s
+          AND {missing_status('a.status')}
+        ORDER BY pd.severityid DESC NULLS LAST, a.patch_id;
+    """,
+}
+
+ARRAY_QUERIES = {'any': SYSTEMS_ANY_SQL, 'all': SYSTEMS_ALL_SQL, 'system': SYSTEM_PATCHES_SQL}
+
+
+def create_tables(priv_conn):
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute(CREATE_ARRAYS_SQL)
+        priv_conn.commit()
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def refresh(priv_conn):
+    """
+    Bring patch_codes and system_missing_patches up to date with the mirrors
+
+    Returns (systems written, systems removed).
+    """
+    create_tables(priv_conn)
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute(REFRESH_CODES_SQL)
+        cursor.execute(REFRESH_ARRAYS_SQL)
+        changed, removed = cursor.fetchone()
+        priv_conn.commit()
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    priv_conn.autocommit = True
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute("ANALYZE patch_codes;")
+        cursor.execute("ANALYZE system_missing_patches;")
+    finally:
+        cursor.close()
+        priv_conn.autocommit = False
+    return changed, removed
+
+
+def array_params(codes):
+    """Query parameters for [(code, severity_id)]: one sorted code list per severity column"""
+    params = {column: [] for column in SEVERITY_COLUMNS}
+    for code, severity_id in codes:
+        column = next((name for name, value in SEVERITY_COLUMNS.items() if value == severity_id), 'unrated')
+        params[column].append(code)
+    return {column: sorted(values) for column, values in params.items()}
+
+
+def systems_missing(cursor, patch_ids, match='any'):
+    """
+    resource_ids missing any (or all) of patch_ids
+
+    Returns (resource_ids, unknown patch IDs). A patch no system is missing
+    has no code; with match='all' that means no system matches.
+    """
+    rows = registry.fetchall(cursor, 'arrays.codes', {'patch_ids': list(patch_ids)})
+    unknown = sorted(set(patch_ids) - {patch_id for patch_id, _, _ in rows})
+    if not rows or (match == 'all' and unknown):
+        return [], unknown
+    params = array_params((code, severity_id) for _, code, severity_id in rows)
+    found = registry.fetchall(cursor, f'arrays.systems_{match}', params)
+    return [resource_id for resource_id, in found], unknown
+
+
+def system_patches(cursor, resource_id):
+    """[(patch_id, severity_id)] the system is missing, most severe first"""
+    return registry.fetchall(cursor, 'arrays.system_patches', {'resource_id': resource_id})
+
+
+def _timed(cursor, sql, params):
+    started = time.perf_counter()
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    return (time.perf_counter() - started) * 1000, len(rows)
+
+
+def benchmark(conn, systems=100000, patches=3000, samples=100, progress=None):
+    """
+    Compare the array form with the normalized form on a synthetic fleet
+
+    Both are built from the same synthetic pmp_affectedpatchstatus in a
+    scratch schema (the arrays with the same refresh as the real tables).
+    Returns {'rows', 'missing', 'sizes': {form: (heap, toast, indexes)},
+    'latency': {lookup: {form: (median ms, p95 ms, mean rows)}}}. The scratch
+    schema is always dropped.
+    """
+    progress = progress or (lambda message: None)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        # Build everything in its own schema so the real tables are never touched
+        cursor.execute(f"DROP SCHEMA IF EXISTS {BENCHMARK_SCHEMA} CASCADE;")
+        cursor.execute(f"CREATE SCHEMA {BENCHMARK_SCHEMA};")
+        cursor.execute(f"SET search_path TO {BENCHMARK_SCHEMA};")
+        cursor.execute("SELECT current_schema();")
+        if cursor.fetchone()[0] != BENCHMARK_SCHEMA:
+            raise RuntimeError(f"could not switch to schema {BENCHMARK_SCHEMA}")
+
+        progress("Generating synthetic missing patches...")
+        cursor.execute(BENCHMARK_TABLES_SQL)
+        sizes = {'patches': patches, 'systems': systems}
+        cursor.execute(BENCHMARK_PATCHES_SQL, sizes)
+        cursor.execute(BENCHMARK_MISSING_SQL, sizes)
+        row_count = cursor.rowcount
+        cursor.execute(BENCHMARK_COUNT_SQL)
+        missing_count = cursor.fetchone()[0]
+        cursor.execute(BENCHMARK_INDEX_SQL)
+
+        progress(f"Encoding {missing_count:,} missing rows into arrays...")
+        cursor.execute(CREATE_ARRAYS_SQL)
+        cursor.execute(REFRESH_CODES_SQL)
+        cursor.execute(REFRESH_ARRAYS_SQL)
+        cursor.execute("VACUUM ANALYZE;")
+
+        result = {'rows': row_count, 'missing': missing_count, 'sizes': {}, 'latency': {}}
+        cursor.execute(BENCHMARK_SIZES_SQL, {'table': 'pmp_affectedpatchstatus'})
+        result['sizes']['normalized'] = cursor.fetchone()
+        arrays = [0, 0, 0]
+        for table in ('system_missing_patches', 'patch_codes'):
+            cursor.execute(BENCHMARK_SIZES_SQL, {'table': table})
+            arrays = [total + size for total, size in zip(arrays, cursor.fetchone())]
+        result['sizes']['arrays'] = tuple(arrays)
+
+        cursor.execute("SELECT code, patch_id, severity_id FROM patch_codes ORDER BY code;")
+        codes = cursor.fetchall()
+        cursor.execute("SELECT resource_id FROM system_missing_patches;")
+        resource_ids = [resource_id for resource_id, in cursor.fetchall()]
+
+        # The same random patches and systems for both forms; patches are
+        # drawn uniformly, so most are rare and a few missing almost everywhere
+        rng = random.Random(0)
+        cases = {
+            'one patch': ('any', [rng.sample(codes, 1) for _ in range(samples)]),
+            'any of 3': ('any', [rng.sample(codes, 3) for _ in range(samples)]),
+            'all of 2': ('all', [rng.sample(codes[:len(codes) // 10], 2) for _ in range(samples)]),
+            'one system': ('system', [rng.choice(resource_ids) for _ in range(samples)]),
+        }
+        for lookup, (kind, picks) in cases.items():
+            progress(f"Timing {lookup} ({samples} lookups per form)...")
+            timings = {'normalized': [], 'arrays': []}
+            counts = {'normalized': 0, 'arrays': 0}
+            for pick in picks:
+                if kind == 'system':
+                    normalized = array = {'resource_id': pick}
+                else:
+                    normalized = {'patch_ids': [patch_id for _, patch_id, _ in pick]}
+                    array = array_params((code, severity_id) for code, _, severity_id in pick)
+                for form, sql, params in (('normalized', NORMALIZED_QUERIES[kind], normalized),
+                                          ('arrays', ARRAY_QUERIES[kind], array)):
+                    elapsed, found = _timed(cursor, sql, params)
+                    timings[form].append(elapsed)
+                    counts[form] += found
+            if counts['normalized'] != counts['arrays']:
+                raise RuntimeError(f"{lookup}: forms disagree ({counts['normalized']:,} vs {counts['arrays']:,} rows)")
+            result['latency'][lookup] = {
+                form: (statistics.median(values), sorted(values)[int(len(values) * 0.95) - 1],
+                       counts[form] / len(values))
+                for form, values in timings.items()
+            }
+    finally:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {BENCHMARK_SCHEMA} CASCADE;")
+        cursor.execute("RESET search_path;")
+        cursor.close()
+        conn.autocommit = False
+    return result
+
+
+def _mb(size):
+    return f"{size / 1024 / 1024:,.1f} MB"
+
+
+def print_benchmark(result):
+    print(f"\n{'Storage':12s} | {'Table':>10s} | {'TOAST':>10s} | {'Indexes':>10s} | {'Total':>10s}")
+    print("-" * 64)
+    totals = {}
+    for form, (heap, toast, indexes) in result['sizes'].items():
+        totals[form] = heap + toast + indexes
+        print(f"{form:12s} | {_mb(heap):>10s} | {_mb(toast):>10s} | {_mb(indexes):>10s} | {_mb(totals[form]):>10s}")
+    print(f"Arrays are {totals['arrays'] / totals['normalized']:.0%} of the normalized size.")
+
+    print(f"\n{'Lookup':12s} | {'Form':10s} | {'Median ms':>9s} | {'p95 ms':>8s} | {'Rows':>9s}")
+    print("-" * 60)
+    for lookup, forms in result['latency'].items():
+        for form, (median, p95, rows) in forms.items():
+            print(f"{lookup:12s} | {form:10s} | {median:9.2f} | {p95:8.2f} | {rows:9,.0f}")
+
+
+def main(args):
+    """`patchmgr missing-arrays`: missing-patch lookups from the per-system arrays"""
+    conn = db.connect_private()
+    try:
+        if args.benchmark:
+            print("MISSING-PATCH ARRAYS VS NORMALIZED ROWS")
+            print("=" * 80)
+            print(f"Synthetic systems: {args.systems:,}")
+            print(f"Synthetic patches: {args.patches:,}")
+            print(f"Scratch schema:    {BENCHMARK_SCHEMA}")
+            try:
+                result = benchmark(conn, args.systems, args.patches, args.samples,
+                                   progress=lambda message: print(f"  {message}"))
+            except Exception as e:
+                print(f"ERROR: Benchmark failed: {e}")
+                return 1
+            print(f"\n{result['rows']:,} (system, patch) rows, {result['missing']:,} of them missing")
+            print_benchmark(result)
+            return 0
+
+        if args.refresh:
+            try:
+                changed, removed = refresh(conn)
+                print(f"Arrays refreshed: {changed:,} systems written, {removed:,} removed")
+            except Exception as e:
+                print(f"ERROR: Failed to refresh system_missing_patches: {e}")
+                print("Run patchmgr extract first to mirror affectedpatchstatus and patchdetails.")
+                return 1
+
+        if not args.patch and args.system is None:
+            if not args.refresh:
+                print("Nothing to look up: give --patch, --system, --refresh or --benchmark")
+                return 1
+            return 0
+
+        cursor = conn.cursor()
+        try:
+            if args.system is not None:
+                rows = system_patches(cursor, args.system)
+                print(f"Patches system {args.system} is missing: {len(rows):,}")
+                print("=" * 40)
+                severities = {value: name for name, value in SEVERITY_COLUMNS.items()}
+                for patch_id, severity_id in rows[:args.limit]:
+                    print(f"{patch_id:12d} | {severities.get(severity_id, 'unrated')}")
+                if len(rows) > args.limit:
+                    print(f"... and {len(rows) - args.limit:,} more")
+                return 0
+
+            resource_ids, unknown = systems_missing(cursor, args.patch, args.match)
+            names = dict(registry.fetchall(cursor, 'arrays.system_names',
+                                           {'resource_ids': resource_ids[:args.limit]}))
+        except Exception as e:
+            print(f"ERROR: Lookup failed: {e}")
+            print("Build the arrays with: patchmgr missing-arrays --refresh")
+            return 1
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+    if unknown:
+        print(f"Not missing on any system: {', '.join(str(patch_id) for patch_id in unknown)}")
+    print(f"Systems missing {args.match} of {', '.join(str(patch_id) for patch_id in args.patch)}: "
+          f"{len(resource_ids):,}")
+    print("=" * 60)
+    for resource_id in resource_ids[:args.limit]:
+        print(f"{resource_id:10d} | {names.get(resource_id) or f'(ID: {resource_id})'}")
+    if len(resource_ids) > args.limit:
+        print(f"... and {len(resource_ids) - args.limit:,} more")
+    return 0
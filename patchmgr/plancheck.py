@@ -0,0 +1,154 @@
+"""
+Check that the bundled patch_compliance queries are served by indexes at scale
+
+Builds patch_compliance (same DDL as the sync) in a scratch schema on the
+private database, fills it with synthetic systems and runs EXPLAIN for every
+query in compliance_sql.WORKLOAD. A query fails the check if it does a
+sequential scan of patch_compliance or sorts a large share of the table,
+unless it is marked as a fleet-wide aggregate (full_scan=True).
+"""
+
+from . import db
+from .compliance_sql import CREATE_TABLE_SQL, WORKLOAD
+
+SCHEMA = 'patchmgr_plan_check'
+
+# A sort over more than this share of the table counts as a full sort
+MAX_SORT_FRACTION = 0.10
+
+# Synthetic fleet: ~10% of systems missing critical patches, ~90% missing
+# something, ~10% not contacted in the last week
+SYNTHETIC_DATA_SQL = """
+    INSERT INTO patch_compliance (
+        resource_id, system_name, system_domain, resource_type,
+        last_contact, last_patch_date, managed_status, agent_status,
+        total_ms_patches, missing_ms_patches, installed_ms_patches,
+        total_tp_patches, missing_tp_patches, installed_tp_patches,
+        missing_critical, missing_important, missing_moderate, missing_low, missing_unrated
+    )
+    SELECT
+        g,
+        'SYSTEM-' || lpad(g::text, 7, '0'),
+        'DOMAIN' || (g %% 50),
+        1,
+        NOW() - power(random(), 30) * INTERVAL '120 days',
+        NOW() - random() * INTERVAL '2 days',
+        61,
+        1,
+        installed_ms + missing_ms, missing_ms, installed_ms,
+        installed_tp + missing_tp, missing_tp, installed_tp,
+        CASE WHEN random() < 0.10 THEN 1 + floor(random() * 4)::int ELSE 0 END,
+        floor(power(random(), 2) * 5)::int,
+        floor(power(random(), 2) * 5)::int,
+        floor(power(random(), 4) * 2)::int,
+        floor(power(random(), 4) * 2)::int
+    FROM (
+        SELECT
+            g,
+            floor(power(random(), 3) * 40)::int AS missing_ms,
+            100 + floor(random() * 900)::int AS installed_ms,
+            floor(power(random(), 3) * 20)::int AS missing_tp,
+            floor(random() * 50)::int AS installed_tp
+        FROM generate_series(1, %s) g
+    ) s;
+"""
+
+
+def plan_nodes(node):
+    """Yield a plan node and all of its children"""
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def plan_problems(plan, row_count):
+    """Return a list of reasons the plan reads or sorts the whole table"""
+    problems = []
+    for node in plan_nodes(plan):
+        node_type = node['Node Type']
+        if node_type == 'Seq Scan' and node.get('Relation Name') == 'patch_compliance':
+            problems.append('sequential scan of patch_compliance')
+        elif node_type in ('Sort', 'Incremental Sort') and node['Plan Rows'] > row_count * MAX_SORT_FRACTION:
+            problems.append(f"{node_type.lower()} of {node['Plan Rows']:,} rows")
+    return problems
+
+
+def check_plans(conn, row_count=100000):
+    """
+    Build the synthetic table and EXPLAIN every WORKLOAD query
+
+    Returns [(name, scans, result, problems)] where result is 'ok', 'FAIL' or
+    'skip' (fleet-wide aggregates). The scratch schema is always dropped.
+    """
+    conn.autocommit = True
+    cursor = conn.cursor()
+    results = []
+    try:
+        # Build the table in its own schema so the real patch_compliance is never touched
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;")
+        cursor.execute(f"CREATE SCHEMA {SCHEMA};")
+        cursor.execute(f"SET search_path TO {SCHEMA};")
+        cursor.execute("SELECT current_schema();")
+        if cursor.fetchone()[0] != SCHEMA:
+            raise RuntimeError(f"could not switch to schema {SCHEMA}")
+
+        cursor.execute(CREATE_TABLE_SQL)
+        cursor.execute(SYNTHETIC_DATA_SQL, (row_count,))
+        cursor.execute("VACUUM ANALYZE patch_compliance;")
+
+        for name, query in WORKLOAD.items():
+            # Parameterized queries are explained once per sample in check_params
+            checks = query.get('check_params') or {None: None}
+            for label, params in checks.items():
+                cursor.execute("EXPLAIN (FORMAT JSON) " + query['sql'], params)
+                plan = cursor.fetchone()[0][0]['Plan']
+                scans = [
+                    f"{node['Node Type']} {node.get('Index Name') or node.get('Relation Name') or ''}".strip()
+                    for node in plan_nodes(plan)
+                    if 'Scan' in node['Node Type']
+                ]
+                problems = plan_problems(plan, row_count)
+                if query['full_scan']:
+                    result = 'skip'
+                elif problems:
+                    result = 'FAIL'
+                else:
+                    result = 'ok'
+                results.append((f"{name} ({label})" if label else name, scans, result, problems))
+    finally:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;")
+        cursor.execute("RESET search_path;")
+        cursor.close()
+    return results
+
+
+def main(args):
+    """`patchmgr check-plans`: exits 1 if any query is not served by an index"""
+    print("PATCH COMPLIANCE QUERY PLAN CHECK")
+    print("=" * 80)
+    print(f"Synthetic systems: {args.rows:,}")
+    print(f"Scratch schema:    {SCHEMA}")
+    print("\nBuilding synthetic table...")
+
+    conn = db.connect_private()
+    try:
+        results = check_plans(conn, args.rows)
+    finally:
+        conn.close()
+
+    print(f"\n{'Query':42s} | {'Plan':45s} | {'Result':6s}")
+    print("-" * 102)
+    failures = 0
+    for name, scans, result, problems in results:
+        print(f"{name:42s} | {', '.join(scans)[:45]:45s} | {result:6s}")
+        if result == 'FAIL':
+            failures += 1
+            for problem in problems:
+                print(f"{'':42s}   -> {problem}")
+
+    print("\n" + "=" * 80)
+    if failures:
+        print(f"{failures} quer{'y' if failures == 1 else 'ies'} not served by an index!")
+        return 1
+    print("All bundled queries are served by indexes.")
+    return 0
@@ -0,0 +1,294 @@
+"""
+Profiling mode for every command (`patchmgr --profile [FILE] <command>`)
+
+While profiling, PMP and private database connections are wrapped so that
+each statement records its wall time (execute and fetch separately) and the
+rows it returned. The first time each distinct read query runs, it is also
+run under EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) on the same connection,
+inside a savepoint so a failure can't abort the caller's transaction. The
+Python side runs under cProfile.
+
+The single report ranks the slowest queries and shows the time split:
+
+- server:  execution + planning time reported by EXPLAIN ANALYZE
+- wire:    client wall time not accounted for by the server (network, decoding)
+- python:  command wall time outside database calls (row formatting, transforms)
+- explain: time spent re-running queries under EXPLAIN ANALYZE for the report,
+           which is profiling overhead and not part of the command
+
+Writes (INSERT/UPDATE/DELETE/DDL) and reads that call functions with side
+effects (pg_notify, advisory locks, nextval, ...) are timed but never EXPLAIN
+ANALYZEd, since that would run them twice.
+"""
+
+import cProfile
+import io
+import pstats
+import re
+import time
+from datetime import datetime
+
+# EXECUTE only runs registry statements, which are always SELECTs (see registry.py)
+READ_QUERY = re.compile(r'^\s*(SELECT|WITH|VALUES|TABLE|EXECUTE)\b', re.IGNORECASE)
+WRITE_KEYWORDS = re.compile(r'\b(INSERT|UPDATE|DELETE|MERGE|CREATE|DROP|ALTER|TRUNCATE)\b', re.IGNORECASE)
+# Functions whose effects a second run would repeat (notifications, locks, sequences, settings)
+SIDE_EFFECT_FUNCTIONS = re.compile(
+    r'\b(pg_notify|pg_(try_)?advisory_\w+|nextval|setval|set_config|pg_sleep\w*|pg_cancel_backend|'
+    r'pg_terminate_backend|pg_reload_conf|pg_switch_wal|lo_\w+|dblink\w*)\s*\(',
+    re.IGNORECASE)
+
+
+def _normalize(sql):
+    """Grouping key: whitespace collapsed, multi-row VALUES lists cut off"""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    text = ' '.join(str(sql).split())
+    # execute_values() inlines each batch's rows; group batches together
+    match = re.search(r'\bVALUES \(', text, re.IGNORECASE)
+    if match and len(text) > 500:
+        text = text[:match.end() - 1] + '...'
+    return text
+
+
+class Profiler:
+    """Collects per-statement timings and plans for one command run"""
+
+    def __init__(self):
+        self.queries = {}
+        self.order = []
+        self.started = time.perf_counter()
+        self.finished = None
+        self.explain_time = 0.0
+        self.python = cProfile.Profile()
+
+    def record(self, sql, execute_seconds, fetch_seconds, rows, source):
+        key = _normalize(sql)
+        entry = self.queries.get(key)
+        if entry is None:
+            entry = self.queries[key] = {
+                'sql': key, 'source': source, 'calls': 0, 'rows': 0,
+                'execute': 0.0, 'fetch': 0.0, 'plan': None, 'plan_error': None,
+            }
+            self.order.append(key)
+        entry['calls'] += 1
+        entry['rows'] += rows
+        entry['execute'] += execute_seconds
+        entry['fetch'] += fetch_seconds
+        return entry
+
+    def wants_plan(self, sql):
+        if not isinstance(sql, str):
+            return False
+        entry = self.queries.get(_normalize(sql))
+        if entry is not None and (entry['plan'] or entry['plan_error']):
+            return False
+        return (bool(READ_QUERY.match(sql)) and not WRITE_KEYWORDS.search(sql)
+                and not SIDE_EFFECT_FUNCTIONS.search(sql))
+
+    def run(self, func, *args):
+        """Run func under cProfile and time it"""
+        self.python.enable()
+        try:
+            return func(*args)
+        finally:
+            self.python.disable()
+            self.finished = time.perf_counter()
+
+
+def _explain(conn, sql, params):
+    """EXPLAIN ANALYZE in a savepoint (unless autocommit); returns the top plan dict"""
+    cursor = conn._conn.cursor()
+    savepoint = not conn._conn.autocommit
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT patchmgr_profile;")
+        try:
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+            plan = cursor.fetchone()[0][0]
+        except Exception:
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT patchmgr_profile;")
+            raise
+        if savepoint:
+            cursor.execute("RELEASE SAVEPOINT patchmgr_profile;")
+        return plan
+    finally:
+        cursor.close()
+
+
+class _ProfilingCursor:
+    """Cursor proxy timing execute and fetches"""
+
+    def __init__(self, cursor, connection):
+        self._cursor = cursor
+        self._connection = connection
+        self._entry = None
+
+    @property
+    def connection(self):
+        return self._connection
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def execute(self, sql, params=None):
+        profiler = self._connection._profiler
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, params)
+        finally:
+            elapsed = time.perf_counter() - start
+            # Writes report affected rows; reads count rows as they are fetched
+            written = self._cursor.rowcount if self._cursor.description is None else 0
+            self._entry = profiler.record(sql, elapsed, 0.0, max(written, 0), self._connection._source)
+            if (self._connection._explain and profiler.wants_plan(sql)
+                    and not getattr(self._cursor, 'name', None)):
+                start = time.perf_counter()
+                try:
+                    self._entry['plan'] = _explain(self._connection, sql, params)
+                except Exception as e:
+                    self._entry['plan_error'] = str(e).strip().splitlines()[0]
+                finally:
+                    profiler.explain_time += time.perf_counter() - start
+
+    def executemany(self, sql, seq):
+        seq = list(seq)
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, seq)
+        finally:
+            self._connection._profiler.record(sql, time.perf_counter() - start, 0.0,
+                                              max(self._cursor.rowcount, 0), self._connection._source)
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        result = getattr(self._cursor, method)(*args)
+        if self._entry is not None:
+            self._entry['fetch'] += time.perf_counter() - start
+            if method == 'fetchone':
+                self._entry['rows'] += result is not None
+            else:
+                self._entry['rows'] += len(result)
+        return result
+
+    def fetchone(self):
+        return self._fetch('fetchone')
+
+    def fetchmany(self, *args):
+        return self._fetch('fetchmany', *args)
+
+    def fetchall(self):
+        return self._fetch('fetchall')
+
+
+class ProfilingConnection:
+    """Connection proxy whose cursors report to a Profiler"""
+
+    def __init__(self, conn, profiler, source, explain=True):
+        self._conn = conn
+        self._profiler = profiler
+        self._source = source
+        self._explain = explain
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._conn, name, value)
+
+    def cursor(self, *args, **kwargs):
+        return _ProfilingCursor(self._conn.cursor(*args, **kwargs), self)
+
+
+def _plan_lines(plan, depth=0):
+    """Indented outline of an analyzed plan with actual time, rows and buffers"""
+    label = plan['Node Type']
+    if plan.get('Relation Name'):
+        label += f" on {plan['Relation Name']}"
+    if plan.get('Index Name'):
+        label += f" using {plan['Index Name']}"
+    buffers = f"hit={plan.get('Shared Hit Blocks', 0)} read={plan.get('Shared Read Blocks', 0)}"
+    lines = [f"{'  ' * depth}{label} (actual {plan.get('Actual Total Time', 0):.2f} ms, "
+             f"rows={plan.get('Actual Rows', 0):,} x{plan.get('Actual Loops', 1)}, {buffers})"]
+    for child in plan.get('Plans', []):
+        lines.extend(_plan_lines(child, depth + 1))
+    return lines
+
+
+def build_report(profiler, command, top=15, python_top=25):
+    """The profiling report as a string"""
+    total = (profiler.finished or time.perf_counter()) - profiler.started
+    entries = sorted(profiler.queries.values(), key=lambda e: e['execute'] + e['fetch'], reverse=True)
+    db_time = sum(e['execute'] + e['fetch'] for e in entries)
+    server_time = 0.0
+    for entry in entries:
+        if entry['plan']:
+            per_call = (entry['plan'].get('Execution Time', 0) + entry['plan'].get('Planning Time', 0)) / 1000
+            server_time += min(per_call * entry['calls'], entry['execute'] + entry['fetch'])
+
+    out = io.StringIO()
+    out.write("=" * 100 + "\n")
+    out.write(f"PATCHMGR PROFILE: {command}\n")
+    out.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    out.write("=" * 100 + "\n\n")
+    out.write(f"Total wall time:        {total:10.3f} s\n")
+    out.write(f"Database calls:         {db_time:10.3f} s  ({len(entries)} distinct statements, "
+              f"{sum(e['calls'] for e in entries)} executions)\n")
+    out.write(f"  server (EXPLAIN):     {server_time:10.3f} s  (analyzed read queries only)\n")
+    out.write(f"  wire + other:         {db_time - server_time:10.3f} s\n")
+    out.write(f"Python outside DB:      {total - db_time - profiler.explain_time:10.3f} s\n")
+    out.write(f"EXPLAIN reruns:         {profiler.explain_time:10.3f} s  (profiling overhead, "
+              f"not part of the command)\n\n")
+
+    out.write("SLOWEST QUERIES\n" + "-" * 100 + "\n")
+    out.write(f"{'#':>3s} | {'Source':7s} | {'Calls':>5s} | {'Rows':>9s} | {'Execute':>9s} | {'Fetch':>9s} | "
+              f"{'Server':>9s} | SQL\n")
+    out.write("-" * 100 + "\n")
+    for rank, entry in enumerate(entries[:top], 1):
+        server = "-"
+        if entry['plan']:
+            server = f"{(entry['plan'].get('Execution Time', 0) + entry['plan'].get('Planning Time', 0)):.1f}ms"
+        out.write(f"{rank:3d} | {entry['source']:7s} | {entry['calls']:5d} | {entry['rows']:9,d} | "
+                  f"{entry['execute'] * 1000:7.1f}ms | {entry['fetch'] * 1000:7.1f}ms | {server:>9s} | "
+                  f"{entry['sql'][:60]}\n")
+
+    out.write("\nPLANS (EXPLAIN ANALYZE, BUFFERS)\n" + "-" * 100 + "\n")
+    for rank, entry in enumerate(entries[:top], 1):
+        out.write(f"\n#{rank} {entry['sql'][:300]}\n")
+        if entry['plan']:
+            out.write(f"  planning {entry['plan'].get('Planning Time', 0):.2f} ms, "
+                      f"execution {entry['plan'].get('Execution Time', 0):.2f} ms\n")
+            for line in _plan_lines(entry['plan']['Plan']):
+                out.write(f"    {line}\n")
+        elif entry['plan_error']:
+            out.write(f"  (no plan: {entry['plan_error']})\n")
+        else:
+            out.write("  (not analyzed: write statement, server-side cursor or replayed)\n")
+
+    out.write("\nPYTHON HOT SPOTS (cProfile, by cumulative time)\n" + "-" * 100 + "\n")
+    stats = io.StringIO()
+    pstats.Stats(profiler.python, stream=stats).sort_stats('cumulative').print_stats(python_top)
+    out.write(stats.getvalue())
+    return out.getvalue()
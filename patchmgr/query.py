@@ -0,0 +1,217 @@
+"""
+Query patch compliance data from the private database
+
+With no options, prints the example queries. With filters or paging options,
+lists systems a page at a time:
+
+    patchmgr query --risk critical --domain CORP --page-size 25
+    patchmgr query --risk critical --domain CORP --page-size 25 --after TOKEN
+
+Each page ends with the --after token for the next one. Tokens carry the last
+row's sort key, so a page is an index range scan wherever it falls.
+"""
+
+import base64
+import json
+from decimal import Decimal
+
+from . import db, registry
+from .compliance_sql import PAGE_DEFAULTS, PAGE_SORTS, WORKLOAD
+
+registry.register_all('compliance', WORKLOAD)
+
+PAGE_OPTIONS = ['domain', 'risk', 'contact', 'min_compliance', 'max_compliance', 'name_prefix',
+                'sort', 'page_size', 'after', 'pages']
+
+
+def run_query(conn, name):
+    """Run a named query from compliance_sql.WORKLOAD and return all rows"""
+    cursor = conn.cursor()
+    try:
+        return registry.fetchall(cursor, f'compliance.{name}')
+    finally:
+        cursor.close()
+
+
+def encode_token(sort, row):
+    """--after token for the page following row: base64url JSON [sort, key..., resource_id]"""
+    keys = [row[column] for column in PAGE_SORTS[sort][2]]
+    keys = [str(key) if isinstance(key, Decimal) else key for key in keys]
+    text = json.dumps([sort] + keys + [row['resource_id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip('=')
+
+
+def decode_token(sort, token):
+    """after_* parameters from a token; raises ValueError if it's malformed or for another sort"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except ValueError:
+        raise ValueError(f"--after {token!r} is not a page token") from None
+    if not isinstance(values, list) or not values or values[0] not in PAGE_SORTS:
+        raise ValueError(f"--after {token!r} is not a page token")
+    if values[0] != sort:
+        raise ValueError(f"--after token is for --sort {values[0]}, not --sort {sort}")
+    if len(values) != len(PAGE_SORTS[sort][2]) + 2:
+        raise ValueError(f"--after {token!r} is not a page token")
+    params = {f'after_{n}': value for n, value in enumerate(values[1:-1], 1)}
+    params['after_id'] = values[-1]
+    return params
+
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def page_params(filters, after=None, sort='priority', limit=50):
+    """Query parameters for one page; filters is a dict of the --domain/--risk/... values"""
+    params = dict(PAGE_DEFAULTS, limit=limit)
+    if filters.get('domain'):
+        params['domain'] = filters['domain']
+    if filters.get('risk'):
+        params['risk'] = filters['risk'].capitalize()
+    if filters.get('contact'):
+        params['contact'] = filters['contact'].capitalize()
+    if filters.get('min_compliance') is not None:
+        params['min_compliance'] = filters['min_compliance']
+    if filters.get('max_compliance') is not None:
+        params['max_compliance'] = filters['max_compliance']
+    if filters.get('name_prefix'):
+        params['name_prefix'] = _escape_like(filters['name_prefix'].lower()) + '%'
+    if after:
+        params.update(decode_token(sort, after))
+    return params
+
+
+def fetch_page(conn, sort='priority', filters=None, after=None, limit=50):
+    """(rows as dicts, token for the next page or None)"""
+    params = page_params(filters or {}, after, sort, limit)
+    cursor = conn.cursor()
+    try:
+        rows = registry.fetchall(cursor, f'compliance.page_by_{sort}', params)
+        columns = [column[0] for column in cursor.description]
+    finally:
+        cursor.close()
+    rows = [dict(zip(columns, row)) for row in rows]
+    token = encode_token(sort, rows[-1]) if len(rows) == limit else None
+    return rows, token
+
+
+def print_page(rows):
+    print(f"{'System':30s} | {'Domain':15s} | {'Compliance':>10s} | {'Missing':>7s} | {'Crit':>4s} | "
+          f"{'Imp':>4s} | {'Contact':8s} | {'Risk':10s}")
+    print("-" * 110)
+    for row in rows:
+        name = (row['system_name'] or f"(resource {row['resource_id']})")[:30]
+        domain = (row['system_domain'] or "N/A")[:15]
+        compliance = f"{row['patch_compliance_pct']:9.2f}%" if row['patch_compliance_pct'] is not None else "N/A"
+        print(f"{name:30s} | {domain:15s} | {compliance:>10s} | {row['missing_patches_total']:7d} | "
+              f"{row['missing_critical']:4d} | {row['missing_important']:4d} | {row['contact_status']:8s} | "
+              f"{row['risk_level']:10s}")
+
+
+def print_pages(conn, args):
+    """List systems matching the filters, args.pages pages from args.after"""
+    sort = args.sort or 'priority'
+    limit = args.page_size or PAGE_DEFAULTS['limit']
+    filters = {option: getattr(args, option) for option in
+               ['domain', 'risk', 'contact', 'min_compliance', 'max_compliance', 'name_prefix']}
+    after = args.after
+    for page in range(args.pages or 1):
+        rows, after = fetch_page(conn, sort, filters, after, limit)
+        if page:
+            print()
+        print_page(rows)
+        if not rows:
+            print("(no matching systems)")
+        if after is None:
+            break
+    if after is not None:
+        print(f"\nNext page: --after {after}")
+    else:
+        print("\n(last page)")
+
+
+def print_examples(conn):
+    """Print the five example compliance queries"""
+    print("PATCH COMPLIANCE QUERY EXAMPLES")
+    print("=" * 80)
+
+    # Query 1: Summary view
+    print("\n1. COMPLIANCE SUMMARY (via view)")
+    print("-" * 80)
+    print(f"{'System':30s} | {'Missing':>7s} | {'Critical':>8s} | {'Compliance':>10s} | {'Contact':>10s} | {'Risk':>12s}")
+    print("-" * 90)
+    for sys_name, missing, crit, compliance, contact, risk in run_query(conn, 'compliance_summary'):
+        print(f"{sys_name:30s} | {missing:7d} | {crit:8d} | {compliance:9.2f}% | {contact:10s} | {risk:12s}")
+
+    # Query 2: Systems needing critical patches, first page
+    print("\n\n2. SYSTEMS WITH CRITICAL PATCHES MISSING")
+    print("-" * 80)
+    print(f"{'System':30s} | {'Domain':15s} | {'Last Contact':16s} | {'Crit':>4s} | {'Imp':>4s} | {'Total':>5s}")
+    print("-" * 90)
+    rows, after = fetch_page(conn, 'priority', {'risk': 'critical'}, limit=25)
+    for row in rows:
+        domain_str = row['system_domain'][:14] if row['system_domain'] else "N/A"
+        contact_str = row['last_contact'].strftime("%Y-%m-%d %H:%M") if row['last_contact'] else "Never"
+        print(f"{row['system_name'] or '':30s} | {domain_str:15s} | {contact_str:16s} | {row['missing_critical']:4d} | "
+              f"{row['missing_important']:4d} | {row['missing_patches_total']:5d}")
+    if after is not None:
+        print(f"\nMore: patchmgr query --risk critical --page-size 25 --after {after}")
+
+    # Query 3: Compliance by severity
+    print("\n\n3. MISSING PATCHES BY SEVERITY (Environment Totals)")
+    print("-" * 80)
+    crit, imp, mod, low, unrated, total = [value or 0 for value in run_query(conn, 'severity_totals')[0]]
+    print(f"Critical:  {crit:5d}")
+    print(f"Important: {imp:5d}")
+    print(f"Moderate:  {mod:5d}")
+    print(f"Low:       {low:5d}")
+    print(f"Unrated:   {unrated:5d}")
+    print(f"{'':10s}-------")
+    print(f"Total:     {total:5d}")
+
+    # Query 4: Systems by compliance percentage
+    print("\n\n4. SYSTEMS BY COMPLIANCE LEVEL")
+    print("-" * 80)
+    print(f"{'Compliance Range':20s} | {'System Count':>12s}")
+    print("-" * 40)
+    for bracket, count in run_query(conn, 'compliance_brackets'):
+        print(f"{bracket:20s} | {count:12d}")
+
+    # Query 5: Recently contacted vs stale systems
+    print("\n\n5. SYSTEM CONTACT STATUS")
+    print("-" * 80)
+    print(f"{'Status':25s} | {'System Count':>12s}")
+    print("-" * 45)
+    for status, count in run_query(conn, 'contact_status'):
+        print(f"{status:25s} | {count:12d}")
+
+    print("\n" + "=" * 80)
+    print("Query complete!")
+
+
+def main(args):
+    """`patchmgr query`"""
+    if args.min_compliance is not None and args.max_compliance is not None \
+            and args.min_compliance > args.max_compliance:
+        print("ERROR: --min-compliance is above --max-compliance")
+        return 1
+    if (args.page_size is not None and args.page_size < 1) or (args.pages is not None and args.pages < 1):
+        print("ERROR: --page-size and --pages must be at least 1")
+        return 1
+    if args.after:
+        try:
+            decode_token(args.sort or 'priority', args.after)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            return 1
+
+    conn = db.connect_private()
+    try:
+        if any(getattr(args, option) is not None for option in PAGE_OPTIONS):
+            print_pages(conn, args)
+        else:
+            print_examples(conn)
+    finally:
+        conn.close()
+    return 0
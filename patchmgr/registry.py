@@ -0,0 +1,337 @@
+"""
+Named, versioned query registry with server-side prepares and local stats
+
+Each module registers its SQL once:
+
+    SYSTEMS = registry.register('report.systems', SYSTEMS_SQL, version=1)
+
+and runs it by name with registry.fetchall(cursor, 'report.systems', params).
+Parameters are psycopg2 %(name)s placeholders, so a parameterized query's
+literal % signs are written %%. Table names, which can't be parameters, are
+{placeholders} filled with quoted identifiers (identifiers={'table': name}).
+
+Queries registered with prepare=True are PREPAREd once per connection as
+pm_<name>_v<version> and run with EXECUTE, so repeated calls skip parse and
+plan. Bumping a query's version gives it a new statement name and a new row
+in the stats. Prepares are skipped for replayed or captured PMP connections
+(fixtures are keyed by the SQL text) and for non-PostgreSQL connections.
+
+Every execution adds its latency and row count to an in-memory tally that is
+merged into a local SQLite file (PATCHMGR_STATS_PATH, default
+patchmgr-stats.sqlite) when the process exits. `patchmgr stats` shows it,
+pg_stat_statements style.
+"""
+
+import atexit
+import math
+import re
+import time
+import weakref
+from datetime import datetime
+
+from . import config
+
+PARAM = re.compile(r'%\((\w+)\)s')
+READ_QUERY = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+# Modules that register queries, imported by `patchmgr stats --queries`
+QUERY_MODULES = ['patchmgr.report', 'patchmgr.explore', 'patchmgr.query', 'patchmgr.catalog', 'patchmgr.sync',
+                 'patchmgr.events', 'patchmgr.applicability', 'patchmgr.dashboard',
+                 'patchmgr.simulate', 'patchmgr.bitmaps', 'patchmgr.schemacheck',
+                 'patchmgr.schemasnapshot', 'patchmgr.api',
+                 'patchmgr.anomalies', 'patchmgr.patcharrays', 'patchmgr.snapfile']
+
+CREATE_STATS_SQL = """
+CREATE TABLE IF NOT EXISTS query_stats (
+    name TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    prepared INTEGER NOT NULL DEFAULT 0,
+    calls INTEGER NOT NULL DEFAULT 0,
+    total_ms REAL NOT NULL DEFAULT 0,
+    min_ms REAL,
+    max_ms REAL,
+    sum_sq_ms REAL NOT NULL DEFAULT 0,
+    rows INTEGER NOT NULL DEFAULT 0,
+    first_seen TEXT,
+    last_seen TEXT,
+    PRIMARY KEY (name, version)
+)
+"""
+
+MERGE_STATS_SQL = """
+INSERT INTO query_stats (name, version, prepared, calls, total_ms, min_ms, max_ms, sum_sq_ms, rows, first_seen, last_seen)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (name, version) DO UPDATE SET
+    prepared = excluded.prepared,
+    calls = query_stats.calls + excluded.calls,
+    total_ms = query_stats.total_ms + excluded.total_ms,
+    min_ms = min(query_stats.min_ms, excluded.min_ms),
+    max_ms = max(query_stats.max_ms, excluded.max_ms),
+    sum_sq_ms = query_stats.sum_sq_ms + excluded.sum_sq_ms,
+    rows = query_stats.rows + excluded.rows,
+    last_seen = excluded.last_seen
+"""
+
+STATS_ORDER = {
+    'total': 'total_ms DESC',
+    'mean': 'total_ms / calls DESC',
+    'calls': 'calls DESC',
+    'rows': 'rows DESC',
+}
+
+
+class Query:
+    """A named, versioned SQL statement"""
+
+    def __init__(self, name, sql, version=1, prepare=False):
+        if prepare and not READ_QUERY.match(sql):
+            raise ValueError(f"query {name}: only SELECT/WITH queries can be prepared")
+        self.name = name
+        self.sql = sql
+        self.version = version
+        self.prepare = prepare
+        self.params = list(dict.fromkeys(PARAM.findall(sql)))
+
+    @property
+    def statement_name(self):
+        return f"pm_{re.sub(r'[^a-z0-9_]', '_', self.name.lower())}_v{self.version}"
+
+    def render(self, identifiers=None):
+        """SQL text with {placeholders} replaced by quoted identifiers"""
+        if not identifiers:
+            return self.sql
+        return self.sql.format(**{key: quote_identifier(value) for key, value in identifiers.items()})
+
+    def prepare_sql(self):
+        """PREPARE statement: %(name)s -> $n in first-use order, %% -> %"""
+        text = self.sql.strip().rstrip(';')
+        if self.params:
+            positions = {name: n for n, name in enumerate(self.params, 1)}
+            text = PARAM.sub(lambda m: f"${positions[m.group(1)]}", text).replace('%%', '%')
+        return f"PREPARE {self.statement_name} AS {text}"
+
+    def execute_sql(self):
+        if not self.params:
+            return f"EXECUTE {self.statement_name}"
+        return f"EXECUTE {self.statement_name} ({', '.join(f'%({name})s' for name in self.params)})"
+
+
+def quote_identifier(name):
+    """Double-quote a table or column name for direct use in SQL"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+QUERIES = {}
+
+
+def register(name, sql, version=1, prepare=False):
+    """Add a query to the registry and return it"""
+    existing = QUERIES.get(name)
+    if existing is not None and (existing.sql, existing.version) != (sql, version):
+        raise ValueError(f"query {name} is already registered with different SQL or version")
+    QUERIES[name] = query = Query(name, sql, version, prepare)
+    return query
+
+
+def register_all(prefix, queries, prepare=()):
+    """
+    Register a dict of queries as prefix.name
+
+    Values are SQL strings or WORKLOAD-style dicts with 'sql' and an optional
+    'version'. Names in prepare are prepared server-side.
+    """
+    for name, entry in queries.items():
+        if isinstance(entry, str):
+            entry = {'sql': entry}
+        register(f'{prefix}.{name}', entry['sql'], entry.get('version', 1), name in prepare)
+
+
+def get(name):
+    try:
+        return QUERIES[name]
+    except KeyError:
+        raise KeyError(f"unknown query {name!r}") from None
+
+
+# connection -> statement names prepared on it
+_prepared = weakref.WeakKeyDictionary()
+
+
+def _can_prepare(conn):
+    """True for live psycopg2 connections, through profiling wrappers only"""
+    from . import fixtures
+
+    while True:
+        if isinstance(conn, (fixtures.CapturingConnection, fixtures.ReplayConnection)):
+            return False
+        inner = getattr(conn, '_conn', None)
+        if inner is None:
+            break
+        conn = inner
+    return type(conn).__module__.startswith('psycopg2')
+
+
+def _statement(cursor, query, identifiers):
+    """(sql, prepared) to execute for a query on this cursor's connection"""
+    if not query.prepare or identifiers:
+        return query.render(identifiers), False
+    conn = cursor.connection
+    names = _prepared.get(conn)
+    if names is None:
+        if not _can_prepare(conn):
+            return query.sql, False
+        names = _prepared[conn] = set()
+    if query.statement_name not in names:
+        # Prepared statements outlive a rollback, so this runs once per session
+        cursor.execute(query.prepare_sql())
+        names.add(query.statement_name)
+    return query.execute_sql(), True
+
+
+def execute(cursor, name, params=None, identifiers=None):
+    """Run a registered query; returns the cursor's rowcount"""
+    query = get(name)
+    sql, prepared = _statement(cursor, query, identifiers)
+    start = time.perf_counter()
+    cursor.execute(sql, params if query.params else None)
+    record(query, time.perf_counter() - start, max(cursor.rowcount, 0), prepared)
+    return cursor.rowcount
+
+
+def fetchall(cursor, name, params=None, identifiers=None):
+    """Run a registered query and return all rows"""
+    query = get(name)
+    sql, prepared = _statement(cursor, query, identifiers)
+    start = time.perf_counter()
+    cursor.execute(sql, params if query.params else None)
+    rows = cursor.fetchall()
+    record(query, time.perf_counter() - start, len(rows), prepared)
+    return rows
+
+
+def fetchone(cursor, name, params=None, identifiers=None):
+    """Run a registered query and return its first row"""
+    rows = fetchall(cursor, name, params, identifiers)
+    return rows[0] if rows else None
+
+
+# (name, version) -> [prepared, calls, total_ms, min_ms, max_ms, sum_sq_ms, rows, first_seen, last_seen]
+_tally = {}
+
+
+def record(query, seconds, rows, prepared=False):
+    """Add one execution to the in-memory tally"""
+    ms = seconds * 1000
+    now = datetime.now().isoformat(timespec='seconds')
+    if not _tally:
+        atexit.register(flush_stats)
+    entry = _tally.get((query.name, query.version))
+    if entry is None:
+        _tally[(query.name, query.version)] = [int(prepared), 1, ms, ms, ms, ms * ms, rows, now, now]
+        return
+    entry[0] = int(prepared)
+    entry[1] += 1
+    entry[2] += ms
+    entry[3] = min(entry[3], ms)
+    entry[4] = max(entry[4], ms)
+    entry[5] += ms * ms
+    entry[6] += rows
+    entry[8] = now
+
+
+def _open_stats(path=None):
+    import sqlite3
+
+    conn = sqlite3.connect(path or config.stats_path())
+    conn.execute(CREATE_STATS_SQL)
+    return conn
+
+
+def flush_stats(path=None):
+    """Merge the in-memory tally into the stats file; returns the queries written"""
+    path = path or config.stats_path()
+    if not _tally or not path:
+        return 0
+    try:
+        conn = _open_stats(path)
+    except Exception as e:
+        print(f"WARNING: Could not write query stats to {path}: {e}")
+        return 0
+    try:
+        with conn:
+            conn.executemany(MERGE_STATS_SQL, [key + tuple(entry) for key, entry in _tally.items()])
+        written = len(_tally)
+        _tally.clear()
+        return written
+    finally:
+        conn.close()
+
+
+def load_stats(path=None, order='total'):
+    """[(name, version, prepared, calls, total_ms, mean_ms, stddev_ms, min_ms, max_ms, rows, last_seen)]"""
+    conn = _open_stats(path)
+    try:
+        rows = conn.execute(
+            "SELECT name, version, prepared, calls, total_ms, min_ms, max_ms, sum_sq_ms, rows, last_seen "
+            f"FROM query_stats WHERE calls > 0 ORDER BY {STATS_ORDER[order]}").fetchall()
+    finally:
+        conn.close()
+    result = []
+    for name, version, prepared, calls, total, low, high, sum_sq, count, last_seen in rows:
+        mean = total / calls
+        stddev = math.sqrt(max(sum_sq / calls - mean * mean, 0))
+        result.append((name, version, prepared, calls, total, mean, stddev, low, high, count, last_seen))
+    return result
+
+
+def reset_stats(path=None):
+    conn = _open_stats(path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM query_stats")
+    finally:
+        conn.close()
+
+
+def print_queries():
+    import importlib
+
+    for module in QUERY_MODULES:
+        importlib.import_module(module)
+    print(f"{'Query':36s} | {'Ver':>3s} | {'Prepared':8s} | Parameters")
+    print("-" * 90)
+    for name in sorted(QUERIES):
+        query = QUERIES[name]
+        print(f"{name:36s} | {query.version:3d} | {'yes' if query.prepare else 'no':8s} | "
+              f"{', '.join(query.params) or '-'}")
+
+
+def main(args):
+    """`patchmgr stats`: per-query latency and rows recorded by this machine"""
+    path = config.stats_path()
+    if args.queries:
+        print_queries()
+        return 0
+    if not path:
+        print("Query stats are turned off (PATCHMGR_STATS_PATH=off)")
+        return 1
+    if args.reset:
+        reset_stats(path)
+        print(f"Query stats in {path} reset")
+        return 0
+
+    rows = load_stats(path, args.sort)
+    print(f"Query stats from {path}")
+    print("=" * 120)
+    print(f"{'Query':36s} | {'Ver':>3s} | {'Calls':>7s} | {'Total ms':>10s} | {'Mean ms':>9s} | {'Stddev':>8s} | "
+          f"{'Max ms':>9s} | {'Rows':>10s} | Last run")
+    print("-" * 120)
+    for name, version, prepared, calls, total, mean, stddev, low, high, count, last_seen in rows[:args.limit]:
+        label = name + (' *' if prepared else '')
+        print(f"{label:36s} | {version:3d} | {calls:7,d} | {total:10.1f} | {mean:9.2f} | {stddev:8.2f} | "
+              f"{high:9.2f} | {count:10,d} | {last_seen}")
+    if not rows:
+        print("(no executions recorded yet)")
+    else:
+        print("\n* prepared server-side (PREPARE/EXECUTE)")
+    return 0
@@ -0,0 +1,294 @@
+"""
+Patch Manager Plus Reporting
+Generates reports on systems, patches, and compliance directly from PMP
+"""
+
+from datetime import datetime
+
+from . import db, estimate, registry
+
+SYSTEMS_SQL = """
+    SELECT
+        mc.resource_id,
+        r.name as resource_name,
+        r.resource_type,
+        mc.managed_status,
+        mc.agent_status,
+        to_timestamp(mc.agent_executed_on/1000) as last_contact
+    FROM managedcomputer mc
+    LEFT JOIN resource r ON mc.resource_id = r.resource_id
+    WHERE mc.managed_status = 61
+    ORDER BY r.name
+    LIMIT 100;
+"""
+
+PATCH_COUNTS_SQL = """
+    SELECT
+        pc.resource_id,
+        r.name as resource_name,
+        pc.missing_ms_patches,
+        pc.installed_ms_patches,
+        pc.missing_tp_patches,
+        pc.installed_tp_patches,
+        (pc.missing_ms_patches + pc.missing_tp_patches) as total_missing
+    FROM pmresourcepatchcount pc
+    LEFT JOIN resource r ON pc.resource_id = r.resource_id
+    WHERE (pc.missing_ms_patches + pc.missing_tp_patches) > 0
+    ORDER BY total_missing DESC
+    LIMIT 20;
+"""
+
+STATUS_SUMMARY_SQL = """
+    SELECT
+        status,
+        status_id,
+        COUNT(*) as count
+    FROM affectedpatchstatus
+    GROUP BY status, status_id
+    ORDER BY count DESC;
+"""
+
+RECENT_PATCHES_SQL = """
+    SELECT
+        patchid,
+        description,
+        to_timestamp(releasedtime/1000) as release_date
+    FROM patchdetails
+    WHERE releasedtime > EXTRACT(EPOCH FROM NOW() - INTERVAL '30 days') * 1000
+    ORDER BY releasedtime DESC
+    LIMIT 20;
+"""
+
+RESOURCE_TABLES_SQL = """
+    SELECT table_name
+    FROM information_schema.tables
+    WHERE table_schema = 'public'
+    AND table_name LIKE '%resource%'
+    AND table_name NOT LIKE '%extn'
+    ORDER BY table_name
+    LIMIT 20;
+"""
+
+NAME_COLUMNS_SQL = """
+    SELECT column_name
+    FROM information_schema.columns
+    WHERE table_name = %(table)s
+    AND (column_name LIKE '%%name%%' OR column_name LIKE '%%computer%%')
+    ORDER BY column_name;
+"""
+
+MANAGED_COUNT_SQL = "SELECT COUNT(*) FROM managedcomputer WHERE managed_status = 61;"
+
+# Every report query, in the order they run (managed_count only as the
+# fallback when the systems query fails)
+REPORT_QUERIES = {
+    'resource_tables': RESOURCE_TABLES_SQL,
+    'name_columns': NAME_COLUMNS_SQL,
+    'systems': SYSTEMS_SQL,
+    'managed_count': MANAGED_COUNT_SQL,
+    'patch_counts': PATCH_COUNTS_SQL,
+    'status_summary': STATUS_SUMMARY_SQL,
+    'recent_patches': RECENT_PATCHES_SQL,
+}
+
+# Tables searched for system name columns; name_columns runs once for each
+NAME_TABLES = ['resource', 'adresource', 'managedcomputer']
+
+registry.register_all('report', REPORT_QUERIES, prepare={'name_columns'})
+
+
+def _fetchall(conn, name, params=None):
+    cursor = conn.cursor()
+    try:
+        return registry.fetchall(cursor, f'report.{name}', params)
+    finally:
+        cursor.close()
+
+
+def resource_tables(conn):
+    """Names of resource-related tables in the PMP schema"""
+    return [row[0] for row in _fetchall(conn, 'resource_tables')]
+
+
+def name_columns(conn, table):
+    """Columns of a table that look like system names"""
+    return [row[0] for row in _fetchall(conn, 'name_columns', {'table': table})]
+
+
+def systems(conn):
+    """Managed systems: (resource_id, name, type, managed_status, agent_status, last_contact)"""
+    return _fetchall(conn, 'systems')
+
+
+def patch_counts(conn):
+    """Top 20 systems by missing MS + third-party patches"""
+    return _fetchall(conn, 'patch_counts')
+
+
+def status_summary(conn):
+    """Patch status counts: (status, status_id, count)"""
+    return _fetchall(conn, 'status_summary')
+
+
+def recent_patches(conn):
+    """Patches released in the last 30 days: (patchid, description, release_date)"""
+    return _fetchall(conn, 'recent_patches')
+
+
+def estimate_report(conn):
+    """
+    Pre-flight EXPLAIN estimates for every report query
+
+    Returns (estimates, [(query, error)]). A query EXPLAIN fails on (a
+    missing table, no permission) is left out; its report section prints the
+    error when it runs.
+    """
+    estimates, failed = [], []
+    for name, sql in REPORT_QUERIES.items():
+        targets = ([(f"{name} ({table})", {'table': table}) for table in NAME_TABLES]
+                   if name == 'name_columns' else [(name, None)])
+        for label, params in targets:
+            try:
+                estimates.append(estimate.estimate_query(conn, label, sql, params))
+            except Exception as e:
+                conn.rollback()
+                failed.append((label, e))
+    return estimates, failed
+
+
+def print_report(conn):
+    """Print all four reports"""
+    print("Patch Manager Plus Reports")
+    print("Generated:", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    print("=" * 80)
+
+    # First, find the resource table with names
+    print("\n1. FINDING RESOURCE NAMES TABLE...")
+    tables = resource_tables(conn)
+    print(f"Found resource tables: {', '.join(tables[:10])}")
+
+    # Try to find resource name column
+    for table in NAME_TABLES:
+        try:
+            cols = name_columns(conn, table)
+            if cols:
+                print(f"  {table}: {', '.join(cols)}")
+        except Exception:
+            conn.rollback()
+
+    # REPORT 1: Systems Summary
+    print("\n\n" + "=" * 80)
+    print("REPORT 1: SYSTEMS BEING PATCHED")
+    print("=" * 80)
+
+    try:
+        rows = systems(conn)
+
+        print(f"\n{'ID':>6} | {'Computer Name':40s} | {'Type':10s} | {'Last Contact':20s}")
+        print("-" * 90)
+
+        for res_id, name, res_type, status, agent_status, last_contact in rows:
+            name_str = name if name else f"Unknown (ID: {res_id})"
+            type_str = str(res_type) if res_type else "Unknown"
+            contact_str = last_contact.strftime("%Y-%m-%d %H:%M") if last_contact else "Never"
+            print(f"{res_id:6d} | {name_str:40s} | {type_str:10s} | {contact_str:20s}")
+
+        print(f"\nTotal systems: {len(rows)}")
+
+    except Exception as e:
+        print(f"Error getting system details: {e}")
+        conn.rollback()
+        # Fallback to just managed computer
+        count = _fetchall(conn, 'managed_count')[0][0]
+        print(f"Total managed computers: {count}")
+
+    # REPORT 2: Patch Counts Per System
+    print("\n\n" + "=" * 80)
+    print("REPORT 2: PATCH COUNTS PER SYSTEM")
+    print("=" * 80)
+
+    try:
+        rows = patch_counts(conn)
+
+        print(f"\n{'Computer Name':40s} | {'Missing MS':>11s} | {'Installed MS':>12s} | {'Missing TP':>11s} | {'Total Missing':>14s}")
+        print("-" * 100)
+
+        for res_id, name, miss_ms, inst_ms, miss_tp, inst_tp, total_miss in rows:
+            name_str = name if name else f"Unknown (ID: {res_id})"
+            print(f"{name_str:40s} | {miss_ms:11d} | {inst_ms:12d} | {miss_tp:11d} | {total_miss:14d}")
+
+    except Exception as e:
+        print(f"Error: {e}")
+        conn.rollback()
+
+    # REPORT 3: Patch Status Summary
+    print("\n\n" + "=" * 80)
+    print("REPORT 3: PATCH STATUS SUMMARY")
+    print("=" * 80)
+
+    try:
+        rows = status_summary(conn)
+
+        print(f"\n{'Status':20s} | {'Status ID':>10s} | {'Count':>10s}")
+        print("-" * 45)
+
+        for status, status_id, count in rows:
+            print(f"{status:20s} | {status_id:10d} | {count:10,d}")
+
+    except Exception as e:
+        print(f"Error: {e}")
+        conn.rollback()
+
+    # REPORT 4: Recently Added Patches
+    print("\n\n" + "=" * 80)
+    print("REPORT 4: RECENTLY AVAILABLE PATCHES (Last 30 days)")
+    print("=" * 80)
+
+    try:
+        rows = recent_patches(conn)
+
+        print(f"\n{'Patch ID':>10s} | {'Release Date':15s} | {'Description':50s}")
+        print("-" * 80)
+
+        for patch_id, desc, release_date in rows:
+            desc_short = desc[:47] + "..." if len(desc) > 50 else desc
+            date_str = release_date.strftime("%Y-%m-%d") if release_date else "Unknown"
+            print(f"{patch_id:10d} | {date_str:15s} | {desc_short:50s}")
+
+    except Exception as e:
+        print(f"Error: {e}")
+        conn.rollback()
+
+    print("\n" + "=" * 80)
+    print("Report generation complete!")
+
+
+def main(args):
+    """`patchmgr report`: refuses to run if any query is estimated over the limits"""
+    limits = estimate.limits_from_args(args)
+    conn = db.connect_pmp()
+    try:
+        estimates, failed = estimate_report(conn)
+        for name, error in failed:
+            print(f"WARNING: Could not estimate {name}: {str(error).splitlines()[0]}")
+        if failed:
+            print()
+
+        if args.dry_run:
+            print("PATCH REPORT (DRY RUN)")
+            print("EXPLAIN only - no report query is executed")
+            print("=" * 96)
+            within = estimate.print_estimates(estimates, limits)
+            print(f"Result: {'within limits' if within else 'over limits, the report would refuse to run'}")
+            return 0 if within else 1
+
+        if any(estimate.over_limits(e, limits) for e in estimates):
+            print("ERROR: Report queries are estimated over the configured limits:\n")
+            estimate.print_estimates(estimates, limits, show_plans=False)
+            print("\nRefusing to run. Check with --dry-run or raise the limits.")
+            return 1
+
+        print_report(conn)
+    finally:
+        conn.close()
+    return 0
@@ -0,0 +1,267 @@
+"""
+Run coordination with a PostgreSQL advisory lock on the private database
+
+Only one sync (and one extract or ingest) may run at a time. The lock is session-level and held on a
+dedicated connection for the whole run, so it is released automatically if
+the process dies. When the lock is taken, a new run can:
+
+- skip:  give up immediately (default)
+- wait:  poll for the lock until a timeout
+- queue: block until the lock is free; waiting runs are granted it in turn
+
+Every run, including skipped ones, is recorded in patchmgr_runs along with
+the host, process and database backend that held the lock.
+"""
+
+import os
+import socket
+import time
+from contextlib import contextmanager
+
+from . import config, db
+
+# Advisory lock key per command ('pmsy', 'pmex', 'pmin')
+LOCK_KEYS = {
+    'sync': 0x706D7379,
+    'extract': 0x706D6578,
+    'ingest': 0x706D696E,
+}
+
+LOCK_MODES = ('skip', 'wait', 'queue')
+
+CREATE_RUNS_SQL = """
+CREATE TABLE IF NOT EXISTS patchmgr_runs (
+    run_id BIGSERIAL PRIMARY KEY,
+    command VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    lock_mode VARCHAR(10),
+    hostname VARCHAR(255),
+    pid INTEGER,
+    backend_pid INTEGER,
+    requested_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    waited_seconds DECIMAL(10,2),
+    message TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_patchmgr_runs_requested_at ON patchmgr_runs(requested_at);
+
+COMMENT ON TABLE patchmgr_runs IS 'Sync runs and the advisory lock holder for each';
+COMMENT ON COLUMN patchmgr_runs.status IS 'running, succeeded, failed, skipped, timed_out or abandoned';
+"""
+
+
+class RunLock:
+    """Advisory lock plus its patchmgr_runs row, on a dedicated autocommit connection"""
+
+    def __init__(self, conn, command):
+        self.conn = conn
+        self.conn.autocommit = True
+        self.command = command
+        self.lock_key = LOCK_KEYS[command]
+        self.run_id = None
+        self.waited = 0.0
+        self._execute(CREATE_RUNS_SQL)
+
+    def _execute(self, sql, params=None):
+        """Run a statement and return its first row, if any"""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchone() if cursor.description else None
+        finally:
+            cursor.close()
+
+    def _try_lock(self):
+        return self._execute("SELECT pg_try_advisory_lock(%s);", (self.lock_key,))[0]
+
+    def acquire(self, mode='skip', timeout=300, poll=1.0):
+        """Try to take the lock; returns True if this run now holds it (timeout None = no limit)"""
+        if mode not in LOCK_MODES:
+            raise ValueError(f"lock mode must be one of {', '.join(LOCK_MODES)}")
+        start = time.monotonic()
+
+        if mode == 'queue':
+            self._execute("SELECT pg_advisory_lock(%s);", (self.lock_key,))
+            acquired = True
+        else:
+            acquired = self._try_lock()
+            while not acquired and mode == 'wait' and (timeout is None or time.monotonic() - start < timeout):
+                time.sleep(poll)
+                acquired = self._try_lock()
+
+        self.waited = time.monotonic() - start
+        if acquired:
+            self._mark_abandoned()
+            self.run_id = self._record('running', mode)
+        else:
+            self._record('skipped' if mode == 'skip' else 'timed_out', mode,
+                         f"lock held by {self.holder()}")
+        return acquired
+
+    def _record(self, status, mode, message=None):
+        return self._execute("""
+            INSERT INTO patchmgr_runs (
+                command, status, lock_mode, hostname, pid, backend_pid,
+                requested_at, started_at, finished_at, waited_seconds, message
+            ) VALUES (
+                %s, %s, %s, %s, %s, pg_backend_pid(),
+                CURRENT_TIMESTAMP - make_interval(secs => %s),
+                CASE WHEN %s = 'running' THEN CURRENT_TIMESTAMP END,
+                CASE WHEN %s <> 'running' THEN CURRENT_TIMESTAMP END,
+                %s, %s
+            )
+            RETURNING run_id;
+        """, (self.command, status, mode, socket.gethostname(), os.getpid(), self.waited,
+              status, status, round(self.waited, 2), message))[0]
+
+    def _mark_abandoned(self):
+        # We hold the lock, so any run still marked running died without finishing
+        self._execute("""
+            UPDATE patchmgr_runs
+            SET status = 'abandoned', finished_at = CURRENT_TIMESTAMP
+            WHERE command = %s AND status = 'running';
+        """, (self.command,))
+
+    def holder(self):
+        """Description of the run currently marked as holding the lock"""
+        row = self._execute("""
+            SELECT run_id, hostname, pid, started_at
+            FROM patchmgr_runs
+            WHERE command = %s AND status = 'running'
+            ORDER BY run_id DESC
+            LIMIT 1;
+        """, (self.command,))
+        if not row:
+            # Held outside patchmgr (or by a run that never recorded itself)
+            row = self._execute("""
+                SELECT a.pid, a.application_name, a.client_addr
+                FROM pg_locks l
+                JOIN pg_stat_activity a ON a.pid = l.pid
+                WHERE l.locktype = 'advisory' AND l.granted
+                AND l.classid = 0 AND l.objid = %s::oid AND l.objsubid = 1;
+            """, (self.lock_key,))
+            if not row:
+                return "unknown"
+            return f"backend pid {row[0]} ({row[1] or 'no application name'}, {row[2] or 'local'})"
+        run_id, hostname, pid, started_at = row
+        return f"run #{run_id} on {hostname} (pid {pid}, started {started_at:%Y-%m-%d %H:%M:%S})"
+
+    def release(self, status, message=None):
+        """Record the outcome and release the lock"""
+        self._execute("""
+            UPDATE patchmgr_runs
+            SET status = %s, finished_at = CURRENT_TIMESTAMP, message = %s
+            WHERE run_id = %s;
+        """, (status, message, self.run_id))
+        self._execute("SELECT pg_advisory_unlock(%s);", (self.lock_key,))
+
+
+@contextmanager
+def coordinated_run(command, mode='skip', timeout=300):
+    """
+    Hold the run lock for the body of a with block
+
+    Yields a dict with 'acquired' and 'run_id'. Set 'status' (default
+    'succeeded') or 'message' on it to record the outcome; an exception
+    records 'failed'.
+    """
+    conn = db.connect_private(profiled=False)
+    lock = RunLock(conn, command)
+    run = {'acquired': False, 'run_id': None, 'status': 'succeeded', 'message': None}
+    try:
+        run['acquired'] = lock.acquire(mode, timeout)
+        run['run_id'] = lock.run_id
+        run['holder'] = None if run['acquired'] else lock.holder()
+        run['waited'] = lock.waited
+        try:
+            yield run
+        except BaseException as e:
+            run['status'] = 'failed'
+            run['message'] = str(e)[:500]
+            raise
+        finally:
+            if run['acquired']:
+                lock.release(run['status'], run['message'])
+    finally:
+        conn.close()
+
+
+def run_locked(command, args, body):
+    """
+    Run body() under the command's run lock; returns an exit code
+
+    The lock mode and timeout come from --lock / --lock-timeout, falling back
+    to PATCHMGR_LOCK_MODE / PATCHMGR_LOCK_TIMEOUT. body() returns an exit code.
+    """
+    lock = config.run_lock()
+    mode = getattr(args, 'lock', None) or lock['mode']
+    timeout = lock['timeout']
+    if getattr(args, 'lock_timeout', None) is not None:
+        timeout = args.lock_timeout if args.lock_timeout > 0 else None
+    if mode == 'off':
+        print()
+        return body()
+
+    # Exceptions from body() are the command's own; they propagate as they
+    # do with --lock off, after the run row records the failure
+    in_body = False
+    try:
+        with coordinated_run(command, mode, timeout) as run:
+            if not run['acquired']:
+                print(f"Another {command} is running: {run['holder']}")
+                if mode == 'skip':
+                    print("Skipping this run (--lock wait or --lock queue to wait for it)")
+                    return 0
+                print(f"  ERROR: Timed out after {run['waited']:.0f}s waiting for the run lock")
+                return 1
+            waited = f", waited {run['waited']:.1f}s" if run['waited'] >= 0.1 else ""
+            print(f"Run lock acquired: run #{run['run_id']} ({mode}{waited})")
+            print()
+            in_body = True
+            code = body()
+            in_body = False
+            run['status'] = 'succeeded' if code == 0 else 'failed'
+            return code
+    except Exception as e:
+        if in_body:
+            raise
+        print(f"  ERROR: Run coordination failed: {e}")
+        return 1
+
+
+def recent_runs(conn, limit=20):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(CREATE_RUNS_SQL)
+        cursor.execute("""
+            SELECT run_id, command, status, lock_mode, hostname, pid,
+                   requested_at, started_at, finished_at, waited_seconds, message
+            FROM patchmgr_runs
+            ORDER BY run_id DESC
+            LIMIT %s;
+        """, (limit,))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def main(args):
+    """`patchmgr runs`: list recent runs and the current lock holder"""
+    conn = db.connect_private()
+    try:
+        rows = recent_runs(conn, args.limit)
+        conn.commit()
+    finally:
+        conn.close()
+
+    print(f"{'Run':>6} | {'Command':8s} | {'Status':10s} | {'Mode':5s} | {'Host':20s} | {'Requested':19s} | {'Duration':>9s} | {'Waited':>7s}")
+    print("-" * 105)
+    for run_id, command, status, mode, host, pid, requested, started, finished, waited, message in rows:
+        duration = f"{(finished - started).total_seconds():8.1f}s" if started and finished else "-"
+        print(f"{run_id:6d} | {command:8s} | {status:10s} | {mode or '':5s} | {(host or '')[:20]:20s} | "
+              f"{requested:%Y-%m-%d %H:%M:%S} | {duration:>9s} | {float(waited or 0):6.1f}s")
+        if message:
+            print(f"{'':9s}{message[:95]}")
+    return 0
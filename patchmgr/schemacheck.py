@@ -0,0 +1,275 @@
+"""
+Pre-flight check that the PMP columns the tools read haven't changed
+
+The sync's extraction query names about 35 columns from four PMP tables, and
+report, ingest and extract read a few more. A PMP upgrade that renames,
+drops or retypes one of them makes the sync fail halfway through, or worse,
+return NULLs through the LEFT JOINs.
+
+Before each sync, one pg_attribute query fetches the name and type of every
+column of the tables the tools read (QUERY_COLUMNS and the extract mirrors).
+The (table, column, type) triples of the columns the tools use are hashed and
+compared with the fingerprint saved by the last good run
+(PATCHMGR_SCHEMA_FINGERPRINT, default pmp-schema.json). On a mismatch the
+sync stops before extracting anything and prints what changed; the table's
+other columns are listed next to a missing one, as one is usually the new
+name. `patchmgr check-schema --accept` records the current schema once the
+queries have been updated.
+
+The first run records the fingerprint if every required column exists.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from . import config, db, extract, registry
+
+# PMP table -> columns read by sync, report and ingest
+# (the tables extract mirrors are added from extract.MIRRORED_TABLES)
+QUERY_COLUMNS = {
+    'managedcomputer': [
+        'resource_id', 'managed_status', 'agent_status', 'installation_status', 'agent_executed_on',
+        'fqdn_name', 'friendly_name', 'agent_version', 'added_time',
+    ],
+    'resource': ['resource_id', 'name', 'domain_netbios_name', 'resource_type'],
+    'pmresourcepatchcount': [
+        'resource_id', 'db_updated_time',
+        'total_ms_patches', 'missing_ms_patches', 'installed_ms_patches',
+        'total_tp_patches', 'missing_tp_patches', 'installed_tp_patches',
+        'total_driver_patches', 'missing_driver_patches', 'installed_driver_patches',
+        'total_bios_patches', 'missing_bios_patches', 'installed_bios_patches',
+    ],
+    'pmrespatchseveritycount': [
+        'resource_id', 'critical_count', 'important_count', 'moderate_count', 'low_count', 'unrated_count',
+    ],
+    'affectedpatchstatus': ['resource_id', 'patch_id', 'status_id', 'status', 'severity_id'],
+    'patchdetails': ['patchid', 'description', 'releasedtime'],
+}
+
+
+def dependencies():
+    """{table: (columns, optional)} for every PMP table the tools read"""
+    tables = {table: (list(columns), False) for table, columns in QUERY_COLUMNS.items()}
+    for table, spec in extract.MIRRORED_TABLES.items():
+        columns, optional = tables.get(table, ([], spec.get('optional', False)))
+        columns += [name for name, _ in spec['columns'] if name not in columns]
+        tables[table] = (columns, optional)
+    return tables
+
+
+# Every column of the tables, so a diff can show what replaced a missing column
+COLUMNS_SQL = """
+    SELECT c.relname, a.attname, format_type(a.atttypid, a.atttypmod)
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid
+    WHERE c.relname = ANY(%(tables)s)
+    AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+    AND pg_catalog.pg_table_is_visible(c.oid)
+    AND a.attnum > 0
+    AND NOT a.attisdropped
+    ORDER BY c.relname, a.attnum;
+"""
+
+registry.register_all('schema', {'columns': COLUMNS_SQL})
+
+
+def fetch_columns(pmp_conn, tables):
+    """{table: {column: type}} as PMP has them, for the tables that exist"""
+    cursor = pmp_conn.cursor()
+    try:
+        rows = registry.fetchall(cursor, 'schema.columns', {'tables': sorted(tables)})
+    finally:
+        cursor.close()
+    found = {}
+    for table, column, data_type in rows:
+        found.setdefault(table, {})[column] = data_type
+    return found
+
+
+def signature(found, tables=None):
+    """{table: {column: type or None}} for the columns the tools read; None if missing"""
+    tables = tables or dependencies()
+    result = {}
+    for table, (columns, _) in sorted(tables.items()):
+        if table not in found:
+            result[table] = None
+            continue
+        result[table] = {column: found[table].get(column) for column in sorted(columns)}
+    return result
+
+
+def fingerprint(sig):
+    """sha256 of the signature, stable across runs"""
+    text = json.dumps(sig, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def load_fingerprint(path):
+    """The saved {'fingerprint', 'signature', 'recorded_at'}, or None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_fingerprint(path, sig):
+    saved = {
+        'fingerprint': fingerprint(sig),
+        'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        'signature': sig,
+    }
+    temp = path + '.tmp'
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump(saved, f, indent=1, sort_keys=True)
+        f.write('\n')
+    os.replace(temp, path)
+    return saved
+
+
+def missing_columns(sig, found, tables=None):
+    """Problems that fail a check even without a saved fingerprint: missing required tables and columns"""
+    tables = tables or dependencies()
+    problems = []
+    for table, columns in sig.items():
+        if columns is None:
+            if not tables[table][1]:
+                problems.append(f"{table}: table not found")
+            continue
+        gone = [column for column, data_type in columns.items() if data_type is None]
+        if gone:
+            problems.append(_missing_line(table, gone, found[table], columns))
+    return problems
+
+
+def _missing_line(table, gone, present, used):
+    line = f"{table}: missing column{'s' if len(gone) > 1 else ''} {', '.join(gone)}"
+    others = [column for column in present if column not in used]
+    if others:
+        line += f" (other columns: {', '.join(others[:8])}{', ...' if len(others) > 8 else ''})"
+    return line
+
+
+def diff(saved, sig, found):
+    """Lines describing how sig differs from the saved signature"""
+    lines = []
+    for table in sorted(set(saved) | set(sig)):
+        old, new = saved.get(table), sig.get(table)
+        if old == new:
+            continue
+        if table not in saved:
+            lines.append(f"{table}: newly checked (update the saved fingerprint)")
+        elif table not in sig:
+            lines.append(f"{table}: no longer checked (update the saved fingerprint)")
+        elif new is None:
+            lines.append(f"{table}: table not found (had {len(old)} checked columns)")
+        elif old is None:
+            lines.append(f"{table}: table now exists")
+        else:
+            gone = [column for column in new if new[column] is None and old.get(column) is not None]
+            if gone:
+                lines.append(_missing_line(table, gone, found[table], new))
+            for column in sorted(set(old) | set(new)):
+                if column in gone or old.get(column) == new.get(column):
+                    continue
+                if column not in old:
+                    lines.append(f"{table}.{column}: newly checked (update the saved fingerprint)")
+                elif column not in new:
+                    lines.append(f"{table}.{column}: no longer checked (update the saved fingerprint)")
+                elif old[column] is None:
+                    lines.append(f"{table}.{column}: now exists ({new[column]})")
+                else:
+                    lines.append(f"{table}.{column}: type {old[column]} -> {new[column]}")
+    return lines
+
+
+def check(pmp_conn, path=None, accept=False, save=True):
+    """
+    Compare the PMP schema with the saved fingerprint
+
+    Returns (status, lines): 'ok', 'recorded' (first run or accept=True),
+    'changed' (lines is the diff) or 'missing' (required columns not found).
+    save=False reports 'recorded' without writing the file.
+    """
+    path = path or config.schema_fingerprint_path()
+    tables = dependencies()
+    found = fetch_columns(pmp_conn, tables)
+    sig = signature(found, tables)
+    saved = None if accept else load_fingerprint(path)
+
+    if saved is not None:
+        if saved.get('fingerprint') == fingerprint(sig):
+            return 'ok', []
+        return 'changed', diff(saved.get('signature') or {}, sig, found)
+
+    problems = missing_columns(sig, found, tables)
+    if problems and not accept:
+        return 'missing', problems
+    if save:
+        save_fingerprint(path, sig)
+    return 'recorded', problems
+
+
+def preflight(pmp_conn, save=True):
+    """
+    The sync's schema check; prints the outcome and returns False to stop
+
+    Skipped when PATCHMGR_SCHEMA_FINGERPRINT is off or PMP results are
+    replayed from fixtures (which hold only the recorded queries).
+    save=False (dry runs) never writes the fingerprint file.
+    """
+    path = config.schema_fingerprint_path()
+    mode = db.fixture_mode()
+    if not path or (mode and mode[0] == 'replay'):
+        print("  Schema check skipped")
+        return True
+    status, lines = check(pmp_conn, path, save=save)
+    if status == 'ok':
+        print("  Schema unchanged since the last sync")
+        return True
+    if status == 'recorded':
+        print(f"  Schema fingerprint recorded in {path}" if save else "  Schema has every column the sync reads")
+        return True
+    if status == 'missing':
+        print("  ERROR: PMP is missing columns the sync reads:")
+    else:
+        print(f"  ERROR: PMP schema changed since the fingerprint in {path} was recorded:")
+    for line in lines:
+        print(f"    {line}")
+    print("  Update the queries if needed, then run `patchmgr check-schema --accept`.")
+    return False
+
+
+def main(args):
+    """`patchmgr check-schema`: compare (or --accept) the PMP schema fingerprint"""
+    path = args.fingerprint or config.schema_fingerprint_path()
+    if not path:
+        print("ERROR: Schema fingerprints are turned off (PATCHMGR_SCHEMA_FINGERPRINT=off)")
+        return 1
+    try:
+        conn = db.connect_pmp()
+    except Exception as e:
+        print(f"ERROR: Failed to connect to PMP database: {e}")
+        return 1
+    try:
+        status, lines = check(conn, path, accept=args.accept)
+    finally:
+        conn.close()
+
+    tables = dependencies()
+    print(f"Checked {sum(len(columns) for columns, _ in tables.values())} columns "
+          f"in {len(tables)} PMP tables against {path}")
+    if status == 'ok':
+        print("Schema unchanged")
+        return 0
+    if status == 'recorded':
+        for line in lines:
+            print(f"  WARNING: {line}")
+        print(f"Fingerprint recorded in {path}")
+        return 0
+    print("Missing columns:" if status == 'missing' else "Changes since the fingerprint was recorded:")
+    for line in lines:
+        print(f"  {line}")
+    print("\nRun with --accept to record the current schema.")
+    return 1
@@ -0,0 +1,362 @@
+"""
+Offline snapshots of the PMP schema: search and diff without a connection
+
+`patchmgr schema --save` reads the whole catalog (every table with its
+estimated rows and size, columns, types and indexes) in three bulk queries
+and writes it to a gzip-compressed JSON file (PATCHMGR_SCHEMA_SNAPSHOT,
+default pmp-schema-snapshot.json.gz). Everything else reads the file:
+
+    patchmgr schema --search severity patch     tables and columns by name
+    patchmgr schema --table affectedpatchstatus columns and indexes of one table
+    patchmgr schema --diff before.json.gz       what changed since an older snapshot
+
+Row counts are the planner's estimates (pg_class.reltuples), so a snapshot
+never scans a table. Tables outside the public schema are named schema.table.
+"""
+
+import fnmatch
+import gzip
+import json
+import os
+from datetime import datetime
+
+from . import config, db, registry
+
+SNAPSHOT_VERSION = 1
+
+# Planner-visible user relations; system and temporary schemas are left out
+RELATIONS_FILTER = """
+    c.relkind IN ('r', 'p', 'v', 'm', 'f')
+    AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+    AND n.nspname NOT LIKE 'pg\\_toast%'
+    AND n.nspname NOT LIKE 'pg\\_temp\\_%'
+"""
+
+TABLES_SQL = f"""
+    SELECT
+        n.nspname,
+        c.relname,
+        c.relkind,
+        c.reltuples::bigint,
+        c.relpages::bigint * current_setting('block_size')::bigint
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    WHERE {RELATIONS_FILTER}
+    ORDER BY n.nspname, c.relname;
+"""
+
+COLUMNS_SQL = f"""
+    SELECT
+        n.nspname,
+        c.relname,
+        a.attname,
+        format_type(a.atttypid, a.atttypmod),
+        a.attnotnull,
+        pg_get_expr(d.adbin, d.adrelid)
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid
+    LEFT JOIN pg_catalog.pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+    WHERE {RELATIONS_FILTER}
+    AND a.attnum > 0
+    AND NOT a.attisdropped
+    ORDER BY n.nspname, c.relname, a.attnum;
+"""
+
+INDEXES_SQL = f"""
+    SELECT
+        n.nspname,
+        c.relname,
+        ic.relname,
+        pg_get_indexdef(i.indexrelid),
+        i.indisprimary,
+        i.indisunique
+    FROM pg_catalog.pg_index i
+    JOIN pg_catalog.pg_class c ON c.oid = i.indrelid
+    JOIN pg_catalog.pg_class ic ON ic.oid = i.indexrelid
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    WHERE {RELATIONS_FILTER}
+    ORDER BY n.nspname, c.relname, ic.relname;
+"""
+
+registry.register_all('snapshot', {
+    'tables': TABLES_SQL,
+    'columns': COLUMNS_SQL,
+    'indexes': INDEXES_SQL,
+})
+
+KINDS = {'r': 'table', 'p': 'table', 'v': 'view', 'm': 'matview', 'f': 'foreign'}
+
+# Row estimate changes shown by a diff: at least this factor and this many rows
+ROW_CHANGE_FACTOR = 2
+ROW_CHANGE_MIN = 1000
+
+
+def _table_name(schema, table):
+    return table if schema == 'public' else f"{schema}.{table}"
+
+
+def take(pmp_conn):
+    """
+    The schema as a dict, from three catalog queries
+
+    {'version', 'taken_at', 'server', 'tables': {name: {'kind', 'rows', 'bytes',
+    'columns': [[name, type, not_null, default]], 'indexes': [[name, definition, primary, unique]]}}}
+    """
+    cursor = pmp_conn.cursor()
+    try:
+        tables = {}
+        for schema, table, kind, rows, size in registry.fetchall(cursor, 'snapshot.tables'):
+            tables[_table_name(schema, table)] = {
+                'kind': KINDS[kind],
+                # reltuples is -1 (or 0 before PostgreSQL 14) until the first ANALYZE
+                'rows': rows if rows >= 0 else None,
+                'bytes': size,
+                'columns': [],
+                'indexes': [],
+            }
+        for schema, table, column, data_type, not_null, default in registry.fetchall(cursor, 'snapshot.columns'):
+            tables[_table_name(schema, table)]['columns'].append([column, data_type, not_null, default])
+        for schema, table, index, definition, primary, unique in registry.fetchall(cursor, 'snapshot.indexes'):
+            tables[_table_name(schema, table)]['indexes'].append([index, definition, primary, unique])
+        cursor.execute("SHOW server_version;")
+        server = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    return {
+        'version': SNAPSHOT_VERSION,
+        'taken_at': datetime.now().isoformat(timespec='seconds'),
+        'server': server,
+        'tables': tables,
+    }
+
+
+def save(snapshot, path):
+    """Write a snapshot as gzip-compressed JSON; returns the file size"""
+    temp = path + '.tmp'
+    with gzip.open(temp, 'wt', encoding='utf-8') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    os.replace(temp, path)
+    return os.path.getsize(path)
+
+
+def load(path):
+    """Read a snapshot file; raises ValueError if it isn't one"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        snapshot = json.load(f)
+    if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} schema snapshot")
+    return snapshot
+
+
+def _matcher(term):
+    """Case-insensitive substring match, or a glob when the term has * or ?"""
+    term = term.lower()
+    if '*' in term or '?' in term:
+        return lambda name: fnmatch.fnmatchcase(name.lower(), term)
+    return lambda name: term in name.lower()
+
+
+def search(snapshot, terms):
+    """
+    Tables and columns whose name matches any term
+
+    Returns (tables, columns): [(table, info)] and [(table, column, type)].
+    """
+    matchers = [_matcher(term) for term in terms]
+    tables, columns = [], []
+    for name, info in sorted(snapshot['tables'].items()):
+        if any(match(name) for match in matchers):
+            tables.append((name, info))
+        for column, data_type, _, _ in info['columns']:
+            if any(match(column) for match in matchers):
+                columns.append((name, column, data_type))
+    return tables, columns
+
+
+def find_table(snapshot, name):
+    """The table called name (case-insensitive), or None"""
+    tables = snapshot['tables']
+    if name in tables:
+        return name
+    lowered = {table.lower(): table for table in tables}
+    name = name.lower()
+    return lowered.get(name[len('public.'):] if name.startswith('public.') else name)
+
+
+def diff(old, new):
+    """
+    Changes from snapshot old to new
+
+    {'added': [table], 'removed': [table], 'changed': {table: [line]}, 'rows': [(table, old, new)]}
+    """
+    old_tables, new_tables = old['tables'], new['tables']
+    result = {
+        'added': sorted(set(new_tables) - set(old_tables)),
+        'removed': sorted(set(old_tables) - set(new_tables)),
+        'changed': {},
+        'rows': [],
+    }
+    for table in sorted(set(old_tables) & set(new_tables)):
+        before, after = old_tables[table], new_tables[table]
+        lines = []
+        if before['kind'] != after['kind']:
+            lines.append(f"{before['kind']} -> {after['kind']}")
+
+        old_columns = {column[0]: column for column in before['columns']}
+        new_columns = {column[0]: column for column in after['columns']}
+        for column in after['columns']:
+            if column[0] not in old_columns:
+                lines.append(f"+ column {column[0]} {column[1]}{' NOT NULL' if column[2] else ''}")
+        for column in before['columns']:
+            if column[0] not in new_columns:
+                lines.append(f"- column {column[0]} {column[1]}")
+        for name, column in new_columns.items():
+            previous = old_columns.get(name)
+            if previous is None:
+                continue
+            if previous[1] != column[1]:
+                lines.append(f"~ column {name}: type {previous[1]} -> {column[1]}")
+            if previous[2] != column[2]:
+                lines.append(f"~ column {name}: {'NOT NULL' if column[2] else 'nullable'}")
+            if previous[3] != column[3]:
+                lines.append(f"~ column {name}: default {previous[3] or 'none'} -> {column[3] or 'none'}")
+
+        old_indexes = {index[0]: index[1] for index in before['indexes']}
+        new_indexes = {index[0]: index[1] for index in after['indexes']}
+        for name in sorted(set(new_indexes) - set(old_indexes)):
+            lines.append(f"+ index {new_indexes[name]}")
+        for name in sorted(set(old_indexes) - set(new_indexes)):
+            lines.append(f"- index {name}")
+        for name in sorted(set(old_indexes) & set(new_indexes)):
+            if old_indexes[name] != new_indexes[name]:
+                lines.append(f"~ index {new_indexes[name]}")
+        if lines:
+            result['changed'][table] = lines
+
+        rows_before, rows_after = before['rows'] or 0, after['rows'] or 0
+        if max(rows_before, rows_after) >= ROW_CHANGE_MIN \
+                and max(rows_before, rows_after) >= ROW_CHANGE_FACTOR * max(min(rows_before, rows_after), 1):
+            result['rows'].append((table, before['rows'], after['rows']))
+    return result
+
+
+def _rows(value):
+    return f"{value:,}" if value is not None else "?"
+
+
+def _size(size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def print_summary(snapshot, path, limit):
+    tables = snapshot['tables']
+    print(f"Schema snapshot {path}")
+    print("=" * 80)
+    print(f"Taken:    {snapshot['taken_at']} (PostgreSQL {snapshot['server']})")
+    print(f"Tables:   {len(tables):,}")
+    print(f"Columns:  {sum(len(info['columns']) for info in tables.values()):,}")
+    print(f"Indexes:  {sum(len(info['indexes']) for info in tables.values()):,}")
+    print(f"\nLargest tables (estimated rows, top {limit})")
+    print("-" * 80)
+    print(f"{'Table':50s} | {'Rows':>12s} | {'Size':>10s}")
+    print("-" * 80)
+    largest = sorted(tables.items(), key=lambda item: item[1]['rows'] or 0, reverse=True)
+    for name, info in largest[:limit]:
+        print(f"{name[:50]:50s} | {_rows(info['rows']):>12s} | {_size(info['bytes']):>10s}")
+
+
+def print_search(snapshot, terms, limit):
+    tables, columns = search(snapshot, terms)
+    print(f"Tables matching {' '.join(terms)} ({len(tables):,})")
+    print("-" * 80)
+    for name, info in tables[:limit]:
+        print(f"  {name[:50]:50s} {_rows(info['rows']):>12s} rows  {len(info['columns']):4d} columns")
+    if len(tables) > limit:
+        print(f"  ... and {len(tables) - limit:,} more")
+    print(f"\nColumns matching {' '.join(terms)} ({len(columns):,})")
+    print("-" * 80)
+    for table, column, data_type in columns[:limit]:
+        print(f"  {f'{table}.{column}'[:60]:60s} {data_type}")
+    if len(columns) > limit:
+        print(f"  ... and {len(columns) - limit:,} more")
+
+
+def print_table(snapshot, name):
+    info = snapshot['tables'][name]
+    print(f"{name} ({info['kind']}, {_rows(info['rows'])} rows estimated, {_size(info['bytes'])})")
+    print("=" * 80)
+    print(f"Columns ({len(info['columns'])}):")
+    for column, data_type, not_null, default in info['columns']:
+        extra = (' NOT NULL' if not_null else '') + (f' DEFAULT {default}' if default else '')
+        print(f"  - {column:40s} {data_type}{extra}")
+    print(f"\nIndexes ({len(info['indexes'])}):")
+    for index, definition, primary, _ in info['indexes']:
+        print(f"  - {definition}{' (primary key)' if primary else ''}")
+
+
+def print_diff(changes, old, new):
+    print(f"Schema changes from {old['taken_at']} to {new['taken_at']}")
+    print("=" * 80)
+    if old['server'] != new['server']:
+        print(f"PostgreSQL {old['server']} -> {new['server']}\n")
+    for title, tables in [("New tables", changes['added']), ("Removed tables", changes['removed'])]:
+        print(f"{title} ({len(tables):,})")
+        for table in tables:
+            print(f"  {table}")
+        print()
+    print(f"Changed tables ({len(changes['changed']):,})")
+    for table, lines in changes['changed'].items():
+        print(f"  {table}")
+        for line in lines:
+            print(f"    {line}")
+    if changes['rows']:
+        print(f"\nRow estimates changed {ROW_CHANGE_FACTOR}x or more ({len(changes['rows']):,})")
+        for table, before, after in changes['rows']:
+            print(f"  {table[:50]:50s} {_rows(before):>12s} -> {_rows(after)}")
+
+
+def main(args):
+    """`patchmgr schema`: save, search or diff PMP schema snapshots"""
+    path = args.file or config.schema_snapshot_path()
+
+    if args.save:
+        try:
+            conn = db.connect_pmp()
+        except Exception as e:
+            print(f"ERROR: Failed to connect to PMP database: {e}")
+            return 1
+        try:
+            snapshot = take(conn)
+        finally:
+            conn.close()
+        size = save(snapshot, path)
+        tables = snapshot['tables']
+        print(f"Saved {len(tables):,} tables, {sum(len(info['columns']) for info in tables.values()):,} columns "
+              f"and {sum(len(info['indexes']) for info in tables.values()):,} indexes to {path} ({_size(size)})")
+        return 0
+
+    try:
+        snapshot = load(path)
+        old = load(args.diff) if args.diff else None
+    except (OSError, ValueError) as e:
+        print(f"ERROR: Could not read schema snapshot: {e}")
+        print("Take one with: patchmgr schema --save")
+        return 1
+
+    if old is not None:
+        print_diff(diff(old, snapshot), old, snapshot)
+    elif args.search:
+        print_search(snapshot, args.search, args.limit)
+    elif args.table:
+        name = find_table(snapshot, args.table)
+        if name is None:
+            print(f"ERROR: No table {args.table} in {path}")
+            return 1
+        print_table(snapshot, name)
+    else:
+        print_summary(snapshot, path, args.limit)
+    return 0
@@ -0,0 +1,413 @@
+"""
+What-if deployment simulator (`patchmgr simulate`)
+
+Loads every missing patch from the pmp_affectedpatchstatus mirror into a
+sparse system x patch matrix (SciPy CSR, one row per system in
+patch_compliance). A row counts as missing when its status is one of
+compliance_sql.MISSING_STATUSES:
+
+    Available, Missing   in the matrix
+    Ignore, Installed    left out (deploying them changes nothing)
+
+A candidate deployment is a set of patches and, optionally, the systems or
+collections it targets. A batch of k candidates is a sparse patch x k
+matrix, so
+
+    installed = (missing @ candidates), masked to each candidate's targets
+
+is one sparse product for the whole batch. Per-system compliance, missing
+criticals and the fleet totals then come from bincounts over the result's
+non-zeros. Thousands of candidates evaluate in a couple of seconds on a
+100k-system fleet. Nothing is written anywhere.
+
+Baselines (installed, total, missing criticals) come from patch_compliance,
+so run `patchmgr sync` and `patchmgr extract` first. The two are built from
+different PMP tables; STEP 1 reports how many systems' matrix rows disagree
+with patch_compliance, and results are capped at patch_compliance's counts.
+Needs numpy and scipy (pip install patchmgr[simulate]).
+"""
+
+import io
+import json
+import time
+
+from . import db, registry
+from .compliance_sql import missing_status
+
+CRITICAL = 4
+
+SYSTEMS_SQL = """
+    SELECT
+        resource_id, system_name, system_domain,
+        coalesce(installed_patches_total, 0),
+        coalesce(total_ms_patches + total_tp_patches + total_driver_patches + total_bios_patches, 0) AS total_patches,
+        coalesce(missing_patches_total, 0), missing_critical
+    FROM patch_compliance
+    ORDER BY resource_id;
+"""
+
+# Streamed with COPY and parsed by numpy: 10M rows as Python tuples would
+# cost more than the whole simulation
+MISSING_COPY_SQL = f"""
+    COPY (
+        SELECT a.resource_id, a.patch_id, COALESCE(pd.severityid, -1)
+        FROM pmp_affectedpatchstatus a
+        LEFT JOIN pmp_patchdetails pd ON pd.patchid = a.patch_id
+        WHERE {missing_status('a.status')}
+    ) TO STDOUT
+"""
+
+COLLECTIONS_SQL = "SELECT collection_id, collection_name FROM pmp_collection ORDER BY collection_id;"
+
+COLLECTION_SYSTEMS_SQL = """
+    SELECT collection_id, resource_id
+    FROM pmp_collntoresources
+    WHERE collection_id = ANY(%(collection_ids)s);
+"""
+
+COLLECTION_PATCHES_SQL = """
+    SELECT collection_id, patch_id
+    FROM pmp_collectiontopatch
+    WHERE collection_id = ANY(%(collection_ids)s);
+"""
+
+registry.register_all('simulate', {
+    'systems': SYSTEMS_SQL,
+    'collections': COLLECTIONS_SQL,
+    'collection_systems': COLLECTION_SYSTEMS_SQL,
+    'collection_patches': COLLECTION_PATCHES_SQL,
+})
+
+
+def load_missing(priv_conn):
+    """int64 array of (resource_id, patch_id, severity_id) of the missing rows in the pmp_affectedpatchstatus mirror"""
+    import numpy as np
+
+    cursor = priv_conn.cursor()
+    try:
+        buffer = io.BytesIO()
+        cursor.copy_expert(MISSING_COPY_SQL, buffer)
+    finally:
+        cursor.close()
+    return np.array(buffer.getvalue().split(), dtype=np.int64).reshape(-1, 3)
+
+
+class Candidate:
+    """A proposed deployment: patches, and the systems it targets (None = every system)"""
+
+    def __init__(self, name, patch_ids, resource_ids=None):
+        self.name = name
+        self.patch_ids = list(patch_ids)
+        self.resource_ids = None if resource_ids is None else list(resource_ids)
+
+
+class Simulator:
+    """Sparse missing-patch matrix plus per-system baselines"""
+
+    def __init__(self, systems, missing):
+        import numpy as np
+        from scipy import sparse
+
+        resource_ids, names, domains, installed, total, missing_total, critical = zip(*systems) if systems else ([],) * 7
+        self.resource_ids = np.array(resource_ids, dtype=np.int64)
+        self.names = list(names)
+        self.domains = list(domains)
+        self.installed = np.array(installed, dtype=np.float64)
+        self.total = np.array(total, dtype=np.float64)
+        self.missing = np.array(missing_total, dtype=np.float64)
+        self.critical = np.array(critical, dtype=np.float64)
+        # Systems with no applicable patches are 100% compliant, as in patch_compliance
+        self.baseline = np.where(self.total > 0, self.installed / np.maximum(self.total, 1) * 100, 100.0)
+
+        # missing: int64 array of (resource_id, patch_id, severity) rows
+        rows = np.searchsorted(self.resource_ids, missing[:, 0])
+        rows = np.minimum(rows, max(len(self.resource_ids) - 1, 0))
+        known = self.resource_ids[rows] == missing[:, 0] if len(self.resource_ids) else np.zeros(len(missing), bool)
+        self.patch_ids, columns = np.unique(missing[known, 1], return_inverse=True)
+        rows = rows[known]
+        ones = np.ones(len(rows), dtype=np.float32)
+        shape = (len(self.resource_ids), len(self.patch_ids))
+        self.matrix = sparse.csr_matrix((ones, (rows, columns)), shape=shape)
+        critical = missing[known, 2] == CRITICAL
+        self.critical_matrix = sparse.csr_matrix((ones[critical], (rows[critical], columns[critical])), shape=shape)
+
+    @classmethod
+    def load(cls, priv_conn):
+        cursor = priv_conn.cursor()
+        try:
+            systems = registry.fetchall(cursor, 'simulate.systems')
+        finally:
+            cursor.close()
+        return cls(systems, load_missing(priv_conn))
+
+    @property
+    def nnz(self):
+        return self.matrix.nnz
+
+    def baseline_mismatches(self):
+        """Systems whose matrix row disagrees with patch_compliance: (missing total, missing critical)"""
+        import numpy as np
+
+        missing = np.asarray(self.matrix.sum(axis=1)).ravel()
+        critical = np.asarray(self.critical_matrix.sum(axis=1)).ravel()
+        return int((missing != self.missing).sum()), int((critical != self.critical).sum())
+
+    def _rows(self, resource_ids):
+        """Row numbers of the given systems that are in the matrix"""
+        import numpy as np
+
+        ids = np.unique(np.asarray(resource_ids, dtype=np.int64))
+        if not len(ids) or not len(self.resource_ids):
+            return np.zeros(0, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.resource_ids, ids), len(self.resource_ids) - 1)
+        return rows[self.resource_ids[rows] == ids]
+
+    def evaluate(self, candidates):
+        """
+        Fleet-level effect of each candidate, all in one sparse product
+
+        Returns one dict per candidate: systems_patched, patches_installed,
+        criticals_closed, critical_systems_cleared, systems_reaching_95,
+        fleet_before/fleet_after (installed / total, %) and
+        average_before/average_after (mean per-system compliance, %).
+        """
+        import numpy as np
+        from scipy import sparse
+
+        k = len(candidates)
+        columns = {patch_id: n for n, patch_id in enumerate(self.patch_ids.tolist())}
+        x_rows, x_cols = [], []
+        for n, candidate in enumerate(candidates):
+            cols = {columns[p] for p in candidate.patch_ids if p in columns}
+            x_rows.extend(cols)
+            x_cols.extend([n] * len(cols))
+        chosen = sparse.csc_matrix((np.ones(len(x_rows), dtype=np.float32), (x_rows, x_cols)),
+                                   shape=(len(self.patch_ids), k))
+
+        targets = self._targets(candidates)
+        untargeted = np.array([c.resource_ids is None for c in candidates], dtype=bool)
+        rows, cols, installed = self._masked(self.matrix @ chosen, targets, untargeted)
+        closed_rows, closed_cols, closed = self._masked(self.critical_matrix @ chosen, targets, untargeted)
+
+        # The matrix and patch_compliance's counts come from different PMP tables
+        newly = np.minimum(installed, self.missing[rows])
+        total = np.maximum(self.total[rows], 1)
+        after = np.where(self.total[rows] > 0, (self.installed[rows] + newly) / total * 100, 100.0)
+        delta = after - self.baseline[rows]
+        critical_closed = np.minimum(closed, self.critical[closed_rows])
+        cleared = (self.critical[closed_rows] > 0) & (closed >= self.critical[closed_rows])
+        reaching = (self.baseline[rows] < 95) & (after >= 95)
+
+        systems = len(self.resource_ids) or 1
+        fleet_total = self.total.sum() or 1
+        fleet_before = self.installed.sum() / fleet_total * 100
+        average_before = self.baseline.mean() if len(self.baseline) else 100.0
+        counts = {
+            'systems_patched': np.bincount(cols, weights=(newly > 0), minlength=k),
+            'patches_installed': np.bincount(cols, weights=newly, minlength=k),
+            'criticals_closed': np.bincount(closed_cols, weights=critical_closed, minlength=k),
+            'critical_systems_cleared': np.bincount(closed_cols, weights=cleared, minlength=k),
+            'systems_reaching_95': np.bincount(cols, weights=reaching, minlength=k),
+            'average_delta': np.bincount(cols, weights=delta, minlength=k) / systems,
+        }
+        results = []
+        for n, candidate in enumerate(candidates):
+            results.append({
+                'name': candidate.name,
+                'systems_patched': int(counts['systems_patched'][n]),
+                'patches_installed': int(counts['patches_installed'][n]),
+                'criticals_closed': int(counts['criticals_closed'][n]),
+                'critical_systems_cleared': int(counts['critical_systems_cleared'][n]),
+                'systems_reaching_95': int(counts['systems_reaching_95'][n]),
+                'fleet_before': fleet_before,
+                'fleet_after': fleet_before + counts['patches_installed'][n] / fleet_total * 100,
+                'average_before': average_before,
+                'average_after': average_before + counts['average_delta'][n],
+            })
+        return results
+
+    def _targets(self, candidates):
+        """Sparse systems x candidates mask of each targeted candidate's systems"""
+        import numpy as np
+        from scipy import sparse
+
+        targeted = [(n, c.resource_ids) for n, c in enumerate(candidates) if c.resource_ids is not None]
+        ids = np.concatenate([np.zeros(0, dtype=np.int64)] + [np.asarray(t, dtype=np.int64) for _, t in targeted])
+        cols = np.repeat([n for n, _ in targeted], [len(t) for _, t in targeted]).astype(np.int64)
+        rows = np.minimum(np.searchsorted(self.resource_ids, ids), max(len(self.resource_ids) - 1, 0))
+        known = self.resource_ids[rows] == ids if len(self.resource_ids) else np.zeros(len(ids), dtype=bool)
+        mask = sparse.csr_matrix((np.ones(known.sum(), dtype=np.float32), (rows[known], cols[known])),
+                                 shape=(len(self.resource_ids), len(candidates)))
+        # A system listed twice (in two collections) is still deployed to once
+        mask.sum_duplicates()
+        mask.data[:] = 1
+        return mask
+
+    @staticmethod
+    def _masked(product, targets, untargeted):
+        """(rows, candidates, values) of a systems x candidates product, keeping each candidate's targets"""
+        from scipy import sparse
+
+        product = product.tocsr()
+        if not untargeted.all():
+            product = product.multiply(targets) + product @ sparse.diags(untargeted.astype('float32'))
+        product = sparse.coo_matrix(product)
+        product.eliminate_zeros()
+        return product.row, product.col, product.data
+
+    def per_system(self, candidate):
+        """[(resource_id, name, domain, before %, after %, installed, criticals closed)] for systems it changes"""
+        import numpy as np
+
+        rows = np.arange(len(self.resource_ids)) if candidate.resource_ids is None else self._rows(candidate.resource_ids)
+        columns = np.flatnonzero(np.isin(self.patch_ids, candidate.patch_ids))
+        installed = np.asarray(self.matrix[rows][:, columns].sum(axis=1)).ravel()
+        closed = np.asarray(self.critical_matrix[rows][:, columns].sum(axis=1)).ravel()
+        installed = np.minimum(installed, self.missing[rows])
+        closed = np.minimum(closed, self.critical[rows])
+        after = np.where(self.total[rows] > 0,
+                         (self.installed[rows] + installed) / np.maximum(self.total[rows], 1) * 100, 100.0)
+        changed = np.flatnonzero(installed > 0)
+        order = changed[np.argsort(-(after - self.baseline[rows])[changed], kind='stable')]
+        return [
+            (int(self.resource_ids[rows[i]]), self.names[rows[i]], self.domains[rows[i]],
+             float(self.baseline[rows[i]]), float(after[i]), int(installed[i]), int(closed[i]))
+            for i in order
+        ]
+
+
+def _ids(text):
+    return [int(value) for value in str(text).replace(',', ' ').split()]
+
+
+def collection_targets(priv_conn, collection_ids):
+    """({collection_id: [resource_id]}, {collection_id: [patch_id]}) from the pmp_* mirrors"""
+    systems, patches = {}, {}
+    cursor = priv_conn.cursor()
+    try:
+        for collection_id, resource_id in registry.fetchall(
+                cursor, 'simulate.collection_systems', {'collection_ids': list(collection_ids)}):
+            systems.setdefault(collection_id, []).append(resource_id)
+        for collection_id, patch_id in registry.fetchall(
+                cursor, 'simulate.collection_patches', {'collection_ids': list(collection_ids)}):
+            patches.setdefault(collection_id, []).append(patch_id)
+    finally:
+        cursor.close()
+    return systems, patches
+
+
+def build_candidates(priv_conn, args):
+    """Candidates from the command line: one proposed deployment, each collection, or a JSON file"""
+    if args.each_collection:
+        cursor = priv_conn.cursor()
+        try:
+            collections = registry.fetchall(cursor, 'simulate.collections')
+        finally:
+            cursor.close()
+        systems, patches = collection_targets(priv_conn, [c[0] for c in collections])
+        return [Candidate(f"{collection_id} {name}", patches.get(collection_id, []), systems.get(collection_id, []))
+                for collection_id, name in collections]
+
+    if args.candidates:
+        # [{"name": ..., "patches": [...], "collections": [...], "systems": [...]}]
+        with open(args.candidates, encoding='utf-8') as f:
+            specs = json.load(f)
+        wanted = {c for spec in specs for c in spec.get('collections', [])}
+        systems, _ = collection_targets(priv_conn, wanted) if wanted else ({}, {})
+        candidates = []
+        for n, spec in enumerate(specs, 1):
+            targets = None
+            if spec.get('collections') or spec.get('systems'):
+                targets = list(spec.get('systems', []))
+                for collection_id in spec.get('collections', []):
+                    targets.extend(systems.get(collection_id, []))
+            candidates.append(Candidate(spec.get('name', f"candidate {n}"), spec.get('patches', []), targets))
+        return candidates
+
+    patch_ids = _ids(' '.join(args.patches or []))
+    targets = None
+    if args.collections:
+        collection_ids = _ids(' '.join(args.collections))
+        systems, patches = collection_targets(priv_conn, collection_ids)
+        targets = [resource_id for c in collection_ids for resource_id in systems.get(c, [])]
+        if not patch_ids:
+            # No patches given: deploy what the collections contain
+            patch_ids = [patch_id for c in collection_ids for patch_id in patches.get(c, [])]
+    if args.systems:
+        targets = (targets or []) + _ids(' '.join(args.systems))
+    return [Candidate('proposed deployment', patch_ids, targets)]
+
+
+def print_results(results, limit):
+    print(f"{'Candidate':34s} | {'Systems':>8s} | {'Patches':>9s} | {'Crit closed':>11s} | "
+          f"{'Crit cleared':>12s} | {'Now >=95%':>9s} | {'Fleet %':>15s} | {'Avg system %':>15s}")
+    print("-" * 134)
+    for r in results[:limit]:
+        print(f"{r['name'][:34]:34s} | {r['systems_patched']:8,d} | {r['patches_installed']:9,d} | "
+              f"{r['criticals_closed']:11,d} | {r['critical_systems_cleared']:12,d} | {r['systems_reaching_95']:9,d} | "
+              f"{r['fleet_before']:6.2f} -> {r['fleet_after']:6.2f} | {r['average_before']:6.2f} -> {r['average_after']:6.2f}")
+
+
+def main(args):
+    """`patchmgr simulate`: fleet compliance if a deployment were approved"""
+    try:
+        import numpy  # noqa: F401
+        import scipy  # noqa: F401
+    except ImportError:
+        print("ERROR: The simulator needs numpy and scipy: pip install patchmgr[simulate]")
+        return 1
+    if not (args.patches or args.collections or args.each_collection or args.candidates):
+        print("ERROR: Give --patches and/or --collections, --each-collection or --candidates FILE")
+        return 1
+
+    print("DEPLOYMENT WHAT-IF SIMULATION")
+    print("=" * 80)
+    conn = db.connect_private()
+    try:
+        print("STEP 1: Loading missing patches into the system x patch matrix...")
+        start = time.perf_counter()
+        try:
+            simulator = Simulator.load(conn)
+        except Exception as e:
+            print(f"  ERROR: Failed to load the matrix: {e}")
+            print("Run patchmgr sync and patchmgr extract first.")
+            return 1
+        print(f"  {len(simulator.resource_ids):,} systems x {len(simulator.patch_ids):,} patches, "
+              f"{simulator.nnz:,} missing in {time.perf_counter() - start:.1f}s")
+        missing, critical = simulator.baseline_mismatches()
+        if missing or critical:
+            print(f"  WARNING: Matrix rows differ from patch_compliance for {missing:,} systems (missing total), "
+                  f"{critical:,} (missing critical)")
+            print("  Results are capped at patch_compliance; run patchmgr extract right after patchmgr sync.")
+        else:
+            print("  Matrix matches patch_compliance's missing totals and criticals")
+
+        print("STEP 2: Building candidates...")
+        try:
+            candidates = build_candidates(conn, args)
+        except Exception as e:
+            print(f"  ERROR: Failed to read the candidates: {e}")
+            return 1
+        print(f"  {len(candidates):,} candidate deployments")
+
+        print("STEP 3: Simulating...")
+        start = time.perf_counter()
+        results = simulator.evaluate(candidates)
+        print(f"  Evaluated in {(time.perf_counter() - start) * 1000:.1f} ms\n")
+        if len(results) > 1:
+            results.sort(key=lambda r: (-r['critical_systems_cleared'], -r['criticals_closed'], -r['patches_installed']))
+            print(f"Candidates by critical systems cleared (top {args.limit})")
+        print_results(results, args.limit)
+
+        if len(candidates) == 1:
+            changes = simulator.per_system(candidates[0])
+            print(f"\nSystems with the largest compliance gain ({len(changes):,} would change)")
+            print("-" * 100)
+            print(f"{'System':36s} | {'Domain':15s} | {'Before':>7s} | {'After':>7s} | {'Installed':>9s} | {'Crit closed':>11s}")
+            print("-" * 100)
+            for resource_id, name, domain, before, after, installed, closed in changes[:args.limit]:
+                print(f"{(name or f'(ID: {resource_id})')[:36]:36s} | {(domain or 'N/A')[:15]:15s} | "
+                      f"{before:6.2f}% | {after:6.2f}% | {installed:9,d} | {closed:11,d}")
+    finally:
+        conn.close()
+    return 0
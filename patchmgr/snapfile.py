@@ -0,0 +1,323 @@
+"""
+Memory-mapped columnar snapshot of patch_compliance (`patchmgr snapshot-file`)
+
+After loading, the sync writes patch_compliance to one binary file
+(PATCHMGR_SNAPSHOT_FILE, default patch-compliance.snap; 'off' disables it)
+so analysis tools can open the whole fleet without a query:
+
+    from patchmgr.snapfile import SnapshotFile
+    snap = SnapshotFile('patch-compliance.snap')
+    critical = snap['missing_critical'] > 0                 # numpy bool array
+    domains = ['N/A'] + snap.strings('system_domain')       # string table
+    # codes are -1 for NULL, so shift them to count those systems too
+    per_domain = numpy.bincount(snap['system_domain'] + 1, weights=critical)
+
+Layout (little-endian, every section 64-byte aligned):
+
+- header (64 bytes): magic, format version, schema version, snapshot id
+  (snapshot_date in epoch microseconds), write time, row count, section count
+- directory: one 64-byte entry per section (name, numpy dtype, offset, size)
+- sections: one array per column, rows in resource_id order. Counts are
+  int32 (NULL = -1, except the patch counts, which are 0 as in `patchmgr
+  serve`), the compliance percentage float64 (NULL = NaN), timestamps
+  datetime64[s] (NULL = NaT). String columns are dictionary encoded: NAME
+  holds int32 codes (NULL = -1) into a string table stored as NAME.offsets
+  (uint64) and NAME.data (UTF-8 bytes).
+
+Opening the file maps it read-only and parses only the header and
+directory. Columns are views into the mapping, so opening takes the same time
+for 300 systems or 300,000, nothing is copied until it is used, and
+processes reading the same file share its pages. The sync replaces the file
+atomically, so readers keep the snapshot they opened.
+
+Writing needs only the standard library; reading needs numpy
+(pip install patchmgr[simulate]).
+"""
+
+import os
+import struct
+import sys
+import time
+from array import array
+from datetime import datetime, timezone
+
+from . import config, db, registry
+
+MAGIC = b'PMSNAP\x00\x01'
+FORMAT_VERSION = 1
+# Bump when COLUMNS changes
+SCHEMA_VERSION = 1
+
+HEADER = struct.Struct('<8sIIqqQI20x')
+ENTRY = struct.Struct('<40s8sQQ')
+ALIGN = 64
+
+# Column -> kind, in file order
+COLUMNS = [
+    ('resource_id', 'int64'),
+    ('system_name', 'string'),
+    ('system_domain', 'string'),
+    ('fqdn_name', 'string'),
+    ('agent_version', 'string'),
+    ('resource_type', 'int32'),
+    ('managed_status', 'int32'),
+    ('agent_status', 'int32'),
+    ('last_contact', 'timestamp'),
+    ('last_patch_date', 'timestamp'),
+    ('system_added_date', 'timestamp'),
+    ('patch_compliance_pct', 'float64'),
+    ('missing_patches_total', 'int32'),
+    ('installed_patches_total', 'int32'),
+    ('missing_ms_patches', 'int32'),
+    ('missing_tp_patches', 'int32'),
+    ('missing_driver_patches', 'int32'),
+    ('missing_bios_patches', 'int32'),
+    ('missing_critical', 'int32'),
+    ('missing_important', 'int32'),
+    ('missing_moderate', 'int32'),
+    ('missing_low', 'int32'),
+    ('missing_unrated', 'int32'),
+]
+
+INT32_NULL = -1
+
+# NULL for systems PMP has no patch count row for; written as 0 like
+# api.SNAPSHOT_SQL so the columns add up
+PATCH_COUNTS = {'missing_patches_total', 'installed_patches_total', 'missing_ms_patches',
+                'missing_tp_patches', 'missing_driver_patches', 'missing_bios_patches'}
+
+# kind -> (array typecode, numpy dtype, NULL value)
+KINDS = {
+    'int64': ('q', '<i8', -1),
+    'int32': ('i', '<i4', INT32_NULL),
+    'float64': ('d', '<f8', float('nan')),
+    'timestamp': ('q', '<M8[s]', -2 ** 63),
+}
+
+# Timestamps arrive as epoch seconds so the rows need no datetime objects
+SNAPSHOT_SQL = "SELECT\n    " + ",\n    ".join(
+    f"extract(epoch FROM {name})::bigint" if kind == 'timestamp'
+    else f"{name}::float8" if kind == 'float64'
+    else f"coalesce({name}, 0)" if name in PATCH_COUNTS
+    else name
+    for name, kind in COLUMNS
+) + ",\n    extract(epoch FROM snapshot_date)::float8\nFROM patch_compliance\nORDER BY resource_id;"
+
+registry.register_all('snapfile', {'snapshot': SNAPSHOT_SQL})
+
+
+def _align(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def _packed(typecode, values):
+    """Little-endian bytes of values as a stdlib array"""
+    data = array(typecode, values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _string_sections(name, values):
+    """(codes, offsets, data) sections of a dictionary-encoded string column"""
+    table = {}
+    codes = []
+    for value in values:
+        if value is None:
+            codes.append(INT32_NULL)
+        else:
+            codes.append(table.setdefault(value, len(table)))
+    blob = bytearray()
+    offsets = [0]
+    for value in table:
+        blob += value.encode('utf-8')
+        offsets.append(len(blob))
+    return [
+        (name, '<i4', _packed('i', codes)),
+        (f"{name}.offsets", '<u8', _packed('Q', offsets)),
+        (f"{name}.data", '|u1', bytes(blob)),
+    ]
+
+
+def encode(rows, snapshot_id):
+    """
+    The file contents for rows in SNAPSHOT_SQL column order
+
+    snapshot_id identifies the snapshot (the sync uses snapshot_date in
+    epoch microseconds). Returns bytes.
+    """
+    columns = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+    sections = []
+    for (name, kind), values in zip(COLUMNS, columns):
+        if kind == 'string':
+            sections.extend(_string_sections(name, values))
+            continue
+        typecode, dtype, null = KINDS[kind]
+        sections.append((name, dtype, _packed(typecode, [null if v is None else v for v in values])))
+
+    offset = _align(HEADER.size + ENTRY.size * len(sections))
+    directory = []
+    for name, dtype, data in sections:
+        directory.append(ENTRY.pack(name.encode(), dtype.encode(), offset, len(data)))
+        offset = _align(offset + len(data))
+
+    out = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, SCHEMA_VERSION, snapshot_id,
+                                int(time.time() * 1_000_000), len(rows), len(sections)))
+    out += b''.join(directory)
+    for (_, _, data), entry in zip(sections, directory):
+        out += b'\x00' * (ENTRY.unpack(entry)[2] - len(out))
+        out += data
+    return bytes(out)
+
+
+def write(priv_conn, path):
+    """
+    Write patch_compliance to path, replacing any previous file atomically
+
+    Returns (rows, bytes written).
+    """
+    cursor = priv_conn.cursor()
+    try:
+        rows = registry.fetchall(cursor, 'snapfile.snapshot')
+    finally:
+        cursor.close()
+    taken = max((row[-1] for row in rows if row[-1] is not None), default=0)
+    data = encode([row[:-1] for row in rows], int(taken * 1_000_000))
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return len(rows), len(data)
+
+
+class SnapshotFile:
+    """A snapshot file mapped read-only; snap[column] is a numpy view"""
+
+    def __init__(self, path):
+        import numpy as np
+
+        self.path = path
+        self._map = np.memmap(path, dtype=np.uint8, mode='r')
+        if len(self._map) < HEADER.size:
+            raise ValueError(f"{path}: not a patchmgr snapshot file")
+        magic, fmt, schema, snapshot_id, written, rows, count = HEADER.unpack(bytes(self._map[:HEADER.size]))
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a patchmgr snapshot file")
+        if fmt != FORMAT_VERSION:
+            raise ValueError(f"{path}: format version {fmt}, this patchmgr reads {FORMAT_VERSION}")
+        self.schema_version = schema
+        self.snapshot_id = snapshot_id
+        self.rows = rows
+        # patch_compliance timestamps have no time zone; like the datetime64
+        # columns, snapshot_date is the same wall-clock time as in the table
+        self.snapshot_date = (datetime.fromtimestamp(snapshot_id / 1_000_000, timezone.utc).replace(tzinfo=None)
+                              if snapshot_id else None)
+        self.written_at = datetime.fromtimestamp(written / 1_000_000)
+
+        self.sections = {}
+        directory = bytes(self._map[HEADER.size:HEADER.size + ENTRY.size * count])
+        for n in range(count):
+            name, dtype, offset, size = ENTRY.unpack_from(directory, n * ENTRY.size)
+            self.sections[name.rstrip(b'\x00').decode()] = (np.dtype(dtype.rstrip(b'\x00').decode()), offset, size)
+        self._strings = {}
+
+    def columns(self):
+        """Column names, without the string table sections"""
+        return [name for name in self.sections if '.' not in name]
+
+    def __getitem__(self, name):
+        """Zero-copy view of a column (codes for string columns)"""
+        try:
+            dtype, offset, size = self.sections[name]
+        except KeyError:
+            raise KeyError(f"no column {name!r} in {self.path}") from None
+        return self._map[offset:offset + size].view(dtype)
+
+    def strings(self, name):
+        """The string table of a string column; snap[name] holds indexes into it"""
+        if name not in self._strings:
+            offsets = self[f"{name}.offsets"].tolist()
+            data = bytes(self[f"{name}.data"])
+            self._strings[name] = [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+        return self._strings[name]
+
+    def values(self, name, rows=None):
+        """Decoded strings of a string column (None for NULL), for all rows or the given row indexes"""
+        table = self.strings(name)
+        codes = self[name] if rows is None else self[name][rows]
+        return [table[code] if code >= 0 else None for code in codes.tolist()]
+
+    def row(self, resource_id):
+        """Row index of a resource_id, or None"""
+        import numpy as np
+
+        ids = self['resource_id']
+        n = int(np.searchsorted(ids, resource_id))
+        return n if n < len(ids) and ids[n] == resource_id else None
+
+
+def main(args):
+    """`patchmgr snapshot-file`: write or inspect the binary snapshot"""
+    path = args.file or config.snapshot_file_path()
+    if path is None:
+        print("ERROR: The snapshot file is disabled (PATCHMGR_SNAPSHOT_FILE=off); pass --file")
+        return 1
+
+    if args.write:
+        try:
+            conn = db.connect_private()
+            try:
+                rows, size = write(conn, path)
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"ERROR: Failed to write {path}: {e}")
+            print("Run patchmgr sync first to create patch_compliance.")
+            return 1
+        print(f"Wrote {rows:,} systems to {path} ({size / 1024:,.1f} KB)")
+
+    try:
+        import numpy as np
+    except ImportError:
+        print("ERROR: Reading the snapshot file needs numpy: pip install patchmgr[simulate]")
+        return 1
+    start = time.perf_counter()
+    try:
+        snap = SnapshotFile(path)
+    except FileNotFoundError:
+        print(f"No snapshot file at {path}; run patchmgr sync or patchmgr snapshot-file --write")
+        return 1
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+    opened = (time.perf_counter() - start) * 1000
+
+    print("PATCH COMPLIANCE SNAPSHOT FILE")
+    print("=" * 80)
+    print(f"File:           {path} ({os.path.getsize(path) / 1024:,.1f} KB)")
+    print(f"Snapshot:       {snap.snapshot_date:%Y-%m-%d %H:%M:%S} (id {snap.snapshot_id})"
+          if snap.snapshot_date else "Snapshot:       (empty)")
+    print(f"Written:        {snap.written_at:%Y-%m-%d %H:%M:%S}")
+    print(f"Schema version: {snap.schema_version}")
+    print(f"Systems:        {snap.rows:,}")
+    print(f"Opened in:      {opened:.2f} ms")
+
+    print(f"\n{'Section':32s} | {'Type':14s} | {'Bytes':>12s}")
+    print("-" * 62)
+    for name, (dtype, _, size) in snap.sections.items():
+        print(f"{name:32s} | {str(dtype):14s} | {size:12,d}")
+
+    if snap.rows:
+        start = time.perf_counter()
+        critical = snap['missing_critical'] > 0
+        domains = snap['system_domain']
+        systems = np.bincount(domains + 1, minlength=len(snap.strings('system_domain')) + 1)
+        with_critical = np.bincount(domains + 1, weights=critical, minlength=len(systems))
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"\nSystems with critical patches missing, by domain ({elapsed:.2f} ms from the mapped columns)")
+        print("-" * 62)
+        names = ['N/A'] + snap.strings('system_domain')
+        for n in np.argsort(-with_critical, kind='stable')[:args.limit]:
+            if systems[n]:
+                print(f"{names[n][:40]:40s} | {int(with_critical[n]):8,d} of {int(systems[n]):8,d}")
+    return 0
@@ -0,0 +1,314 @@
+"""
+Star-schema reporting model in the private database
+
+Built by the sync after patch_compliance is loaded, for BI tools:
+
+- dim_date:   one row per day, date_key = YYYYMMDD
+- dim_system: one row per resource_id, integer surrogate system_key
+- dim_patch:  one row per patchid from pmp_patchdetails + pmp_pmseverity
+- fact_system_patch_counts: per-system counts, one row per system per sync day
+- fact_system_patch_status: current per-system-per-patch status from
+  pmp_affectedpatchstatus, with the day it last changed
+
+Dimensions and the status fact are upserted and only rewrite rows that
+changed, so BI tools can refresh incrementally on the date keys. The patch
+dimension and status fact need `patchmgr extract` to have run; until then
+they are left empty.
+"""
+
+from datetime import date
+
+CREATE_STAR_SQL = """
+CREATE TABLE IF NOT EXISTS dim_date (
+    date_key INTEGER PRIMARY KEY,
+    full_date DATE NOT NULL UNIQUE,
+    year SMALLINT NOT NULL,
+    quarter SMALLINT NOT NULL,
+    month SMALLINT NOT NULL,
+    month_name VARCHAR(10) NOT NULL,
+    day SMALLINT NOT NULL,
+    day_of_week SMALLINT NOT NULL,
+    day_name VARCHAR(10) NOT NULL,
+    iso_week SMALLINT NOT NULL,
+    is_weekend BOOLEAN NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS dim_system (
+    system_key SERIAL PRIMARY KEY,
+    resource_id BIGINT NOT NULL UNIQUE,
+    system_name VARCHAR(255),
+    system_domain VARCHAR(100),
+    resource_type INTEGER,
+    fqdn_name VARCHAR(500),
+    friendly_name VARCHAR(255),
+    agent_version VARCHAR(50),
+    added_date_key INTEGER,
+    first_seen_date_key INTEGER NOT NULL,
+    last_seen_date_key INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS dim_patch (
+    patch_key SERIAL PRIMARY KEY,
+    patchid BIGINT NOT NULL UNIQUE,
+    bulletinid VARCHAR(100),
+    kb_number VARCHAR(20),
+    description TEXT,
+    severity_id INTEGER,
+    severity VARCHAR(100),
+    release_date_key INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS fact_system_patch_counts (
+    date_key INTEGER NOT NULL,
+    system_key INTEGER NOT NULL,
+    last_contact_date_key INTEGER,
+    missing_ms_patches INTEGER,
+    installed_ms_patches INTEGER,
+    missing_tp_patches INTEGER,
+    installed_tp_patches INTEGER,
+    missing_driver_patches INTEGER,
+    installed_driver_patches INTEGER,
+    missing_bios_patches INTEGER,
+    installed_bios_patches INTEGER,
+    missing_critical INTEGER,
+    missing_important INTEGER,
+    missing_moderate INTEGER,
+    missing_low INTEGER,
+    missing_unrated INTEGER,
+    missing_patches_total INTEGER,
+    installed_patches_total INTEGER,
+    patch_compliance_pct DECIMAL(5,2),
+    PRIMARY KEY (date_key, system_key)
+);
+
+CREATE TABLE IF NOT EXISTS fact_system_patch_status (
+    system_key INTEGER NOT NULL,
+    patch_key INTEGER NOT NULL,
+    status_id INTEGER,
+    status VARCHAR(100),
+    changed_date_key INTEGER NOT NULL,
+    PRIMARY KEY (system_key, patch_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_dim_system_domain ON dim_system(system_domain);
+CREATE INDEX IF NOT EXISTS idx_dim_patch_severity ON dim_patch(severity_id);
+CREATE INDEX IF NOT EXISTS idx_dim_patch_release_date ON dim_patch(release_date_key);
+CREATE INDEX IF NOT EXISTS idx_fact_counts_system ON fact_system_patch_counts(system_key, date_key);
+CREATE INDEX IF NOT EXISTS idx_fact_status_patch ON fact_system_patch_status(patch_key, status_id) INCLUDE (system_key);
+CREATE INDEX IF NOT EXISTS idx_fact_status_changed ON fact_system_patch_status(changed_date_key);
+
+COMMENT ON TABLE dim_date IS 'Calendar dimension, date_key = YYYYMMDD';
+COMMENT ON TABLE dim_system IS 'System dimension, surrogate system_key per resource_id';
+COMMENT ON TABLE dim_patch IS 'Patch dimension from patchdetails and pmseverity';
+COMMENT ON TABLE fact_system_patch_counts IS 'Per-system patch counts, one row per system per sync day';
+COMMENT ON TABLE fact_system_patch_status IS 'Current status per system and patch; changed_date_key is when it last changed';
+"""
+
+# Every day from start through end (inclusive) that is not already present
+FILL_DATES_SQL = """
+INSERT INTO dim_date
+SELECT
+    to_char(d, 'YYYYMMDD')::INTEGER,
+    d::DATE,
+    EXTRACT(YEAR FROM d),
+    EXTRACT(QUARTER FROM d),
+    EXTRACT(MONTH FROM d),
+    trim(to_char(d, 'Month')),
+    EXTRACT(DAY FROM d),
+    EXTRACT(ISODOW FROM d),
+    trim(to_char(d, 'Day')),
+    EXTRACT(WEEK FROM d),
+    EXTRACT(ISODOW FROM d) IN (6, 7)
+FROM generate_series(%(start)s::DATE, %(end)s::DATE, INTERVAL '1 day') d
+ON CONFLICT (date_key) DO NOTHING;
+"""
+
+DATE_RANGE_SQL = """
+SELECT LEAST(MIN(system_added_date), MIN(last_contact), MIN(snapshot_date))::DATE,
+       MAX(snapshot_date)::DATE
+FROM patch_compliance;
+"""
+
+PATCH_DATE_RANGE_SQL = """
+SELECT MIN(to_timestamp(releasedtime/1000))::DATE
+FROM pmp_patchdetails
+WHERE releasedtime > 0;
+"""
+
+UPSERT_SYSTEMS_SQL = """
+INSERT INTO dim_system (
+    resource_id, system_name, system_domain, resource_type, fqdn_name, friendly_name,
+    agent_version, added_date_key, first_seen_date_key, last_seen_date_key
+)
+SELECT
+    resource_id, system_name, system_domain, resource_type, fqdn_name, friendly_name,
+    agent_version, to_char(system_added_date, 'YYYYMMDD')::INTEGER, %(date_key)s, %(date_key)s
+FROM patch_compliance
+ON CONFLICT (resource_id) DO UPDATE SET
+    system_name = EXCLUDED.system_name,
+    system_domain = EXCLUDED.system_domain,
+    resource_type = EXCLUDED.resource_type,
+    fqdn_name = EXCLUDED.fqdn_name,
+    friendly_name = EXCLUDED.friendly_name,
+    agent_version = EXCLUDED.agent_version,
+    added_date_key = EXCLUDED.added_date_key
+WHERE (dim_system.system_name, dim_system.system_domain, dim_system.resource_type,
+       dim_system.fqdn_name, dim_system.friendly_name, dim_system.agent_version,
+       dim_system.added_date_key)
+    IS DISTINCT FROM
+      (EXCLUDED.system_name, EXCLUDED.system_domain, EXCLUDED.resource_type,
+       EXCLUDED.fqdn_name, EXCLUDED.friendly_name, EXCLUDED.agent_version,
+       EXCLUDED.added_date_key);
+"""
+
+# last_seen_date_key moves every day; kept out of the upsert above so that
+# only systems whose attributes changed get the full-row update
+TOUCH_SYSTEMS_SQL = """
+UPDATE dim_system s
+SET last_seen_date_key = %(date_key)s
+FROM patch_compliance pc
+WHERE pc.resource_id = s.resource_id
+AND s.last_seen_date_key < %(date_key)s;
+"""
+
+# Re-running the sync on the same day replaces that day's snapshot
+DELETE_COUNTS_SQL = """
+DELETE FROM fact_system_patch_counts WHERE date_key = %(date_key)s;
+"""
+
+INSERT_COUNTS_SQL = """
+INSERT INTO fact_system_patch_counts
+SELECT
+    %(date_key)s,
+    s.system_key,
+    to_char(pc.last_contact, 'YYYYMMDD')::INTEGER,
+    pc.missing_ms_patches, pc.installed_ms_patches,
+    pc.missing_tp_patches, pc.installed_tp_patches,
+    pc.missing_driver_patches, pc.installed_driver_patches,
+    pc.missing_bios_patches, pc.installed_bios_patches,
+    pc.missing_critical, pc.missing_important, pc.missing_moderate,
+    pc.missing_low, pc.missing_unrated,
+    pc.missing_patches_total, pc.installed_patches_total, pc.patch_compliance_pct
+FROM patch_compliance pc
+JOIN dim_system s ON s.resource_id = pc.resource_id;
+"""
+
+UPSERT_PATCHES_SQL = """
+INSERT INTO dim_patch (patchid, bulletinid, kb_number, description, severity_id, severity, release_date_key)
+SELECT
+    pd.patchid,
+    pd.bulletinid,
+    upper(substring(pd.description FROM '(?i)KB[0-9]{6,8}')),
+    pd.description,
+    pd.severityid,
+    s.name,
+    CASE WHEN pd.releasedtime > 0
+         THEN to_char(to_timestamp(pd.releasedtime/1000), 'YYYYMMDD')::INTEGER END
+FROM pmp_patchdetails pd
+LEFT JOIN pmp_pmseverity s ON s.severityid = pd.severityid
+ON CONFLICT (patchid) DO UPDATE SET
+    bulletinid = EXCLUDED.bulletinid,
+    kb_number = EXCLUDED.kb_number,
+    description = EXCLUDED.description,
+    severity_id = EXCLUDED.severity_id,
+    severity = EXCLUDED.severity,
+    release_date_key = EXCLUDED.release_date_key
+WHERE (dim_patch.bulletinid, dim_patch.description, dim_patch.severity_id,
+       dim_patch.severity, dim_patch.release_date_key)
+    IS DISTINCT FROM
+      (EXCLUDED.bulletinid, EXCLUDED.description, EXCLUDED.severity_id,
+       EXCLUDED.severity, EXCLUDED.release_date_key);
+"""
+
+UPSERT_STATUS_SQL = """
+INSERT INTO fact_system_patch_status (system_key, patch_key, status_id, status, changed_date_key)
+SELECT s.system_key, p.patch_key, a.status_id, a.status, %(date_key)s
+FROM pmp_affectedpatchstatus a
+JOIN dim_system s ON s.resource_id = a.resource_id
+JOIN dim_patch p ON p.patchid = a.patch_id
+ON CONFLICT (system_key, patch_key) DO UPDATE SET
+    status_id = EXCLUDED.status_id,
+    status = EXCLUDED.status,
+    changed_date_key = EXCLUDED.changed_date_key
+WHERE (fact_system_patch_status.status_id, fact_system_patch_status.status)
+    IS DISTINCT FROM (EXCLUDED.status_id, EXCLUDED.status);
+"""
+
+DELETE_STATUS_SQL = """
+DELETE FROM fact_system_patch_status f
+USING dim_system s, dim_patch p
+WHERE s.system_key = f.system_key
+AND p.patch_key = f.patch_key
+AND NOT EXISTS (
+    SELECT 1 FROM pmp_affectedpatchstatus a
+    WHERE a.resource_id = s.resource_id AND a.patch_id = p.patchid
+);
+"""
+
+STAR_TABLES = ['dim_date', 'dim_system', 'dim_patch', 'fact_system_patch_counts', 'fact_system_patch_status']
+
+
+def _date_key(day):
+    return int(day.strftime('%Y%m%d'))
+
+
+def _exists(cursor, table):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL;", (table,))
+    return cursor.fetchone()[0]
+
+
+def build_star_schema(priv_conn):
+    """
+    Refresh the dimensions and facts from patch_compliance and the pmp_* mirrors
+
+    Returns a dict of rows written per table. Runs in one transaction, then
+    ANALYZEs the star tables.
+    """
+    stats = dict.fromkeys(STAR_TABLES, 0)
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute(CREATE_STAR_SQL)
+
+        cursor.execute(DATE_RANGE_SQL)
+        start, end = cursor.fetchone()
+        end = end or date.today()
+        starts = [start]
+        has_patches = _exists(cursor, 'pmp_patchdetails') and _exists(cursor, 'pmp_pmseverity')
+        if has_patches:
+            cursor.execute(PATCH_DATE_RANGE_SQL)
+            starts.append(cursor.fetchone()[0])
+        starts = [day for day in starts if day]
+        params = {'start': min(starts) if starts else end, 'end': end, 'date_key': _date_key(end)}
+
+        cursor.execute(FILL_DATES_SQL, params)
+        stats['dim_date'] = cursor.rowcount
+        cursor.execute(UPSERT_SYSTEMS_SQL, params)
+        stats['dim_system'] = cursor.rowcount
+        cursor.execute(TOUCH_SYSTEMS_SQL, params)
+        cursor.execute(DELETE_COUNTS_SQL, params)
+        cursor.execute(INSERT_COUNTS_SQL, params)
+        stats['fact_system_patch_counts'] = cursor.rowcount
+
+        if has_patches:
+            cursor.execute(UPSERT_PATCHES_SQL)
+            stats['dim_patch'] = cursor.rowcount
+            if _exists(cursor, 'pmp_affectedpatchstatus'):
+                cursor.execute(UPSERT_STATUS_SQL, params)
+                stats['fact_system_patch_status'] = cursor.rowcount
+                cursor.execute(DELETE_STATUS_SQL)
+        priv_conn.commit()
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    priv_conn.autocommit = True
+    cursor = priv_conn.cursor()
+    try:
+        for table in STAR_TABLES:
+            cursor.execute(f"ANALYZE {table};")
+    finally:
+        cursor.close()
+        priv_conn.autocommit = False
+    return stats
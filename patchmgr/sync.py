@@ -0,0 +1,495 @@
+"""
+Sync Patch Compliance Data from Patch Manager Plus to Private Database
+
+The sync:
+1. Connects to Patch Manager Plus database and checks its schema fingerprint
+2. Extracts comprehensive patch compliance data for all systems
+3. Loads data into claude_bwagner database (replaces existing data)
+4. Creates indexes for performance
+5. Records changed systems in patch_compliance_history (validity ranges)
+6. Updates the running anomaly statistics and flags outliers (see anomalies.py)
+7. Refreshes the star schema (dim_*/fact_* tables, see star.py)
+8. Writes the memory-mapped snapshot file for analysis tools (see snapfile.py)
+
+Severity Levels:
+- 0 = Unrated
+- 1 = Low
+- 2 = Moderate
+- 3 = Important
+- 4 = Critical
+- 5 = Info
+"""
+
+import sys
+from datetime import datetime
+
+from . import anomalies, config, db, estimate, registry, runs, schemacheck, snapfile, star
+from .compliance_sql import (
+    CREATE_TABLE_SQL, INSERT_SQL, CREATE_HISTORY_SQL, CLOSE_HISTORY_SQL,
+    INSERT_HISTORY_SQL, WORKLOAD,
+)
+
+EXTRACT_SQL = """
+    SELECT
+        mc.resource_id,
+        r.name as system_name,
+        r.domain_netbios_name as system_domain,
+        r.resource_type,
+
+        -- Last patch and contact dates
+        to_timestamp(mc.agent_executed_on/1000) as last_contact,
+        to_timestamp(pc.db_updated_time/1000) as last_patch_date,
+
+        -- Status fields
+        mc.managed_status,
+        mc.agent_status,
+        mc.installation_status,
+
+        -- Overall patch counts
+        pc.total_ms_patches,
+        pc.missing_ms_patches,
+        pc.installed_ms_patches,
+        pc.total_tp_patches,
+        pc.missing_tp_patches,
+        pc.installed_tp_patches,
+        pc.total_driver_patches,
+        pc.missing_driver_patches,
+        pc.installed_driver_patches,
+        pc.total_bios_patches,
+        pc.missing_bios_patches,
+        pc.installed_bios_patches,
+
+        -- Severity counts (missing patches by severity)
+        COALESCE(psc.critical_count, 0) as missing_critical,
+        COALESCE(psc.important_count, 0) as missing_important,
+        COALESCE(psc.moderate_count, 0) as missing_moderate,
+        COALESCE(psc.low_count, 0) as missing_low,
+        COALESCE(psc.unrated_count, 0) as missing_unrated,
+
+        -- System details
+        mc.fqdn_name,
+        mc.friendly_name,
+        mc.agent_version,
+        to_timestamp(mc.added_time/1000) as system_added_date
+
+    FROM managedcomputer mc
+    LEFT JOIN resource r ON mc.resource_id = r.resource_id
+    LEFT JOIN pmresourcepatchcount pc ON mc.resource_id = pc.resource_id
+    LEFT JOIN pmrespatchseveritycount psc ON mc.resource_id = psc.resource_id
+    WHERE mc.managed_status = 61  -- Only managed systems
+    ORDER BY r.name;
+"""
+
+registry.register_all('compliance', WORKLOAD)
+
+# NOTIFY channel for listeners such as `patchmgr serve`; the payload is the row count
+SYNC_CHANNEL = 'patchmgr_sync'
+
+
+def extract_systems(pmp_conn):
+    """Extract one compliance row per managed system from PMP"""
+    cursor = pmp_conn.cursor()
+    try:
+        cursor.execute(EXTRACT_SQL)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def iter_systems(pmp_conn, chunk_size=10000):
+    """
+    Stream extracted rows through a server-side cursor, chunk_size at a time
+
+    Used instead of extract_systems() when the pre-flight estimate is over
+    the configured limits, so neither side holds the full result in memory.
+    """
+    cursor = pmp_conn.cursor(name='patchmgr_extract')
+    cursor.itersize = chunk_size
+    try:
+        cursor.execute(EXTRACT_SQL)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def estimate_extraction(pmp_conn):
+    """Pre-flight EXPLAIN estimate of the extraction query"""
+    return [estimate.estimate_query(pmp_conn, 'extract_systems', EXTRACT_SQL)]
+
+
+def create_tables(priv_conn):
+    """Drop and recreate patch_compliance, its indexes and the summary view"""
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute(CREATE_TABLE_SQL)
+        priv_conn.commit()
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def load_systems(priv_conn, systems, batch_size=1000):
+    """
+    Insert extracted rows into patch_compliance; returns the row count
+
+    systems can be a list or any iterable of rows, such as iter_systems().
+    """
+    cursor = priv_conn.cursor()
+    inserted = 0
+    try:
+        batch = []
+        for row in systems:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(INSERT_SQL, batch)
+                inserted += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(INSERT_SQL, batch)
+            inserted += len(batch)
+        priv_conn.commit()
+
+        # Fresh statistics and visibility map so the planner uses the
+        # covering indexes (index-only scans) for the summary queries
+        priv_conn.autocommit = True
+        cursor.execute("VACUUM ANALYZE patch_compliance;")
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        priv_conn.autocommit = False
+        cursor.close()
+    return inserted
+
+
+def record_history(priv_conn):
+    """
+    Write a new patch_compliance_history version for each changed system
+
+    Returns (opened, closed): versions written and versions closed.
+    """
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute(CREATE_HISTORY_SQL)
+        cursor.execute(CLOSE_HISTORY_SQL)
+        closed = cursor.rowcount
+        cursor.execute(INSERT_HISTORY_SQL)
+        opened = cursor.rowcount
+        priv_conn.commit()
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return opened, closed
+
+
+def summary_stats(priv_conn):
+    """Fleet-wide totals from patch_compliance as a dict"""
+    cursor = priv_conn.cursor()
+    try:
+        stats = {}
+        for key, name in [
+            ('total_systems', 'count_systems'),
+            ('systems_with_missing', 'count_missing_any'),
+            ('systems_critical', 'count_missing_critical'),
+            ('total_missing', 'sum_missing'),
+            ('avg_compliance', 'avg_compliance'),
+        ]:
+            stats[key] = registry.fetchone(cursor, f'compliance.{name}')[0] or 0
+        return stats
+    finally:
+        cursor.close()
+
+
+def top_systems(priv_conn):
+    """Top 10 systems needing patches, most critical first"""
+    cursor = priv_conn.cursor()
+    try:
+        return registry.fetchall(cursor, 'compliance.top_systems_needing_patches')
+    finally:
+        cursor.close()
+
+
+def notify_loaded(priv_conn, inserted):
+    """Tell listeners (patchmgr serve) that patch_compliance was reloaded"""
+    cursor = priv_conn.cursor()
+    try:
+        cursor.execute("SELECT pg_notify(%s, %s);", (SYNC_CHANNEL, str(inserted)))
+        priv_conn.commit()
+    except Exception:
+        priv_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def print_summary(priv_conn, backend=None):
+    """Print the summary statistics and top 10 systems"""
+    backend = backend or sys.modules[__name__]
+    stats = backend.summary_stats(priv_conn)
+    total_systems = stats['total_systems']
+    systems_with_missing = stats['systems_with_missing']
+    systems_critical = stats['systems_critical']
+
+    print("\n" + "=" * 80)
+    print("SUMMARY STATISTICS")
+    print("=" * 80)
+    print(f"Total Systems:                {total_systems:,}")
+    if total_systems:
+        print(f"Systems with Missing Patches: {systems_with_missing:,} ({systems_with_missing/total_systems*100:.1f}%)")
+        print(f"Systems with Critical Patches: {systems_critical:,} ({systems_critical/total_systems*100:.1f}%)")
+    print(f"Total Missing Patches:        {stats['total_missing']:,}")
+    print(f"Average Compliance:           {stats['avg_compliance']:.2f}%")
+
+    # Top 10 systems needing patches
+    print("\n" + "-" * 80)
+    print("TOP 10 SYSTEMS NEEDING PATCHES")
+    print("-" * 80)
+    print(f"{'System Name':40s} | {'Missing':>7s} | {'Critical':>8s} | {'Important':>9s} | {'Compliance':>10s}")
+    print("-" * 80)
+    for sys_name, missing, crit, imp, compliance in backend.top_systems(priv_conn):
+        print(f"{sys_name:40s} | {missing:7d} | {crit:8d} | {imp:9d} | {compliance:9.2f}%")
+
+
+def main(args):
+    """`patchmgr sync`: run the full sync, printing progress; returns an exit code"""
+    limits = estimate.limits_from_args(args)
+
+    print("=" * 80)
+    print("PATCH COMPLIANCE DATA SYNC" + (" (DRY RUN)" if args.dry_run else ""))
+    print("=" * 80)
+    print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    # A dry run touches nothing and an embedded target is a local file,
+    # so neither needs the run lock on the private database
+    if args.dry_run or (getattr(args, 'target', None) or config.sync_target()['kind']) != 'postgres':
+        print()
+        return _sync(args, limits)
+    return runs.run_locked('sync', args, lambda: _sync(args, limits))
+
+
+def _sync(args, limits):
+    """STEPS 1-3 of the sync, then the load"""
+    # ========================================================================
+    # STEP 1: Connect to Patch Manager Plus Database
+    # ========================================================================
+    print("STEP 1: Connecting to Patch Manager Plus database...")
+    try:
+        pmp_conn = db.connect_pmp()
+        print("  Connected to Patch Manager Plus!")
+    except Exception as e:
+        print(f"  ERROR: Failed to connect to PMP database: {e}")
+        return 1
+
+    try:
+        # One catalog query; stops here if a column the sync reads has changed
+        try:
+            if not schemacheck.preflight(pmp_conn, save=not args.dry_run):
+                return 1
+        except Exception as e:
+            print(f"  ERROR: Failed to check the PMP schema: {e}")
+            return 1
+
+        # ====================================================================
+        # STEP 2: Extract Data from Patch Manager Plus
+        # ====================================================================
+        print("\nSTEP 2: Extracting patch compliance data from PMP...")
+        try:
+            estimates = estimate_extraction(pmp_conn)
+        except Exception as e:
+            print(f"  ERROR: Failed to estimate extraction cost: {e}")
+            return 1
+        over = [reason for e in estimates for reason in estimate.over_limits(e, limits)]
+
+        if args.dry_run:
+            print("  EXPLAIN only - nothing is extracted or loaded\n")
+            within = estimate.print_estimates(estimates, limits)
+            if within:
+                print("Result: within limits, the sync would run normally")
+            elif limits['over_limit'] == 'chunk':
+                print(f"Result: over limits, the sync would extract in chunks of {limits['chunk_size'] or 10000:,} rows")
+            else:
+                print("Result: over limits, the sync would refuse to run")
+            return 0 if within or limits['over_limit'] == 'chunk' else 1
+
+        try:
+            if not over:
+                systems = extract_systems(pmp_conn)
+                print(f"  Extracted data for {len(systems)} managed systems")
+            elif limits['over_limit'] == 'chunk':
+                chunk_size = limits['chunk_size'] or 10000
+                print(f"  Estimate over limits ({'; '.join(over)})")
+                print(f"  Extracting in chunks of {chunk_size:,} rows during the load")
+                systems = iter_systems(pmp_conn, chunk_size)
+            else:
+                print(f"  ERROR: Estimate over limits ({'; '.join(over)})")
+                print("  Refusing to run. Check with --dry-run, raise the limits or use --over-limit chunk.")
+                return 1
+        except Exception as e:
+            print(f"  ERROR: Failed to extract data: {e}")
+            return 1
+
+        # ====================================================================
+        # STEP 3: Connect to Private Database (or the embedded target file)
+        # ====================================================================
+        target = config.sync_target()
+        kind = getattr(args, 'target', None) or target['kind']
+        if kind != 'postgres':
+            from . import embedded
+
+            print(f"\nSTEP 3: Opening embedded {kind} target...")
+            try:
+                priv_conn = embedded.connect(kind, getattr(args, 'target_path', None) or target['path'])
+                if priv_conn.dialect != kind:
+                    print("  duckdb is not installed, falling back to SQLite")
+                print(f"  Opened {priv_conn.dialect} file {priv_conn.path}")
+            except Exception as e:
+                print(f"  ERROR: Failed to open {kind} target: {e}")
+                return 1
+            backend = embedded
+        else:
+            print("\nSTEP 3: Connecting to private database (claude_bwagner)...")
+            try:
+                priv_conn = db.connect_private()
+                print("  Connected to private database!")
+            except Exception as e:
+                print(f"  ERROR: Failed to connect to private database: {e}")
+                return 1
+            backend = None
+
+        try:
+            return _load(priv_conn, systems, backend)
+        finally:
+            priv_conn.close()
+    finally:
+        pmp_conn.close()
+
+
+def _load(priv_conn, systems, backend=None):
+    """
+    STEPS 4-10 of the sync against an open private connection
+
+    backend provides create_tables, load_systems, record_history, summary_stats
+    and top_systems for a non-PostgreSQL target (see embedded.py).
+    """
+    backend = backend or sys.modules[__name__]
+    # ========================================================================
+    # STEP 4: Create/Recreate Table
+    # ========================================================================
+    print("\nSTEP 4: Creating patch_compliance table...")
+    try:
+        backend.create_tables(priv_conn)
+        print("  Table and indexes created successfully!")
+    except Exception as e:
+        print(f"  ERROR: Failed to create table: {e}")
+        return 1
+
+    # ========================================================================
+    # STEP 5: Insert Data
+    # ========================================================================
+    print("\nSTEP 5: Loading data into private database...")
+    try:
+        inserted = backend.load_systems(priv_conn, systems)
+        print(f"  Loaded {inserted} systems into database!")
+    except Exception as e:
+        print(f"  ERROR: Failed to insert data: {e}")
+        return 1
+
+    # ========================================================================
+    # STEP 6: Record History (slowly-changing dimension)
+    # ========================================================================
+    print("\nSTEP 6: Recording changes in patch_compliance_history...")
+    try:
+        opened, closed = backend.record_history(priv_conn)
+        print(f"  {opened} new versions written, {closed} versions closed, "
+              f"{inserted - opened} systems unchanged")
+    except Exception as e:
+        print(f"  ERROR: Failed to record history: {e}")
+
+    # ========================================================================
+    # STEP 7: Anomaly Detection (running statistics per system and domain)
+    # ========================================================================
+    print("\nSTEP 7: Checking for anomalies...")
+    if backend is not sys.modules[__name__]:
+        print("  Skipped: anomaly statistics are only kept in the private PostgreSQL database")
+    else:
+        try:
+            updated, flagged = anomalies.update(priv_conn)
+            print(f"  {updated:,} series updated, {len(flagged)} anomalies flagged")
+            for row in flagged[:10]:
+                print(f"    {anomalies.describe(*row)}")
+            if len(flagged) > 10:
+                print(f"    ... and {len(flagged) - 10} more (patchmgr anomalies)")
+        except Exception as e:
+            print(f"  ERROR: Failed to update anomaly statistics: {e}")
+
+    # ========================================================================
+    # STEP 8: Build Star Schema (dimensions and facts for BI tools)
+    # ========================================================================
+    print("\nSTEP 8: Building star schema...")
+    if backend is not sys.modules[__name__]:
+        print("  Skipped: the star schema is only built in the private PostgreSQL database")
+    else:
+        try:
+            built = star.build_star_schema(priv_conn)
+            for table, count in built.items():
+                print(f"  {table}: {count:,} rows added or changed")
+        except Exception as e:
+            print(f"  ERROR: Failed to build star schema: {e}")
+
+    # ========================================================================
+    # STEP 9: Write Snapshot File (memory-mapped columns for analysis tools)
+    # ========================================================================
+    print("\nSTEP 9: Writing snapshot file...")
+    path = config.snapshot_file_path()
+    if backend is not sys.modules[__name__]:
+        print("  Skipped: the snapshot file is written from the private PostgreSQL database")
+    elif path is None:
+        print("  Skipped: PATCHMGR_SNAPSHOT_FILE=off")
+    else:
+        try:
+            rows, size = snapfile.write(priv_conn, path)
+            print(f"  Wrote {rows:,} systems to {path} ({size / 1024:,.1f} KB)")
+        except Exception as e:
+            print(f"  ERROR: Failed to write the snapshot file: {e}")
+
+    # ========================================================================
+    # STEP 10: Generate Summary Statistics
+    # ========================================================================
+    print("\nSTEP 10: Generating summary statistics...")
+    try:
+        print_summary(priv_conn, backend)
+    except Exception as e:
+        print(f"  ERROR: Failed to generate statistics: {e}")
+
+    if backend is sys.modules[__name__]:
+        try:
+            notify_loaded(priv_conn, inserted)
+        except Exception as e:
+            print(f"\n  WARNING: Could not notify listeners of the new data: {e}")
+
+    print("\n" + "=" * 80)
+    print("SYNC COMPLETE")
+    print(f"Completed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 80)
+    if backend is sys.modules[__name__]:
+        print("\nData is available in table: patch_compliance")
+        print("Summary view available: patch_compliance_summary")
+        print("History available: patch_compliance_history (patch_compliance_as_of(timestamp))")
+        print("Star schema: dim_system, dim_patch, dim_date, fact_system_patch_counts, fact_system_patch_status")
+    else:
+        print(f"\nData is available in {priv_conn.dialect} file {priv_conn.path}, table: patch_compliance")
+        print("Summary view available: patch_compliance_summary")
+        print("History available: patch_compliance_history (valid_from/valid_to ranges, valid_to IS NULL is current)")
+    print("\nExample queries:")
+    print("  SELECT * FROM patch_compliance_summary;")
+    print("  SELECT * FROM patch_compliance WHERE missing_critical > 0;")
+    print("  SELECT system_name, missing_patches_total FROM patch_compliance ORDER BY missing_patches_total DESC;")
+    return 0